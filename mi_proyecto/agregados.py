@@ -0,0 +1,163 @@
+from collections import Counter
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, Count, DecimalField, ExpressionWrapper, F, Q, Sum, When
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import AgregadoInventario, Productos
+from .senales import productos_actualizados
+
+
+LIMITE_STOCK_BAJO = 3
+
+CLAVE_STOCK_BAJO = 'agregados:stock_bajo'
+CLAVE_VALOR = 'agregados:valor_stock_centavos'
+PREFIJO_CATEGORIA = 'agregados:categoria:'
+
+CLAVES = [CLAVE_STOCK_BAJO, CLAVE_VALOR] + [PREFIJO_CATEGORIA + cat[0] for cat in Productos.CATEGORIAS]
+
+
+def estado(producto):
+    """Valores de un producto que afectan a los agregados, o False si no están cargados."""
+    return producto.estado_agregados()
+
+
+def _aporte(estado_producto):
+    """Lo que un producto suma a cada contador."""
+    if estado_producto is None:
+        return Counter()
+    stock, activo, categoria, precio = estado_producto
+    if not activo:
+        return Counter()
+    aporte = Counter({
+        PREFIJO_CATEGORIA + categoria: 1,
+        CLAVE_VALOR: int(Decimal(precio) * 100) * stock,
+    })
+    if stock <= LIMITE_STOCK_BAJO:
+        aporte[CLAVE_STOCK_BAJO] = 1
+    return aporte
+
+
+def calcular():
+    """Calcula todos los agregados desde la base de datos con una sola consulta."""
+    activos = Q(activo=True)
+    valor = ExpressionWrapper(F('precio') * F('stock'), output_field=DecimalField(max_digits=20, decimal_places=2))
+    consultas = {
+        'stock_bajo': Count('id', filter=activos & Q(stock__lte=LIMITE_STOCK_BAJO)),
+        'valor': Sum(valor, filter=activos),
+    }
+    for codigo, _ in Productos.CATEGORIAS:
+        consultas[codigo] = Count('id', filter=activos & Q(categoria=codigo))
+    datos = Productos.objects.aggregate(**consultas)
+
+    valores = {
+        CLAVE_STOCK_BAJO: datos['stock_bajo'],
+        CLAVE_VALOR: int((datos['valor'] or 0) * 100),
+    }
+    for codigo, _ in Productos.CATEGORIAS:
+        valores[PREFIJO_CATEGORIA + codigo] = datos[codigo]
+    return valores
+
+
+def _guardar(valores):
+    AgregadoInventario.objects.bulk_create(
+        [AgregadoInventario(clave=clave, valor=valor) for clave, valor in valores.items()],
+        update_conflicts=True, unique_fields=['clave'], update_fields=['valor'],
+    )
+
+
+def reconciliar():
+    """Recalcula los agregados, los guarda y devuelve las diferencias encontradas."""
+    with transaction.atomic():
+        # Los incrementos de otros procesos esperan a que termine el recálculo
+        anteriores = dict(AgregadoInventario.objects.select_for_update().values_list('clave', 'valor'))
+        valores = calcular()
+        _guardar(valores)
+    return {
+        clave: (anteriores.get(clave), valor)
+        for clave, valor in valores.items()
+        if anteriores.get(clave) != valor
+    }
+
+
+def obtener():
+    """
+    Agregados del inventario, leídos de ``AgregadoInventario`` con una consulta
+    (se recalculan desde los productos si falta alguno).
+
+    Devuelve ``stock_bajo``, ``por_categoria`` ({codigo: productos activos}) y
+    ``valor_stock`` (Decimal).
+    """
+    valores = dict(AgregadoInventario.objects.values_list('clave', 'valor'))
+    if len(valores) < len(CLAVES):
+        valores = calcular()
+        _guardar(valores)
+    return {
+        'stock_bajo': valores[CLAVE_STOCK_BAJO],
+        'por_categoria': {
+            codigo: valores[PREFIJO_CATEGORIA + codigo] for codigo, _ in Productos.CATEGORIAS
+        },
+        'valor_stock': Decimal(valores[CLAVE_VALOR]) / 100,
+    }
+
+
+def invalidar():
+    """Recalcula los contadores cuando no se sabe cuánto cambiaron."""
+    reconciliar()
+
+
+def _aplicar(deltas):
+    deltas = {clave: delta for clave, delta in deltas.items() if delta}
+    # Un solo UPDATE relativo: los incrementos simultáneos de varios procesos se suman
+    actualizadas = AgregadoInventario.objects.filter(clave__in=deltas).update(
+        valor=Case(*[When(clave=clave, then=F('valor') + delta) for clave, delta in deltas.items()])
+    )
+    if actualizadas < len(deltas):
+        # Faltan contadores (todavía no se calcularon): se calculan todos
+        invalidar()
+
+
+def registrar_cambios(cambios):
+    """
+    Actualiza los agregados de forma incremental a partir de pares ``(antes, despues)``.
+
+    Cada elemento es el resultado de ``estado()`` antes y después del cambio
+    (``None`` para un producto nuevo o eliminado, ``False`` si se desconoce).
+    Los contadores se actualizan al confirmarse la transacción; si falta algún
+    estado, o ``cambios`` es ``None``, se recalculan desde los productos. Si eso
+    falla (p. ej. SQLite bloqueada) el error se registra sin afectar a la
+    escritura ya confirmada, y ``reconciliar_agregados`` lo corrige.
+    """
+    if cambios is None:
+        transaction.on_commit(invalidar, robust=True)
+        return
+    deltas = Counter()
+    for antes, despues in cambios:
+        if antes is False or despues is False:
+            transaction.on_commit(invalidar, robust=True)
+            return
+        deltas.update(_aporte(despues))
+        deltas.subtract(_aporte(antes))
+    if any(deltas.values()):
+        transaction.on_commit(lambda: _aplicar(deltas), robust=True)
+
+
+@receiver(post_save, sender=Productos)
+def _producto_guardado(sender, instance, created, **kwargs):
+    antes = None if created else getattr(instance, '_estado_agregados', False)
+    despues = estado(instance)
+    registrar_cambios([(antes, despues)])
+    instance._estado_agregados = despues
+
+
+@receiver(post_delete, sender=Productos)
+def _producto_eliminado(sender, instance, **kwargs):
+    antes = getattr(instance, '_estado_agregados', False)
+    registrar_cambios([(antes, None)])
+
+
+@receiver(productos_actualizados)
+def _productos_actualizados(sender, cambios, **kwargs):
+    registrar_cambios(cambios)
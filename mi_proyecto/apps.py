@@ -4,3 +4,16 @@ from django.apps import AppConfig
 class MiProyectoConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'mi_proyecto'
+
+    def ready(self):
+        # Registra las señales que mantienen los agregados, la caché de vistas y los
+        # precios, el vaciado del historial pendiente al terminar cada petición y
+        # la detección del motor de búsqueda al abrir cada conexión
+        from . import agregados, auditoria, busqueda, cache_vistas, precios  # noqa: F401
+
+        # comprobantes no importa modelos porque también se carga en los procesos del pool
+        from django.db.models.signals import post_delete, post_save
+        from . import comprobantes
+        from .models import SalidaProducto
+        post_save.connect(comprobantes.salida_modificada, sender=SalidaProducto)
+        post_delete.connect(comprobantes.salida_modificada, sender=SalidaProducto)
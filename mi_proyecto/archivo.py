@@ -0,0 +1,124 @@
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Min
+from django.utils import timezone
+
+from .cache_vistas import invalidar_modelo
+from .models import HistorialMovimiento, HistorialArchivado
+
+
+COLUMNAS = (
+    'id', 'producto_id', 'nombre_producto', 'serial_producto', 'usuario_id',
+    'tipo_movimiento', 'fecha_movimiento', 'detalles', 'evento',
+)
+
+
+def inicio_de_mes(fecha):
+    local = timezone.localtime(fecha)
+    return timezone.make_aware(datetime(local.year, local.month, 1))
+
+
+def mes_siguiente(inicio):
+    return inicio_de_mes(inicio + timedelta(days=32))
+
+
+def limite_archivo(meses=None, ahora=None):
+    """Inicio del mes más antiguo que se conserva en la tabla del historial."""
+    if meses is None:
+        meses = settings.HISTORIAL_MESES_RECIENTES
+    limite = inicio_de_mes(ahora or timezone.now())
+    for _ in range(meses):
+        limite = inicio_de_mes(limite - timedelta(days=1))
+    return limite
+
+
+def inicio_del_dia(fecha):
+    """Fecha (``date``) a datetime consciente, para filtrar por rango usando el índice."""
+    return timezone.make_aware(datetime.combine(fecha, time.min))
+
+
+def meses_pendientes(limite):
+    """Meses (inicio, fin) con movimientos anteriores a ``limite`` en la tabla del historial."""
+    primero = HistorialMovimiento.objects.filter(fecha_movimiento__lt=limite).aggregate(
+        primero=Min('fecha_movimiento')
+    )['primero']
+    meses = []
+    if primero is None:
+        return meses
+    inicio = inicio_de_mes(primero)
+    while inicio < limite:
+        fin = mes_siguiente(inicio)
+        meses.append((inicio, fin))
+        inicio = fin
+    return meses
+
+
+def _crear_particion(cursor, inicio, fin):
+    tabla = HistorialArchivado._meta.db_table
+    particion = connection.ops.quote_name(f'{tabla}_{timezone.localtime(inicio):%Y_%m}')
+    cursor.execute(
+        f'CREATE TABLE IF NOT EXISTS {particion} PARTITION OF {connection.ops.quote_name(tabla)} '
+        f"FOR VALUES FROM ('{inicio.isoformat()}') TO ('{fin.isoformat()}')"
+    )
+
+
+def archivar_mes(inicio, fin):
+    """
+    Mueve los movimientos de [inicio, fin) al archivo con un INSERT ... SELECT
+    y un DELETE en la misma transacción. Devuelve cuántos movió.
+    """
+    qn = connection.ops.quote_name
+    origen = qn(HistorialMovimiento._meta.db_table)
+    destino = qn(HistorialArchivado._meta.db_table)
+    columnas = ', '.join(qn(c) for c in COLUMNAS)
+    condicion = f'{qn("fecha_movimiento")} >= %s AND {qn("fecha_movimiento")} < %s'
+    parametros = [connection.ops.adapt_datetimefield_value(inicio), connection.ops.adapt_datetimefield_value(fin)]
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            _crear_particion(cursor, inicio, fin)
+        cursor.execute(
+            f'INSERT INTO {destino} ({columnas}) SELECT {columnas} FROM {origen} WHERE {condicion}',
+            parametros,
+        )
+        # DELETE directo: el borrado del ORM cargaría cada fila para enviar señales
+        cursor.execute(f'DELETE FROM {origen} WHERE {condicion}', parametros)
+        movidos = cursor.rowcount
+        transaction.on_commit(lambda: invalidar_modelo(HistorialMovimiento))
+    return movidos
+
+
+def archivar(meses=None, al_archivar=None):
+    """
+    Mueve al archivo los meses completos anteriores a ``limite_archivo(meses)``,
+    un mes por transacción. ``al_archivar(inicio, movidos)`` se llama tras cada mes.
+    Devuelve el total de movimientos archivados.
+    """
+    total = 0
+    for inicio, fin in meses_pendientes(limite_archivo(meses)):
+        movidos = archivar_mes(inicio, fin)
+        total += movidos
+        if al_archivar:
+            al_archivar(inicio, movidos)
+    return total
+
+
+def historial_por_rango(desde=None, hasta=None):
+    """
+    Querysets a consultar para un rango de fechas (``date``, ambos opcionales).
+
+    Sin rango solo la tabla del historial (los meses recientes); con rango
+    también el archivo, filtrado por fecha para que use su índice (y en
+    PostgreSQL solo recorra las particiones del rango).
+    """
+    recientes = HistorialMovimiento.objects.all()
+    if desde is None and hasta is None:
+        return [recientes]
+    filtro = {}
+    if desde is not None:
+        filtro['fecha_movimiento__gte'] = inicio_del_dia(desde)
+    if hasta is not None:
+        filtro['fecha_movimiento__lt'] = inicio_del_dia(hasta + timedelta(days=1))
+    return [recientes.filter(**filtro), HistorialArchivado.objects.filter(**filtro)]
@@ -0,0 +1,124 @@
+from contextlib import asynccontextmanager
+from functools import wraps
+from itertools import islice
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.contrib.auth.decorators import login_required
+from django.contrib.auth.views import redirect_to_login
+from django.db import connection
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+
+# Partes de una respuesta en streaming que se leen por cada salto al hilo de la petición
+PARTES_POR_BLOQUE = 64
+
+
+def login_requerido(vista):
+    """``login_required`` que también acepta vistas ``async def`` (el de Django 4.2 solo envuelve vistas síncronas)."""
+    if not iscoroutinefunction(vista):
+        return login_required(vista)
+
+    @wraps(vista)
+    async def envoltura(request, *args, **kwargs):
+        # Cargar la sesión y el usuario hace consultas: se resuelve en el hilo de la petición
+        if not await sync_to_async(lambda: request.user.is_authenticated)():
+            return redirect_to_login(request.get_full_path())
+        return await vista(request, *args, **kwargs)
+    return envoltura
+
+
+def _agregar_wrapper(wrapper):
+    connection.execute_wrappers.append(wrapper)
+
+
+def _quitar_wrapper(wrapper):
+    connection.execute_wrappers.remove(wrapper)
+
+
+@asynccontextmanager
+async def envolver_consultas(wrapper):
+    """
+    ``connection.execute_wrapper`` para código async.
+
+    El ORM async ejecuta cada consulta con ``sync_to_async`` en el hilo de la
+    petición, que tiene su propia conexión: el wrapper se instala en esa
+    conexión y no en la del hilo del event loop.
+    """
+    await sync_to_async(_agregar_wrapper)(wrapper)
+    try:
+        yield wrapper
+    finally:
+        await sync_to_async(_quitar_wrapper)(wrapper)
+
+
+async def _por_bloques(partes):
+    partes = iter(partes)
+    siguiente = sync_to_async(lambda: list(islice(partes, PARTES_POR_BLOQUE)))
+    while bloque := await siguiente():
+        for parte in bloque:
+            yield parte
+
+
+class StreamingAsincronoMiddleware:
+    """
+    Bajo ASGI, envía las respuestas en streaming síncronas (exportaciones CSV,
+    PDF, Excel, estáticos) de a bloques.
+
+    Django 4.2 no puede iterar un generador síncrono desde el event loop y lo
+    consume entero con ``list()`` antes de enviar el primer byte: un CSV de
+    millones de filas quedaría en memoria. Aquí se leen ``PARTES_POR_BLOQUE``
+    partes por vez en el hilo de la petición, el mismo de la vista, así que
+    los cursores del ORM siguen usando su conexión. Con WSGI no hace nada.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.asincrono = iscoroutinefunction(get_response)
+        if self.asincrono:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.asincrono:
+            return self._acall(request)
+        return self.get_response(request)
+
+    async def _acall(self, request):
+        respuesta = await self.get_response(request)
+        if respuesta.streaming and not respuesta.is_async:
+            respuesta.streaming_content = _por_bloques(respuesta.streaming_content)
+        return respuesta
+
+
+class EstaticosMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise que también funciona en modo async.
+
+    El middleware de WhiteNoise es solo síncrono y bajo ASGI obligaría a
+    Django a atender toda la cadena (vistas async incluidas) desde un hilo.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        self.asincrono = iscoroutinefunction(get_response)
+        if self.asincrono:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.asincrono:
+            return self._acall(request)
+        return super().__call__(request)
+
+    async def _acall(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
@@ -0,0 +1,263 @@
+import atexit
+import fcntl
+import glob
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.signals import request_finished
+from django.db import DataError, IntegrityError, close_old_connections, transaction
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Productos, HistorialMovimiento
+from .senales import movimientos_registrados
+
+
+logger = logging.getLogger(__name__)
+
+CAMPOS = ('producto_id', 'nombre_producto', 'serial_producto', 'usuario_id', 'tipo_movimiento', 'detalles')
+
+
+class _Buffer:
+    """
+    Movimientos pendientes del proceso, con un diario en disco.
+
+    Cada evento se agrega al diario antes de quedar en memoria, y el diario se
+    vacía solo después de escribirlo en la base de datos: si el proceso muere,
+    ``recuperar()`` lo reintenta desde otro proceso. El proceso mantiene un
+    ``flock`` sobre su diario; el sistema lo suelta cuando el proceso termina.
+    """
+
+    def __init__(self):
+        self.eventos = []
+        self.desde = None
+        self.candado = threading.RLock()
+        self.diario = None
+        self.ruta = None
+        self.recuperado = False
+
+    def _abrir_diario(self):
+        if self.diario is None:
+            carpeta = carpeta_diario()
+            os.makedirs(carpeta, exist_ok=True)
+            self.ruta = os.path.join(carpeta, f'auditoria-{os.getpid()}-{uuid.uuid4().hex[:8]}.jsonl')
+            self.diario = open(self.ruta, 'a', encoding='utf-8')
+            fcntl.flock(self.diario, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return self.diario
+
+    def agregar(self, eventos):
+        with self.candado:
+            diario = self._abrir_diario()
+            for evento in eventos:
+                diario.write(json.dumps(evento) + '\n')
+            # Al sistema operativo: sobrevive a la caída del proceso
+            diario.flush()
+            if not self.eventos:
+                self.desde = time.monotonic()
+            self.eventos.extend(eventos)
+            lleno = len(self.eventos) >= settings.AUDITORIA_LOTE
+            viejo = time.monotonic() - self.desde >= settings.AUDITORIA_INTERVALO
+        if lleno or viejo:
+            vaciar()
+
+    def tomar(self):
+        eventos, self.eventos = self.eventos, []
+        return eventos
+
+    def confirmar(self):
+        if self.diario is not None and not self.eventos:
+            self.diario.seek(0)
+            self.diario.truncate()
+
+
+_buffer = _Buffer()
+
+
+def carpeta_diario():
+    return settings.AUDITORIA_DIARIO
+
+
+def _a_evento(movimiento):
+    evento = {campo: getattr(movimiento, campo) for campo in CAMPOS}
+    evento['fecha_movimiento'] = (movimiento.fecha_movimiento or timezone.now()).isoformat()
+    evento['evento'] = str(movimiento.evento or uuid.uuid4())
+    return evento
+
+
+def ruta_descartados():
+    return os.path.join(carpeta_diario(), 'descartados.jsonl')
+
+
+def _descartar(evento, error):
+    """Aparta un evento que nunca se va a poder insertar, para revisarlo a mano."""
+    logger.error('Movimiento del historial descartado (%s): %s', error, evento)
+    os.makedirs(carpeta_diario(), exist_ok=True)
+    with open(ruta_descartados(), 'a', encoding='utf-8') as archivo:
+        archivo.write(json.dumps(dict(evento, error=str(error))) + '\n')
+
+
+def _movimientos(eventos):
+    # Si el producto o el usuario se eliminaron mientras el evento esperaba,
+    # queda sin ellos (como SET_NULL)
+    productos = {e.get('producto_id') for e in eventos if e.get('producto_id')}
+    usuarios = {e.get('usuario_id') for e in eventos if e.get('usuario_id')}
+    productos = set(Productos.objects.filter(id__in=productos).values_list('id', flat=True)) if productos else set()
+    usuarios = set(User.objects.filter(id__in=usuarios).values_list('id', flat=True)) if usuarios else set()
+    pares = []
+    for evento in eventos:
+        try:
+            datos = {campo: evento[campo] for campo in CAMPOS}
+            if datos['producto_id'] not in productos:
+                datos['producto_id'] = None
+            if datos['usuario_id'] not in usuarios:
+                datos['usuario_id'] = None
+            datos['fecha_movimiento'] = parse_datetime(evento['fecha_movimiento'])
+            datos['evento'] = uuid.UUID(evento['evento'])
+        except (KeyError, TypeError, ValueError) as error:
+            _descartar(evento, error)
+            continue
+        pares.append((evento, HistorialMovimiento(**datos)))
+    return pares
+
+
+def _escribir(eventos):
+    """
+    Inserta los eventos en bloque; reintentar los mismos eventos no los duplica.
+
+    Los errores de la base (conexión, bloqueos) se propagan para reintentar;
+    un evento que la base rechaza por sus datos se aparta en ``descartados.jsonl``
+    para no trabar a los demás.
+    """
+    if not eventos:
+        return 0
+    pares = _movimientos(eventos)
+    movimientos = [movimiento for _, movimiento in pares]
+    try:
+        with transaction.atomic():
+            HistorialMovimiento.objects.bulk_create(
+                movimientos, batch_size=settings.AUDITORIA_LOTE, ignore_conflicts=True
+            )
+    except (IntegrityError, DataError):
+        # Se busca el evento inválido insertando de a uno
+        movimientos = []
+        for evento, movimiento in pares:
+            try:
+                with transaction.atomic():
+                    HistorialMovimiento.objects.bulk_create([movimiento], ignore_conflicts=True)
+            except (IntegrityError, DataError) as error:
+                _descartar(evento, error)
+            else:
+                movimientos.append(movimiento)
+    movimientos_registrados.send(sender=HistorialMovimiento, cantidad=len(movimientos))
+    return len(movimientos)
+
+
+def registrar(*movimientos):
+    """
+    Registra movimientos del historial (instancias de ``HistorialMovimiento`` sin guardar).
+
+    Los productos referenciados ya deben estar guardados. Con
+    ``AUDITORIA_SINCRONA`` se insertan en el momento; si no, se encolan al
+    confirmarse la transacción actual (un rollback los descarta) y se escriben
+    en bloque al llenarse el lote, al pasar ``AUDITORIA_INTERVALO`` segundos o
+    al terminar la petición.
+    """
+    for movimiento in movimientos:
+        if movimiento.producto_id is None and movimiento.producto is not None:
+            movimiento.producto_id = movimiento.producto.pk
+
+    if settings.AUDITORIA_SINCRONA:
+        HistorialMovimiento.objects.bulk_create(movimientos, batch_size=settings.AUDITORIA_LOTE)
+        movimientos_registrados.send(sender=HistorialMovimiento, cantidad=len(movimientos))
+        return
+
+    eventos = [_a_evento(m) for m in movimientos]
+    transaction.on_commit(lambda: _buffer.agregar(eventos))
+
+
+def vaciar():
+    """Escribe los movimientos pendientes del proceso. Devuelve cuántos se escribieron."""
+    with _buffer.candado:
+        eventos = _buffer.tomar()
+        if not eventos:
+            return 0
+        if not _buffer.recuperado:
+            # Primera escritura del proceso: también lo que dejaron procesos caídos
+            _buffer.recuperado = True
+            try:
+                recuperar()
+            except Exception:
+                logger.exception('No se pudieron recuperar los diarios de auditoría')
+        try:
+            escritos = _escribir(eventos)
+        except Exception:
+            # La base no respondió: quedan en memoria y en el diario para el próximo intento
+            _buffer.eventos[:0] = eventos
+            logger.exception('No se pudieron escribir %s movimientos del historial', len(eventos))
+            return 0
+        _buffer.confirmar()
+        return escritos
+
+
+def recuperar():
+    """
+    Escribe los eventos de diarios que dejaron procesos terminados. Devuelve cuántos leyó.
+
+    Un diario que se puede bloquear no tiene dueño: no se usa el PID del
+    nombre, que en un contenedor reiniciado puede ser de otro proceso vivo.
+    El bloqueo también evita que dos procesos recuperen el mismo diario.
+    """
+    total = 0
+    for ruta in glob.glob(os.path.join(carpeta_diario(), 'auditoria-*.jsonl')):
+        if ruta == _buffer.ruta:
+            continue
+        try:
+            archivo = open(ruta, encoding='utf-8')
+        except FileNotFoundError:
+            # Otro proceso lo recuperó antes
+            continue
+        with archivo:
+            try:
+                fcntl.flock(archivo, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                # Es el diario de un proceso vivo, o otro lo está recuperando
+                continue
+            if os.fstat(archivo.fileno()).st_nlink == 0:
+                # Se recuperó y borró entre el open y el flock
+                continue
+            eventos = []
+            for linea in archivo:
+                try:
+                    eventos.append(json.loads(linea))
+                except ValueError:
+                    # Línea a medio escribir: el evento no llegó a encolarse
+                    pass
+            total += _escribir(eventos)
+            # Se borra antes de soltar el bloqueo
+            os.remove(ruta)
+    return total
+
+
+@receiver(request_finished)
+def _al_terminar_peticion(sender, **kwargs):
+    # request_finished llega cuando la respuesta ya se envió al cliente
+    if _buffer.eventos:
+        vaciar()
+        close_old_connections()
+
+
+@atexit.register
+def _al_salir():
+    if _buffer.eventos:
+        vaciar()
+    # Diario vacío: no queda nada que recuperar
+    if _buffer.diario is not None and not _buffer.eventos:
+        os.remove(_buffer.ruta)
+        _buffer.diario.close()
@@ -0,0 +1,129 @@
+import re
+
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.db.models import FloatField, Q
+from django.db.models.expressions import RawSQL
+from django.db.models.signals import post_migrate
+from django.dispatch import receiver
+
+
+TABLA_FTS = 'mi_proyecto_productos_fts'
+
+# Debe coincidir exactamente con la expresión del índice GIN de la migración 0011
+VECTOR_PRODUCTO = (
+    "to_tsvector('simple', coalesce(\"mi_proyecto_productos\".\"nombre\", '') || ' ' || "
+    "coalesce(\"mi_proyecto_productos\".\"codigo\", '') || ' ' || "
+    "coalesce(\"mi_proyecto_productos\".\"descripcion\", ''))"
+)
+VECTOR_PROVEEDOR = "to_tsvector('simple', coalesce(\"mi_proyecto_proveedor\".\"nombre\", ''))"
+# Para ordenar: producto y proveedor en un solo vector, el producto con más peso.
+# Solo se calcula para las filas que coinciden; el proveedor sale de una
+# subconsulta porque el queryset no siempre tiene el join
+VECTOR_RANGO = (
+    f"setweight({VECTOR_PRODUCTO}, 'A') || setweight(to_tsvector('simple', coalesce(("
+    "SELECT \"nombre\" FROM mi_proyecto_proveedor "
+    "WHERE \"id\" = \"mi_proyecto_productos\".\"proveedor_id\"), '')), 'B')"
+)
+
+_motores = {}
+
+
+def _detectar_motor(conexion):
+    if conexion.vendor == 'postgresql':
+        return 'postgres'
+    if conexion.vendor == 'sqlite':
+        # Directo con la conexión de sqlite3: no pasa por los execute_wrappers
+        # y no cuenta en el presupuesto de consultas de ninguna vista
+        conexion.ensure_connection()
+        tabla = conexion.connection.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", [TABLA_FTS]
+        ).fetchone()
+        if tabla:
+            return 'fts5'
+    return 'basico'
+
+
+def motor_busqueda():
+    """
+    Motor de búsqueda disponible para la base de datos actual.
+
+    ``postgres`` usa índices GIN sobre ``tsvector``, ``fts5`` usa la tabla
+    virtual FTS5 de SQLite y ``basico`` recurre a ``icontains``. Se resuelve
+    al abrir la primera conexión de cada base.
+    """
+    clave = (connection.alias, connection.settings_dict.get('NAME'))
+    if clave not in _motores:
+        _motores[clave] = _detectar_motor(connection)
+    return _motores[clave]
+
+
+@receiver(connection_created)
+def conexion_creada(sender, connection, **kwargs):
+    clave = (connection.alias, connection.settings_dict.get('NAME'))
+    if clave not in _motores:
+        _motores[clave] = _detectar_motor(connection)
+
+
+@receiver(post_migrate)
+def migracion_aplicada(sender, **kwargs):
+    # Las migraciones pueden crear o quitar la tabla FTS5
+    _motores.clear()
+
+
+def _terminos(texto):
+    return re.findall(r'\w+', texto.lower())
+
+
+def buscar_productos(queryset, texto, relevancia=True):
+    """
+    Filtra ``queryset`` por nombre, código, descripción y nombre del proveedor.
+
+    Cada palabra se busca como prefijo ("lap" encuentra "laptop") y los
+    resultados se ordenan por relevancia y luego por nombre; con
+    ``relevancia=False`` se conserva el orden de ``queryset``.
+    """
+    terminos = _terminos(texto)
+    if not terminos:
+        return queryset
+
+    motor = motor_busqueda()
+    if motor == 'postgres':
+        consulta = ' & '.join(f'{t}:*' for t in terminos)
+        # Unión de las dos coincidencias, cada una resuelta con su índice GIN
+        # (un OR entre ambas obliga a recorrer toda la tabla)
+        coincidencias = RawSQL(
+            f"SELECT id FROM mi_proyecto_productos WHERE {VECTOR_PRODUCTO} @@ to_tsquery('simple', %s) "
+            "UNION SELECT \"mi_proyecto_productos\".\"id\" FROM mi_proyecto_productos "
+            "JOIN mi_proyecto_proveedor ON \"mi_proyecto_proveedor\".\"id\" = \"mi_proyecto_productos\".\"proveedor_id\" "
+            f"WHERE {VECTOR_PROVEEDOR} @@ to_tsquery('simple', %s)",
+            [consulta, consulta],
+        )
+        coincide = queryset.filter(id__in=coincidencias)
+        if not relevancia:
+            return coincide
+        rango = RawSQL(f"ts_rank({VECTOR_RANGO}, to_tsquery('simple', %s))", [consulta], output_field=FloatField())
+        return coincide.annotate(rango=rango).order_by('-rango', 'nombre')
+
+    if motor == 'fts5':
+        consulta = ' '.join(f'"{t}"*' for t in terminos)
+        # Un solo join con la tabla FTS5: el MATCH se evalúa una vez y ``rank``
+        # (bm25, más bajo es más relevante) sale de la misma fila
+        coincide = queryset.extra(
+            tables=[TABLA_FTS],
+            where=[f'{TABLA_FTS}.rowid = "mi_proyecto_productos"."id"', f'{TABLA_FTS} MATCH %s'],
+            params=[consulta],
+        )
+        if not relevancia:
+            return coincide
+        return coincide.extra(select={'rango': f'{TABLA_FTS}.rank'}).order_by('rango', 'nombre')
+
+    filtro = Q()
+    for termino in terminos:
+        filtro &= (
+            Q(nombre__icontains=termino)
+            | Q(codigo__icontains=termino)
+            | Q(descripcion__icontains=termino)
+            | Q(proveedor__nombre__icontains=termino)
+        )
+    return queryset.filter(filtro)
@@ -0,0 +1,198 @@
+import hashlib
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.http import HttpResponse
+
+from .models import GeneracionCache, Productos, Proveedor, SalidaProducto, HistorialMovimiento
+from .senales import movimientos_registrados, productos_actualizados
+
+
+ALIAS_CACHE = 'vistas'
+
+MODELOS_OBSERVADOS = (Productos, Proveedor, SalidaProducto, HistorialMovimiento)
+
+_vistas_registradas = []
+
+
+def _cache():
+    return caches[ALIAS_CACHE]
+
+
+def _generaciones(modelos):
+    return dict(
+        GeneracionCache.objects.filter(modelo__in=[m._meta.label_lower for m in modelos])
+        .values_list('modelo', 'generacion')
+    )
+
+
+async def _ageneraciones(modelos):
+    return {
+        modelo: generacion
+        async for modelo, generacion in GeneracionCache.objects.filter(
+            modelo__in=[m._meta.label_lower for m in modelos]
+        ).values_list('modelo', 'generacion')
+    }
+
+
+def _clave_metrica(vista, resultado):
+    return f'metricas:{vista}:{resultado}'
+
+
+def invalidar_modelo(modelo):
+    """
+    Invalida las páginas que dependen de ``modelo``.
+
+    No se borran entradas: se incrementa la generación del modelo, que forma
+    parte de la clave de cada página, y las entradas viejas expiran solas. El
+    incremento es un UPDATE atómico en ``GeneracionCache``: dos invalidaciones
+    simultáneas suman dos.
+    """
+    generaciones = GeneracionCache.objects.filter(modelo=modelo._meta.label_lower)
+    if not generaciones.update(generacion=F('generacion') + 1):
+        GeneracionCache.objects.get_or_create(modelo=modelo._meta.label_lower)
+        generaciones.update(generacion=F('generacion') + 1)
+
+
+def _contar(vista, resultado):
+    cache = _cache()
+    clave = _clave_metrica(vista, resultado)
+    try:
+        cache.incr(clave)
+    except ValueError:
+        cache.set(clave, 1, timeout=None)
+
+
+def metricas():
+    """Aciertos y fallos por vista: {vista: {'hit': n, 'miss': n, 'ratio': 0..1}}."""
+    cache = _cache()
+    claves = [
+        _clave_metrica(vista, resultado)
+        for vista in _vistas_registradas
+        for resultado in ('hit', 'miss')
+    ]
+    valores = cache.get_many(claves)
+    resultado = {}
+    for vista in _vistas_registradas:
+        hit = valores.get(_clave_metrica(vista, 'hit'), 0)
+        miss = valores.get(_clave_metrica(vista, 'miss'), 0)
+        resultado[vista] = {'hit': hit, 'miss': miss, 'ratio': hit / (hit + miss) if hit + miss else None}
+    return resultado
+
+
+def reiniciar_metricas():
+    _cache().delete_many([
+        _clave_metrica(vista, resultado)
+        for vista in _vistas_registradas
+        for resultado in ('hit', 'miss')
+    ])
+
+
+def cache_vista(*modelos):
+    """
+    Guarda en caché la respuesta GET de una vista de listado.
+
+    La clave combina el nombre de la vista, los parámetros GET (filtros y
+    página) y la generación de cada modelo del que depende, así que cualquier
+    alta, edición o baja de esos modelos invalida sus páginas. La duración se
+    configura con ``CACHE_VISTAS_SEGUNDOS`` (0 la desactiva). Agrega la cabecera
+    ``X-Cache: HIT|MISS``. Acepta vistas ``async def``.
+    """
+    def decorador(vista):
+        nombre = vista.__name__
+        # Las versiones síncrona y async de una vista comparten nombre y páginas
+        if nombre not in _vistas_registradas:
+            _vistas_registradas.append(nombre)
+
+        def clave_pagina(request, kwargs, generaciones):
+            parametros = request.GET.urlencode() + repr(sorted(kwargs.items()))
+            return 'pagina:{}:{}:{}'.format(
+                nombre,
+                '.'.join(str(generaciones.get(m._meta.label_lower, 0)) for m in modelos),
+                hashlib.md5(parametros.encode()).hexdigest(),
+            )
+
+        def desde_cache(guardada):
+            contenido, tipo = guardada
+            respuesta = HttpResponse(contenido, content_type=tipo)
+            respuesta['X-Cache'] = 'HIT'
+            return respuesta
+
+        if iscoroutinefunction(vista):
+            @wraps(vista)
+            async def envoltura(request, *args, **kwargs):
+                segundos = getattr(settings, 'CACHE_VISTAS_SEGUNDOS', 0)
+                if request.method != 'GET' or not segundos:
+                    return await vista(request, *args, **kwargs)
+
+                cache = _cache()
+                generaciones = await _ageneraciones(modelos)
+                clave = clave_pagina(request, kwargs, generaciones)
+                guardada = await cache.aget(clave)
+                if guardada is not None:
+                    await sync_to_async(_contar)(nombre, 'hit')
+                    return desde_cache(guardada)
+
+                await sync_to_async(_contar)(nombre, 'miss')
+                respuesta = await vista(request, *args, **kwargs)
+                if respuesta.status_code == 200 and not respuesta.streaming:
+                    await cache.aset(clave, (respuesta.content, respuesta['Content-Type']), segundos)
+                respuesta['X-Cache'] = 'MISS'
+                return respuesta
+            return envoltura
+
+        @wraps(vista)
+        def envoltura(request, *args, **kwargs):
+            segundos = getattr(settings, 'CACHE_VISTAS_SEGUNDOS', 0)
+            if request.method != 'GET' or not segundos:
+                return vista(request, *args, **kwargs)
+
+            cache = _cache()
+            generaciones = _generaciones(modelos)
+            clave = clave_pagina(request, kwargs, generaciones)
+            guardada = cache.get(clave)
+            if guardada is not None:
+                _contar(nombre, 'hit')
+                return desde_cache(guardada)
+
+            _contar(nombre, 'miss')
+            respuesta = vista(request, *args, **kwargs)
+            if respuesta.status_code == 200 and not respuesta.streaming:
+                cache.set(clave, (respuesta.content, respuesta['Content-Type']), segundos)
+            respuesta['X-Cache'] = 'MISS'
+            return respuesta
+        return envoltura
+    return decorador
+
+
+def _al_confirmar_invalidar(modelo):
+    # robust: la escritura ya se confirmó; si la generación no se puede
+    # incrementar (p. ej. SQLite bloqueada) se registra el error y la página
+    # vieja dura a lo sumo CACHE_VISTAS_SEGUNDOS
+    transaction.on_commit(lambda: invalidar_modelo(modelo), robust=True)
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def _modelo_modificado(sender, **kwargs):
+    if sender in MODELOS_OBSERVADOS:
+        _al_confirmar_invalidar(sender)
+
+
+@receiver(productos_actualizados)
+def _productos_actualizados(sender, **kwargs):
+    # Las escrituras masivas (importación, documentos de salida) también crean
+    # proveedores, salidas e historial sin señales de modelo
+    for modelo in MODELOS_OBSERVADOS:
+        _al_confirmar_invalidar(modelo)
+
+
+@receiver(movimientos_registrados)
+def _movimientos_registrados(sender, **kwargs):
+    _al_confirmar_invalidar(HistorialMovimiento)
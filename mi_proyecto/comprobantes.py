@@ -0,0 +1,281 @@
+import asyncio
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+
+from django.conf import settings
+from django.utils import timezone
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.utils import simpleSplit
+from reportlab.pdfgen import canvas
+
+
+CARPETA = 'comprobantes'
+
+MARGEN = 72
+ANCHO_TEXTO = letter[0] - 2 * MARGEN
+ALTO_LINEA = 16
+# Espacio reservado al pie de cada página para la firma
+LIMITE_INFERIOR = 150
+
+# Por debajo de esta cantidad no compensa levantar procesos
+MIN_LOTE_PROCESOS = 50
+TAMANO_TAREA = 25
+
+
+def datos_salida(salida):
+    """Datos de la salida necesarios para el comprobante, como valores simples (serializables)."""
+    return {
+        'id': salida.id,
+        'fecha': timezone.localtime(salida.fecha_salida).strftime('%d/%m/%Y %H:%M'),
+        'producto': salida.producto.nombre,
+        'codigo': salida.producto.codigo,
+        'cantidad': salida.cantidad,
+        'motivo': salida.get_motivo_display(),
+        'descripcion': salida.descripcion or '',
+        'usuario': salida.usuario.username if salida.usuario else 'Sistema',
+        'documento': salida.documento_id,
+    }
+
+
+def _dibujar(p, datos):
+    """Dibuja un comprobante a partir de la página actual del canvas."""
+    alto = letter[1]
+    y = alto - 42
+
+    def linea(texto, fuente='Helvetica', tamano=12, salto=ALTO_LINEA):
+        nonlocal y
+        if y < LIMITE_INFERIOR:
+            p.showPage()
+            y = alto - 42
+        p.setFont(fuente, tamano)
+        p.drawString(MARGEN, y, texto)
+        y -= salto
+
+    # Encabezado
+    linea("Comprobante de Salida de Producto", "Helvetica-Bold", 16, 20)
+    linea(f"Fecha: {datos['fecha']}", salto=30)
+
+    # Información del producto
+    linea("Detalles del Producto:", "Helvetica-Bold", salto=20)
+    linea(f"Producto: {datos['producto']}", salto=20)
+    linea(f"Código: {datos['codigo']}", salto=20)
+    linea(f"Cantidad: {datos['cantidad']}", salto=20)
+    linea(f"Motivo: {datos['motivo']}", salto=20)
+    if datos['documento']:
+        linea(f"Documento: {datos['documento']}", salto=20)
+
+    # Descripción multilínea: las líneas largas se parten al ancho de la página
+    if datos['descripcion']:
+        linea("Descripción:", "Helvetica-Bold", salto=20)
+        for parrafo in datos['descripcion'].splitlines():
+            for texto in simpleSplit(parrafo, 'Helvetica', 12, ANCHO_TEXTO) or ['']:
+                linea(texto)
+
+    # Usuario: va a continuación del contenido, nunca en una posición fija
+    y -= 14
+    if y < LIMITE_INFERIOR + 20:
+        p.showPage()
+        y = alto - 42
+    linea("Registrado por:", "Helvetica-Bold", salto=20)
+    linea(f"Usuario: {datos['usuario']}")
+
+    # Firma
+    p.setFont("Helvetica", 10)
+    p.drawString(MARGEN, 120, "Firma del Responsable: ________________________")
+    p.showPage()
+
+
+def renderizar(datos):
+    """PDF de un comprobante, como bytes."""
+    buffer = BytesIO()
+    p = canvas.Canvas(buffer, pagesize=letter)
+    p.setTitle(f"Comprobante de Salida - {datos['producto']}")
+    _dibujar(p, datos)
+    p.save()
+    return buffer.getvalue()
+
+
+def renderizar_varios(lista_datos, destino):
+    """Escribe varios comprobantes en un único PDF de varias páginas (``destino``: archivo o ruta)."""
+    p = canvas.Canvas(destino, pagesize=letter)
+    p.setTitle("Comprobantes de Salida")
+    for datos in lista_datos:
+        _dibujar(p, datos)
+    p.save()
+
+
+def ruta_comprobante(salida_id):
+    return os.path.join(settings.MEDIA_ROOT, CARPETA, f'salida_{salida_id}.pdf')
+
+
+def _guardar(ruta, contenido):
+    # Se escribe en un temporal y se renombra para no dejar archivos a medias
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    descriptor, temporal = tempfile.mkstemp(dir=os.path.dirname(ruta), suffix='.tmp')
+    with os.fdopen(descriptor, 'wb') as archivo:
+        archivo.write(contenido)
+    os.replace(temporal, ruta)
+
+
+def _renderizar_en_disco(tareas):
+    # Se ejecuta en los procesos del pool: solo usa reportlab y el sistema de archivos
+    for datos, ruta in tareas:
+        _guardar(ruta, renderizar(datos))
+
+
+def obtener_comprobante(salida):
+    """
+    Ruta del PDF de la salida, generándolo si todavía no está en disco.
+
+    Un comprobante no cambia una vez registrado, así que se genera una sola vez.
+    """
+    ruta = ruta_comprobante(salida.id)
+    if not os.path.exists(ruta):
+        _guardar(ruta, renderizar(datos_salida(salida)))
+    return ruta
+
+
+_pool = None
+
+
+def _terminar_con_el_padre(padre):
+    # Se ejecuta al iniciar cada proceso del pool: si el worker web muere por una
+    # señal el pool no se cierra, y el proceso quedaría huérfano esperando tareas
+    def vigilar():
+        while os.getppid() == padre:
+            time.sleep(1)
+        os._exit(0)
+
+    threading.Thread(target=vigilar, daemon=True).start()
+
+
+def _cantidad_procesos():
+    return getattr(settings, 'COMPROBANTES_PROCESOS', None) or os.cpu_count() or 1
+
+
+def _pool_procesos():
+    # Un pool por proceso web, creado con la primera petición y compartido por
+    # los comprobantes sueltos y los lotes. Con "spawn": bajo ASGI el proceso ya
+    # tiene hilos y un event loop, y fork solo copiaría el hilo actual
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=_cantidad_procesos(),
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_terminar_con_el_padre,
+            initargs=(os.getpid(),),
+        )
+    return _pool
+
+
+def _descartar_pool(pool):
+    # Si un proceso del pool muere (p. ej. por falta de memoria) el pool queda
+    # roto para siempre: se descarta y la próxima petición crea uno nuevo
+    global _pool
+    if _pool is pool:
+        _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+async def aobtener_comprobante(salida):
+    """
+    Versión async de ``obtener_comprobante``: el PDF se dibuja en un pool de
+    procesos para que reportlab no compita por el GIL con las demás peticiones.
+    """
+    ruta = ruta_comprobante(salida.id)
+    if not os.path.exists(ruta):
+        pool = _pool_procesos()
+        try:
+            contenido = await asyncio.get_running_loop().run_in_executor(pool, renderizar, datos_salida(salida))
+        except BrokenProcessPool:
+            _descartar_pool(pool)
+            raise
+        await asyncio.to_thread(_guardar, ruta, contenido)
+    return ruta
+
+
+def invalidar_comprobante(salida_id):
+    try:
+        os.remove(ruta_comprobante(salida_id))
+    except FileNotFoundError:
+        pass
+
+
+def salida_modificada(sender, instance, created=False, **kwargs):
+    # Receptor de post_save/post_delete de SalidaProducto (se conecta en apps.py)
+    if not created:
+        invalidar_comprobante(instance.id)
+
+
+def generar_faltantes(salidas, procesos=None):
+    """
+    Genera en disco los comprobantes que falten y devuelve las rutas en el orden de ``salidas``.
+
+    Los lotes grandes se reparten entre los procesos del pool compartido
+    (``COMPROBANTES_PROCESOS``); ``procesos=1`` los genera en este proceso.
+    """
+    salidas = list(salidas)
+    faltantes = [
+        (datos_salida(s), ruta_comprobante(s.id))
+        for s in salidas
+        if not os.path.exists(ruta_comprobante(s.id))
+    ]
+    if faltantes:
+        procesos = procesos or _cantidad_procesos()
+        tareas = [faltantes[i:i + TAMANO_TAREA] for i in range(0, len(faltantes), TAMANO_TAREA)]
+        if procesos > 1 and len(faltantes) >= MIN_LOTE_PROCESOS:
+            pool = _pool_procesos()
+            try:
+                list(pool.map(_renderizar_en_disco, tareas))
+            except BrokenProcessPool:
+                _descartar_pool(pool)
+                raise
+        else:
+            for tarea in tareas:
+                _renderizar_en_disco(tarea)
+    return [ruta_comprobante(s.id) for s in salidas]
+
+
+def combinar(salidas, destino, procesos=None):
+    """
+    Escribe en ``destino`` un único PDF con el comprobante de cada salida.
+
+    Los lotes grandes se dibujan en un proceso del pool compartido, a un
+    temporal con nombre que luego se copia a ``destino``: reportlab no ocupa
+    el GIL del proceso web mientras tanto. ``procesos=1`` lo dibuja aquí.
+    """
+    lista_datos = [datos_salida(s) for s in salidas]
+    procesos = procesos or _cantidad_procesos()
+    if procesos <= 1 or len(lista_datos) < MIN_LOTE_PROCESOS:
+        renderizar_varios(lista_datos, destino)
+        return
+    descriptor, temporal = tempfile.mkstemp(suffix='.pdf')
+    os.close(descriptor)
+    try:
+        pool = _pool_procesos()
+        try:
+            pool.submit(renderizar_varios, lista_datos, temporal).result()
+        except BrokenProcessPool:
+            _descartar_pool(pool)
+            raise
+        with open(temporal, 'rb') as archivo:
+            shutil.copyfileobj(archivo, destino)
+    finally:
+        os.remove(temporal)
+
+
+def comprimir(salidas, destino, procesos=None):
+    """Escribe en ``destino`` un ZIP con el comprobante de cada salida."""
+    rutas = generar_faltantes(salidas, procesos)
+    # Los PDF ya están comprimidos: se guardan sin volver a comprimir
+    with zipfile.ZipFile(destino, 'w', zipfile.ZIP_STORED) as archivo_zip:
+        for ruta in rutas:
+            archivo_zip.write(ruta, os.path.basename(ruta))
@@ -0,0 +1,89 @@
+import logging
+from contextlib import contextmanager
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import connection
+
+from .asincrono import envolver_consultas
+
+
+logger = logging.getLogger(__name__)
+
+
+class PresupuestoExcedido(AssertionError):
+    pass
+
+
+class ContadorConsultas:
+    """Cuenta las consultas SQL ejecutadas mientras está instalado en la conexión."""
+
+    def __init__(self):
+        self.total = 0
+        self.sqls = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.total += 1
+        self.sqls.append(sql)
+        return execute(sql, params, many, context)
+
+
+@contextmanager
+def limite_consultas(maximo, nombre='bloque'):
+    """
+    Falla con ``PresupuestoExcedido`` si el bloque ejecuta más de ``maximo`` consultas.
+
+    Pensado para pruebas::
+
+        with limite_consultas(3):
+            client.get(reverse('lista_productos'))
+    """
+    contador = ContadorConsultas()
+    with connection.execute_wrapper(contador):
+        yield contador
+    if contador.total > maximo:
+        raise PresupuestoExcedido(
+            f"{nombre} ejecutó {contador.total} consultas (presupuesto: {maximo}):\n"
+            + "\n".join(contador.sqls)
+        )
+
+
+def presupuesto_consultas(maximo):
+    """
+    Declara la cantidad máxima de consultas SQL que puede ejecutar una vista.
+
+    Si la vista se pasa del presupuesto se registra una advertencia en el log;
+    con ``PRESUPUESTO_CONSULTAS_ESTRICTO = True`` (por ejemplo en pruebas) se
+    lanza ``PresupuestoExcedido``. Debe ir debajo de ``@login_required`` para no
+    contar las consultas de sesión y autenticación. Acepta vistas ``async def``.
+    """
+    def decorador(vista):
+        def revisar(contador):
+            if contador.total > maximo:
+                mensaje = (
+                    f"La vista {vista.__name__} ejecutó {contador.total} consultas "
+                    f"(presupuesto: {maximo})"
+                )
+                if getattr(settings, 'PRESUPUESTO_CONSULTAS_ESTRICTO', False):
+                    raise PresupuestoExcedido(mensaje + ":\n" + "\n".join(contador.sqls))
+                logger.warning(mensaje)
+
+        if iscoroutinefunction(vista):
+            @wraps(vista)
+            async def envoltura(request, *args, **kwargs):
+                async with envolver_consultas(ContadorConsultas()) as contador:
+                    respuesta = await vista(request, *args, **kwargs)
+                revisar(contador)
+                return respuesta
+        else:
+            @wraps(vista)
+            def envoltura(request, *args, **kwargs):
+                contador = ContadorConsultas()
+                with connection.execute_wrapper(contador):
+                    respuesta = vista(request, *args, **kwargs)
+                revisar(contador)
+                return respuesta
+        envoltura.presupuesto_consultas = maximo
+        return envoltura
+    return decorador
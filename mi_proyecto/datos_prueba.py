@@ -0,0 +1,522 @@
+import io
+import math
+import random
+from array import array
+from contextlib import contextmanager
+from datetime import datetime, time, timedelta, timezone as tz
+from decimal import Decimal
+from itertools import accumulate
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import Max
+from django.utils import timezone
+from openpyxl import Workbook
+
+from .models import Productos, Proveedor, SalidaProducto, HistorialMovimiento, MovimientoStock
+from .precios import aplicar_precios, calcular_precio, cargar_reglas, margen_para
+from .senales import productos_actualizados
+
+
+TAMANO_LOTE = 5000
+
+
+@contextmanager
+def _sin_auto_now(*campos):
+    """Desactiva ``auto_now_add`` para poder sembrar fechas distribuidas en el tiempo."""
+    for campo in campos:
+        campo.auto_now_add = False
+    try:
+        yield
+    finally:
+        for campo in campos:
+            campo.auto_now_add = True
+
+
+def _por_lotes(modelo, objetos, tamano_lote=TAMANO_LOTE):
+    lote = []
+    for objeto in objetos:
+        lote.append(objeto)
+        if len(lote) >= tamano_lote:
+            modelo.objects.bulk_create(lote)
+            lote = []
+    if lote:
+        modelo.objects.bulk_create(lote)
+
+
+def _libro_de_salidas(desde_id):
+    """
+    Movimientos ``SALIDA`` del libro de stock de las salidas con id mayor que
+    ``desde_id``, con un INSERT ... SELECT sin cargar las salidas. Devuelve
+    cuántos escribió.
+    """
+    qn = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {qn(MovimientoStock._meta.db_table)} '
+            f'({qn("producto_id")}, {qn("cantidad")}, {qn("motivo")}, {qn("origen")}, {qn("usuario_id")}, {qn("fecha")}) '
+            f"SELECT {qn('producto_id')}, -{qn('cantidad')}, 'SALIDA', 'salida:' || {qn('id')}, "
+            f"{qn('usuario_id')}, {qn('fecha_salida')} "
+            f'FROM {qn(SalidaProducto._meta.db_table)} WHERE {qn("id")} > %s',
+            [desde_id],
+        )
+        return cursor.rowcount
+
+
+def _ultima_salida():
+    return SalidaProducto.objects.aggregate(ultima=Max('id'))['ultima'] or 0
+
+
+def sembrar(productos=1000, proveedores=50, salidas=1000, movimientos=5000, dias=365, semilla=0, prefijo='SEED'):
+    """
+    Genera datos de prueba con ``bulk_create`` y una semilla fija (resultados reproducibles).
+
+    Las fechas de salidas y movimientos se reparten sobre los últimos ``dias``.
+    Cada salida descuenta del stock de su producto, sin dejarlo negativo, y
+    queda en el libro de stock como en ``SalidaProducto.save``.
+    """
+    rnd = random.Random(semilla)
+    ahora = timezone.now()
+    categorias = [cat[0] for cat in Productos.CATEGORIAS]
+    motivos = [motivo[0] for motivo in SalidaProducto.MOTIVOS]
+    tipos = [tipo[0] for tipo in HistorialMovimiento.TIPO_MOVIMIENTO]
+    usuario, _ = User.objects.get_or_create(username=f'{prefijo.lower()}_usuario')
+
+    _por_lotes(Proveedor, (
+        Proveedor(
+            nombre=f'{prefijo} Proveedor {i}',
+            direccion=f'Calle {i}',
+            telefono=f'0000-{i:04d}',
+            email=f'proveedor{i}@ejemplo.com',
+        )
+        for i in range(proveedores)
+    ))
+    proveedor_ids = list(
+        Proveedor.objects.filter(nombre__startswith=f'{prefijo} Proveedor ').values_list('id', flat=True)
+    )
+
+    reglas = cargar_reglas()
+    _por_lotes(Productos, (
+        aplicar_precios([Productos(
+            nombre=f'{prefijo} Producto {i}',
+            codigo=f'{prefijo}-{i:08d}',
+            descripcion=f'Producto generado {i}',
+            costo=Decimal(rnd.randint(1000, 200000)) / 100,
+            stock=rnd.randint(0, 200),
+            categoria=rnd.choice(categorias),
+            activo=rnd.random() > 0.05,
+            proveedor_id=rnd.choice(proveedor_ids) if proveedor_ids else None,
+        )], reglas)[0]
+        for i in range(productos)
+    ))
+    stocks = dict(
+        Productos.objects.filter(codigo__startswith=f'{prefijo}-').order_by('id').values_list('id', 'stock')
+    )
+    producto_ids = list(stocks)
+    if not producto_ids:
+        return
+
+    # Stock inicial en el libro de stock, al comienzo del período sembrado
+    _por_lotes(MovimientoStock, (
+        MovimientoStock(producto_id=producto_id, cantidad=stock, motivo='INICIAL', origen='sembrado', fecha=ahora - timedelta(days=dias))
+        for producto_id, stock in stocks.items() if stock
+    ))
+
+    def fecha_aleatoria():
+        return ahora - timedelta(seconds=rnd.randint(0, dias * 86400))
+
+    con_stock = [producto_id for producto_id, stock in stocks.items() if stock]
+    vendidos = set()
+
+    def salidas_con_stock():
+        # Sin stock en ningún producto se siembran menos salidas que las pedidas
+        for _ in range(salidas):
+            if not con_stock:
+                return
+            posicion = rnd.randrange(len(con_stock))
+            producto_id = con_stock[posicion]
+            cantidad = min(rnd.randint(1, 10), stocks[producto_id])
+            stocks[producto_id] -= cantidad
+            vendidos.add(producto_id)
+            if not stocks[producto_id]:
+                con_stock[posicion] = con_stock[-1]
+                con_stock.pop()
+            yield SalidaProducto(
+                producto_id=producto_id,
+                cantidad=cantidad,
+                motivo=rnd.choice(motivos),
+                fecha_salida=fecha_aleatoria(),
+                usuario=usuario,
+            )
+
+    ultima_salida = _ultima_salida()
+    with _sin_auto_now(SalidaProducto._meta.get_field('fecha_salida')):
+        _por_lotes(SalidaProducto, salidas_con_stock())
+    _libro_de_salidas(ultima_salida)
+    Productos.objects.bulk_update(
+        [Productos(id=producto_id, stock=stocks[producto_id]) for producto_id in sorted(vendidos)],
+        ['stock'], batch_size=TAMANO_LOTE,
+    )
+
+    _por_lotes(HistorialMovimiento, (
+        HistorialMovimiento(
+            producto_id=producto_id,
+            nombre_producto=f'{prefijo} Producto {producto_id}',
+            serial_producto=f'{prefijo}-{producto_id:08d}',
+            usuario=usuario,
+            tipo_movimiento=rnd.choice(tipos),
+            fecha_movimiento=fecha_aleatoria(),
+            detalles='Movimiento generado',
+        )
+        for producto_id in (rnd.choice(producto_ids) for _ in range(movimientos))
+    ))
+
+    # bulk_create no envía señales: agregados y páginas en caché se recalculan al confirmar
+    productos_actualizados.send(sender=Productos, cambios=None)
+
+
+# Inventario realista a gran escala (comando sembrar_inventario) ###############
+
+TAMANO_COPIA = 50000
+
+# Pesos relativos de cada valor en el inventario generado
+PESOS_CATEGORIA = {'PERIFERICOS': 50, 'COMPUTADORAS': 20, 'LAPTOPS': 20, 'UPS': 10}
+PESOS_MOTIVO = {'VENTA': 85, 'GARANTIA': 6, 'DEVOLUCION': 4, 'DONACION': 2, 'OTRO': 3}
+PESOS_TIPO = {'SALIDA': 55, 'EDICION': 30, 'CREACION': 8, 'DESHABILITACION': 4, 'ELIMINACION': 3}
+# Lunes a domingo, y de 0 a 23 horas: actividad de comercio en horario de oficina
+PESOS_DIA_SEMANA = (1.0, 1.05, 1.05, 1.1, 1.2, 0.6, 0.25)
+PESOS_HORA = (0, 0, 0, 0, 0, 0, 1, 3, 8, 10, 10, 9, 6, 7, 9, 9, 8, 6, 3, 2, 1, 1, 0, 0)
+
+# Costo mediano y dispersión (log-normal) por categoría
+COSTOS = {'PERIFERICOS': (35, 0.8), 'COMPUTADORAS': (900, 0.5), 'LAPTOPS': (1100, 0.45), 'UPS': (180, 0.6)}
+TIPOS_PRODUCTO = {
+    'PERIFERICOS': ('Teclado', 'Mouse', 'Monitor', 'Audífonos', 'Webcam', 'Impresora', 'Parlantes', 'Disco externo'),
+    'COMPUTADORAS': ('Desktop', 'All in One', 'Mini PC', 'Workstation', 'Servidor torre'),
+    'LAPTOPS': ('Notebook', 'Ultrabook', 'Laptop gamer', 'Convertible', 'Chromebook'),
+    'UPS': ('UPS interactiva', 'UPS online', 'Regulador', 'Batería de respaldo'),
+}
+MARCAS = ('HP', 'Dell', 'Lenovo', 'Asus', 'Acer', 'Samsung', 'LG', 'Logitech', 'APC', 'Epson', 'Genius', 'Forza')
+CREACION_PRODUCTOS = 'sembrado'
+
+_CATEGORIAS = list(PESOS_CATEGORIA)
+_PESOS_CATEGORIA = list(accumulate(PESOS_CATEGORIA.values()))
+
+
+def _zipf(n, exponente=1.0):
+    """Pesos acumulados de una distribución de Zipf: pocos elementos concentran la mayoría de los usos."""
+    return list(accumulate(1 / (rango + 1) ** exponente for rango in range(n)))
+
+
+def _nombre_producto(i, categoria):
+    # Determinista a partir del número de producto: el historial lo repite sin guardarlo
+    tipos = TIPOS_PRODUCTO[categoria]
+    return f'{tipos[i % len(tipos)]} {MARCAS[(i // 7) % len(MARCAS)]} {chr(65 + i % 26)}{i % 9973}'
+
+
+def _codigo(prefijo, i):
+    return f'{prefijo}-{i:08d}'
+
+
+def _producto(semilla, i, prefijo):
+    """
+    (codigo, nombre, descripcion, costo, stock, categoria) del producto ``i``.
+
+    Usa su propio generador a partir de la semilla y el número de producto:
+    el Excel de importación repite los mismos productos que el inventario.
+    """
+    rnd = random.Random(semilla * 10_000_019 + i)
+    categoria = rnd.choices(_CATEGORIAS, cum_weights=_PESOS_CATEGORIA)[0]
+    mediana, dispersion = COSTOS[categoria]
+    costo = Decimal(int(rnd.lognormvariate(math.log(mediana), dispersion) * 100) or 1) / 100
+    # La mayoría con pocas unidades, algunos agotados y pocos con mucho stock
+    stock = 0 if rnd.random() < 0.08 else min(int(rnd.expovariate(1 / 25)) + 1, 1000)
+    nombre = _nombre_producto(i, categoria)
+    return _codigo(prefijo, i), nombre, f'{nombre} - {categoria.lower()}', costo, stock, categoria
+
+
+def _valor_copy(valor):
+    if valor is None:
+        return '\\N'
+    if isinstance(valor, bool):
+        return 't' if valor else 'f'
+    if isinstance(valor, datetime):
+        # Las horas se generan en UTC sin zona
+        return valor.isoformat(' ') + '+00'
+    return str(valor).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+
+def escribir_filas(modelo, columnas, filas, tamano_lote=TAMANO_COPIA, al_avanzar=None):
+    """
+    Inserta ``filas`` (tuplas en el orden de ``columnas``) sin crear instancias
+    del modelo: con COPY en PostgreSQL y ``executemany`` en las demás bases.
+
+    Las fechas y horas deben venir en UTC sin zona horaria. No envía señales.
+    Llama a ``al_avanzar(escritas)`` después de cada lote y devuelve el total.
+    """
+    tabla = modelo._meta.db_table
+    qn = connection.ops.quote_name
+    lista = ', '.join(qn(columna) for columna in columnas)
+    copiar = connection.vendor == 'postgresql'
+    sql = (
+        f'COPY {qn(tabla)} ({lista}) FROM STDIN'
+        if copiar else
+        f"INSERT INTO {qn(tabla)} ({lista}) VALUES ({', '.join(['%s'] * len(columnas))})"
+    )
+    escritas = 0
+    lote = []
+    with connection.cursor() as cursor:
+        def escribir():
+            if copiar:
+                datos = io.StringIO(''.join('\t'.join(map(_valor_copy, fila)) + '\n' for fila in lote))
+                cursor.copy_expert(sql, datos)
+            else:
+                cursor.executemany(sql, lote)
+
+        for fila in filas:
+            lote.append(fila)
+            if len(lote) >= tamano_lote:
+                escribir()
+                escritas += len(lote)
+                lote = []
+                if al_avanzar:
+                    al_avanzar(escritas)
+        if lote:
+            escribir()
+            escritas += len(lote)
+            if al_avanzar:
+                al_avanzar(escritas)
+    return escritas
+
+
+class _Calendario:
+    """
+    Fechas con más actividad en días hábiles, horario de oficina y en los meses recientes.
+
+    Se generan en orden cronológico, como en producción: los ids crecen con la
+    fecha y los índices por fecha se llenan al final, que es mucho más rápido
+    que insertar en posiciones al azar.
+    """
+
+    def __init__(self, rnd, dias):
+        self.rnd = rnd
+        hoy = timezone.localdate()
+        self.ahora = timezone.now().astimezone(tz.utc).replace(tzinfo=None)
+        self.inicios = []
+        self.pesos = []
+        for d in range(dias):
+            fecha = hoy - timedelta(days=dias - 1 - d)
+            inicio = timezone.make_aware(datetime.combine(fecha, time.min))
+            self.inicios.append(inicio.astimezone(tz.utc).replace(tzinfo=None))
+            # La actividad crece con el tiempo: el último día duplica al primero
+            self.pesos.append((1 + d / max(dias - 1, 1)) * PESOS_DIA_SEMANA[fecha.weekday()])
+        self.horas = list(accumulate(PESOS_HORA))
+
+    def por_dia(self, total):
+        """Reparte ``total`` fechas entre los días y las devuelve ordenadas, una lista por día."""
+        rnd = self.rnd
+        suma = sum(self.pesos)
+        pendientes = total
+        for d, (inicio, peso) in enumerate(zip(self.inicios, self.pesos)):
+            if d == len(self.inicios) - 1:
+                cantidad = pendientes
+            else:
+                cuota = total * peso / suma
+                cantidad = min(int(cuota) + (rnd.random() < cuota % 1), pendientes)
+            pendientes -= cantidad
+            if not cantidad:
+                continue
+            horas = rnd.choices(range(24), cum_weights=self.horas, k=cantidad)
+            segundos = sorted(h * 3600 + rnd.randrange(3600) for h in horas)
+            if inicio + timedelta(seconds=segundos[-1]) > self.ahora:
+                # Hoy: solo las horas ya transcurridas
+                transcurridos = (self.ahora - inicio).total_seconds()
+                segundos = sorted(rnd.random() * transcurridos for _ in range(cantidad))
+            yield [inicio + timedelta(seconds=s) for s in segundos]
+
+
+def sembrar_inventario(
+    productos=100000, proveedores=500, salidas=1000000, movimientos=1000000, dias=730,
+    semilla=0, prefijo='INV', usuarios=20, al_avanzar=None,
+):
+    """
+    Genera un inventario grande con distribuciones realistas y una semilla fija.
+
+    - Categorías, costos (log-normal por categoría) y stock con pesos fijos;
+      el 3% de los productos queda inactivo.
+    - Proveedores, productos y usuarios con popularidad de Zipf: pocos
+      concentran la mayoría de las salidas y movimientos.
+    - Fechas en los últimos ``dias``, con más actividad en días hábiles, en
+      horario de oficina y en los meses recientes.
+
+    Escribe con ``escribir_filas`` (COPY en PostgreSQL), sin instancias ni
+    señales de modelo; el stock inicial y las salidas quedan en el libro de
+    stock, y su suma es el stock de cada producto. Debe
+    ejecutarse dentro de una transacción: al confirmarla se recalculan los
+    agregados y las páginas en caché. ``al_avanzar(tabla, escritas, total)``
+    informa el progreso. Devuelve las filas escritas por tabla.
+    """
+    rnd = random.Random(semilla)
+    calendario = _Calendario(rnd, dias)
+    escritas = {}
+
+    def progreso(tabla, total):
+        if al_avanzar is None:
+            return None
+        return lambda hechas: al_avanzar(tabla, hechas, total)
+
+    usuario_ids = [
+        User.objects.get_or_create(username=f'{prefijo.lower()}_usuario{n}')[0].id for n in range(usuarios)
+    ]
+    pesos_usuario = _zipf(len(usuario_ids), 0.8)
+
+    escritas['proveedores'] = escribir_filas(
+        Proveedor, ('nombre', 'contacto', 'direccion', 'telefono', 'email'),
+        (
+            (f'{prefijo} Proveedor {i}', f'Contacto {i}', f'Calle {i}', f'0212-{i:07d}', f'ventas{i}@proveedor{i}.com')
+            for i in range(proveedores)
+        ),
+        al_avanzar=progreso('proveedores', proveedores),
+    )
+    proveedor_ids = list(
+        Proveedor.objects.filter(nombre__startswith=f'{prefijo} Proveedor ').order_by('id').values_list('id', flat=True)
+    )
+    pesos_proveedor = _zipf(len(proveedor_ids), 1.1) if proveedor_ids else None
+
+    reglas = cargar_reglas()
+    stocks = array('i')
+    categorias_producto = bytearray()
+    primer_dia = calendario.inicios[0].date() if calendario.inicios else timezone.localdate()
+
+    def filas_productos():
+        for i in range(productos):
+            codigo, nombre, descripcion, costo, stock, categoria = _producto(semilla, i, prefijo)
+            proveedor_id = rnd.choices(proveedor_ids, cum_weights=pesos_proveedor)[0] if proveedor_ids else None
+            stocks.append(stock)
+            categorias_producto.append(_CATEGORIAS.index(categoria))
+            yield (
+                nombre, codigo, descripcion, costo,
+                calcular_precio(costo, margen_para(categoria, proveedor_id, reglas)),
+                stock, categoria, rnd.random() > 0.03,
+                primer_dia + timedelta(days=rnd.randrange(max(dias, 1))), proveedor_id,
+            )
+
+    escritas['productos'] = escribir_filas(
+        Productos,
+        ('nombre', 'codigo', 'descripcion', 'costo', 'precio', 'stock', 'categoria', 'activo', 'fecha_ingreso', 'proveedor_id'),
+        filas_productos(),
+        al_avanzar=progreso('productos', productos),
+    )
+    # El código lleva el número de producto con ceros: ordenar por código da el orden de creación
+    producto_ids = list(
+        Productos.objects.filter(codigo__startswith=f'{prefijo}-').order_by('codigo').values_list('id', flat=True)
+    )
+    if not producto_ids:
+        return escritas
+
+    # Popularidad sin relación con el número de producto
+    indices = list(range(len(producto_ids)))
+    rnd.shuffle(indices)
+    pesos_producto = _zipf(len(indices))
+
+    def muestra(total):
+        # Por día: (productos, usuarios, fechas) elegidos según su popularidad
+        for fechas in calendario.por_dia(total):
+            cantidad = len(fechas)
+            yield (
+                rnd.choices(indices, cum_weights=pesos_producto, k=cantidad),
+                rnd.choices(usuario_ids, cum_weights=pesos_usuario, k=cantidad),
+                fechas,
+            )
+
+    motivos = list(PESOS_MOTIVO)
+    pesos_motivo = list(accumulate(PESOS_MOTIVO.values()))
+
+    vendidas = array('i', bytes(4 * len(producto_ids)))
+
+    def filas_salidas():
+        for elegidos, usuarios_lote, fechas in muestra(salidas):
+            motivos_lote = rnd.choices(motivos, cum_weights=pesos_motivo, k=len(fechas))
+            for i, usuario_id, fecha, motivo in zip(elegidos, usuarios_lote, fechas, motivos_lote):
+                unidades = min(1 + int(rnd.expovariate(0.8)), 50)
+                vendidas[i] += unidades
+                yield producto_ids[i], unidades, motivo, '', fecha, usuario_id, None
+
+    ultima_salida = _ultima_salida()
+    escritas['salidas'] = escribir_filas(
+        SalidaProducto,
+        ('producto_id', 'cantidad', 'motivo', 'descripcion', 'fecha_salida', 'usuario_id', 'documento_id'),
+        filas_salidas(),
+        al_avanzar=progreso('salidas', salidas),
+    )
+
+    # Los productos ya están escritos con su stock actual: el inicial, al comienzo
+    # del período, incluye lo que salió después, y cada salida lo descuenta en el libro
+    inicio_periodo = calendario.inicios[0] if calendario.inicios else calendario.ahora
+    escritas['libro de stock'] = escribir_filas(
+        MovimientoStock, ('producto_id', 'cantidad', 'motivo', 'origen', 'usuario_id', 'fecha'),
+        (
+            (producto_id, stock + vendida, 'INICIAL', CREACION_PRODUCTOS, None, inicio_periodo)
+            for producto_id, stock, vendida in zip(producto_ids, stocks, vendidas) if stock + vendida
+        ),
+        al_avanzar=progreso('libro de stock', productos),
+    )
+    escritas['libro de stock'] += _libro_de_salidas(ultima_salida)
+
+    tipos = list(PESOS_TIPO)
+    pesos_tipo = list(accumulate(PESOS_TIPO.values()))
+    detalles = {
+        'SALIDA': 'Salida de {} unidades',
+        'EDICION': 'Actualización de datos del producto',
+        'CREACION': 'Creación de producto',
+        'DESHABILITACION': 'Producto deshabilitado',
+        'ELIMINACION': 'Eliminación de producto',
+    }
+
+    def filas_historial():
+        for elegidos, usuarios_lote, fechas in muestra(movimientos):
+            tipos_lote = rnd.choices(tipos, cum_weights=pesos_tipo, k=len(fechas))
+            for i, usuario_id, fecha, tipo in zip(elegidos, usuarios_lote, fechas, tipos_lote):
+                nombre = _nombre_producto(i, _CATEGORIAS[categorias_producto[i]])
+                yield (
+                    None if tipo == 'ELIMINACION' else producto_ids[i], nombre, _codigo(prefijo, i),
+                    usuario_id, tipo, fecha, detalles[tipo].format(1 + int(rnd.expovariate(0.8))), None,
+                )
+
+    escritas['historial'] = escribir_filas(
+        HistorialMovimiento,
+        ('producto_id', 'nombre_producto', 'serial_producto', 'usuario_id', 'tipo_movimiento',
+         'fecha_movimiento', 'detalles', 'evento'),
+        filas_historial(),
+        al_avanzar=progreso('historial', movimientos),
+    )
+
+    # Las escrituras directas no envían señales
+    productos_actualizados.send(sender=Productos, cambios=None)
+    return escritas
+
+
+def escribir_excel(ruta, filas, prefijo='INV', proveedores=500, semilla=0):
+    """
+    Escribe un Excel con el formato de ``importar_excel``.
+
+    Las filas son los productos de ``sembrar_inventario`` con la misma
+    semilla y prefijo, con otro costo y stock: las de productos ya sembrados
+    los actualizan y el resto los crea. Usa el modo de solo escritura de
+    openpyxl, con memoria constante.
+    """
+    rnd = random.Random(semilla + 1)
+    pesos_proveedor = _zipf(proveedores, 1.1) if proveedores else None
+    libro = Workbook(write_only=True)
+    hoja = libro.create_sheet('Productos')
+    hoja.append(['Código', 'Nombre', 'Descripción', 'Precio', 'Stock', 'Categoría', 'Proveedor'])
+    for i in range(filas):
+        codigo, nombre, descripcion, costo, stock, categoria = _producto(semilla, i, prefijo)
+        costo = float(costo) * rnd.uniform(0.9, 1.15)
+        stock = max(stock + rnd.randint(-5, 20), 0)
+        proveedor = (
+            f'{prefijo} Proveedor {rnd.choices(range(proveedores), cum_weights=pesos_proveedor)[0]}'
+            if proveedores else None
+        )
+        hoja.append([codigo, nombre, descripcion, round(costo, 2), stock, categoria, proveedor])
+    libro.save(ruta)
+    return filas
@@ -0,0 +1,117 @@
+import csv
+import tempfile
+
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+from openpyxl import Workbook
+
+from .models import Productos, SalidaProducto, HistorialMovimiento
+
+
+TAMANO_LOTE = 2000
+
+FORMATOS = ('csv', 'xlsx')
+
+
+class _Eco:
+    """Pseudo-buffer para csv.writer: devuelve cada línea en lugar de guardarla."""
+
+    def write(self, valor):
+        return valor
+
+
+def _fecha(valor):
+    if valor is None:
+        return ''
+    if hasattr(valor, 'hour'):
+        return timezone.localtime(valor).strftime('%d/%m/%Y %H:%M')
+    return valor.strftime('%d/%m/%Y')
+
+
+def filas_productos(queryset):
+    categorias = dict(Productos.CATEGORIAS)
+    yield ['Código', 'Nombre', 'Descripción', 'Categoría', 'Costo', 'Precio', 'Stock', 'Proveedor', 'Activo', 'Fecha de ingreso']
+    filas = queryset.values_list(
+        'codigo', 'nombre', 'descripcion', 'categoria', 'costo', 'precio', 'stock',
+        'proveedor__nombre', 'activo', 'fecha_ingreso',
+    ).iterator(chunk_size=TAMANO_LOTE)
+    for codigo, nombre, descripcion, categoria, costo, precio, stock, proveedor, activo, fecha in filas:
+        yield [
+            codigo, nombre, descripcion, categorias.get(categoria, categoria), costo, precio, stock,
+            proveedor or '', 'Sí' if activo else 'No', _fecha(fecha),
+        ]
+
+
+def filas_salidas(queryset):
+    motivos = dict(SalidaProducto.MOTIVOS)
+    yield ['Fecha', 'Producto', 'Código', 'Cantidad', 'Motivo', 'Usuario', 'Descripción', 'Documento']
+    filas = queryset.values_list(
+        'fecha_salida', 'producto__nombre', 'producto__codigo', 'cantidad', 'motivo',
+        'usuario__username', 'descripcion', 'documento_id',
+    ).iterator(chunk_size=TAMANO_LOTE)
+    for fecha, producto, codigo, cantidad, motivo, usuario, descripcion, documento in filas:
+        yield [
+            _fecha(fecha), producto, codigo, cantidad, motivos.get(motivo, motivo),
+            usuario or 'Sistema', descripcion, documento or '',
+        ]
+
+
+def filas_historial(queryset):
+    tipos = dict(HistorialMovimiento.TIPO_MOVIMIENTO)
+    yield ['Fecha', 'Tipo', 'Producto', 'Código', 'Usuario', 'Detalles']
+    filas = queryset.values_list(
+        'fecha_movimiento', 'tipo_movimiento', 'nombre_producto', 'serial_producto',
+        'usuario__username', 'detalles',
+    ).iterator(chunk_size=TAMANO_LOTE)
+    for fecha, tipo, producto, codigo, usuario, detalles in filas:
+        yield [_fecha(fecha), tipos.get(tipo, tipo), producto, codigo, usuario or 'Sistema', detalles]
+
+
+def respuesta_csv(filas, nombre):
+    """Envía las filas como CSV a medida que se leen de la base de datos."""
+    escritor = csv.writer(_Eco())
+    contenido = (escritor.writerow(fila) for fila in filas)
+    respuesta = StreamingHttpResponse(
+        _con_bom(contenido), content_type='text/csv; charset=utf-8'
+    )
+    respuesta['Content-Disposition'] = f'attachment; filename="{nombre}.csv"'
+    return respuesta
+
+
+def _con_bom(lineas):
+    # BOM para que Excel reconozca el UTF-8
+    yield '\ufeff'
+    yield from lineas
+
+
+def respuesta_xlsx(filas, nombre):
+    """
+    Genera un Excel con el modo write-only de openpyxl y lo envía desde disco.
+
+    El modo write-only va escribiendo las filas en un temporal en lugar de
+    mantener las celdas en memoria, por lo que el consumo es constante.
+    """
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title=nombre[:31])
+    for fila in filas:
+        sheet.append(fila)
+
+    archivo = tempfile.TemporaryFile(suffix='.xlsx')
+    workbook.save(archivo)
+    tamano = archivo.tell()
+    archivo.seek(0)
+    respuesta = FileResponse(
+        archivo,
+        as_attachment=True,
+        filename=f'{nombre}.xlsx',
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    )
+    respuesta['Content-Length'] = tamano
+    return respuesta
+
+
+def exportar(filas, nombre, formato):
+    nombre = f"{nombre}_{timezone.localdate().strftime('%Y%m%d')}"
+    if formato == 'xlsx':
+        return respuesta_xlsx(filas, nombre)
+    return respuesta_csv(filas, nombre)
@@ -1,15 +1,87 @@
 from django import forms
 from django.contrib.auth.models import User
-from .models import Productos, Proveedor, SalidaProducto, UserProfile
+from django.core.exceptions import ValidationError
+from django.urls import reverse
+from .models import Productos, Proveedor, SalidaProducto, DocumentoSalida, UserProfile, ReglaPrecio
 
 
 class ProductoForm(forms.ModelForm):
     class Meta:
         model= Productos
-        fields = ['nombre', 'codigo', 'descripcion', 'precio', 'stock', 'categoria', 'proveedor']
+        fields = ['nombre', 'codigo', 'descripcion', 'costo', 'stock', 'categoria', 'proveedor']
+        help_texts = {
+            'costo': 'El precio de venta se calcula con las reglas de margen',
+        }
+
+MAX_PRODUCTOS_LOTE = 1000
+
 
 class MultipleProductosForm(forms.Form):
-    cantidad = forms.IntegerField(min_value=1, max_value=50, initial=1, label='Cantidad de formularios')
+    cantidad = forms.IntegerField(min_value=1, max_value=MAX_PRODUCTOS_LOTE, initial=1, label='Cantidad de formularios')
+
+
+class ProductoLoteForm(forms.ModelForm):
+    """
+    Formulario de la creación múltiple.
+
+    El proveedor es una lista de opciones que comparte todo el formset (una sola
+    consulta en lugar de una por formulario) y la unicidad del código la
+    comprueba el formset de una vez.
+    """
+    proveedor = forms.ChoiceField(required=False)
+
+    class Meta:
+        model = Productos
+        fields = ['nombre', 'codigo', 'descripcion', 'costo', 'stock', 'categoria']
+
+    def __init__(self, *args, proveedores=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.proveedores = proveedores or {}
+        self.fields['proveedor'].choices = [('', '---------')] + [
+            (str(pk), proveedor.nombre) for pk, proveedor in self.proveedores.items()
+        ]
+
+    def clean_proveedor(self):
+        proveedor = self.cleaned_data['proveedor']
+        return self.proveedores[int(proveedor)] if proveedor else None
+
+    def validate_unique(self):
+        pass
+
+
+class BaseProductosFormSet(forms.BaseFormSet):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.proveedores = Proveedor.objects.order_by('nombre').in_bulk()
+
+    def get_form_kwargs(self, index):
+        kwargs = super().get_form_kwargs(index)
+        kwargs['proveedores'] = self.proveedores
+        return kwargs
+
+    def clean(self):
+        """Comprueba con una sola consulta que los códigos no existan ni se repitan."""
+        if any(self.errors):
+            return
+        self.productos = []
+        codigos = set()
+        repetidos = set()
+        for form in self.forms:
+            if not form.has_changed():
+                continue
+            codigo = form.cleaned_data['codigo']
+            if codigo in codigos:
+                repetidos.add(codigo)
+            codigos.add(codigo)
+            producto = form.save(commit=False)
+            producto.proveedor = form.cleaned_data['proveedor']
+            self.productos.append(producto)
+
+        if repetidos:
+            raise forms.ValidationError(f"Códigos repetidos en el formulario: {', '.join(sorted(repetidos))}")
+        existentes = Productos.objects.filter(codigo__in=codigos).values_list('codigo', flat=True)
+        if existentes:
+            raise forms.ValidationError(f"Códigos ya registrados: {', '.join(sorted(existentes))}")
 
 
 class ProveedorForm(forms.ModelForm):
@@ -20,17 +92,51 @@ class ProveedorForm(forms.ModelForm):
             'contacto': 'Persona de contacto',
         }
         
+# Búsqueda de productos del formulario de salidas (ver views.autocompletar_productos)
+AUTOCOMPLETAR_MINIMO = 2
+AUTOCOMPLETAR_LIMITE = 20
+
+
+class ProductoAutocompletar(forms.Widget):
+    """
+    Campo de texto que busca los productos a medida que se escribe, en lugar
+    de un ``<select>`` con todo el catálogo.
+
+    El valor enviado es el id del producto elegido. Solo se consulta ese
+    producto, y únicamente para mostrarlo cuando el formulario vuelve con errores.
+    """
+    template_name = 'mi_proyecto/widgets/producto_autocompletar.html'
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        context['widget']['url'] = reverse('autocompletar_productos')
+        context['widget']['minimo'] = AUTOCOMPLETAR_MINIMO
+        context['widget']['etiqueta'] = self.etiqueta(context['widget']['value'])
+        return context
+
+    def etiqueta(self, valor):
+        if not valor:
+            return ''
+        # ModelChoiceField deja su queryset en ``choices``
+        try:
+            producto = self.choices.queryset.filter(pk=valor).values('codigo', 'nombre').first()
+        except (ValueError, TypeError, ValidationError):
+            return ''
+        return f"{producto['codigo']} — {producto['nombre']}" if producto else ''
+
+
 class SalidaProductoForm(forms.ModelForm):
     class Meta:
         model = SalidaProducto
         fields = ['producto', 'cantidad', 'motivo', 'descripcion']
         widgets = {
+            'producto': ProductoAutocompletar(),
             'descripcion': forms.Textarea(attrs={'rows': 3}),
         }
     
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        # Filtramos solo los productos que tienen stock
+        # Filtramos solo los productos que tienen stock (al validar se busca solo el elegido)
         self.fields['producto'].queryset = Productos.objects.filter(stock__gt=0)
     
     def clean_cantidad(self):
@@ -42,6 +148,92 @@ class SalidaProductoForm(forms.ModelForm):
         
         return cantidad
     
+class DocumentoSalidaForm(forms.ModelForm):
+    class Meta:
+        model = DocumentoSalida
+        fields = ['motivo', 'descripcion']
+        widgets = {
+            'descripcion': forms.Textarea(attrs={'rows': 3}),
+        }
+
+
+MAX_LINEAS_SALIDA = 1000
+
+
+class LineaSalidaForm(forms.Form):
+    codigo = forms.CharField(max_length=50, label='Código')
+    cantidad = forms.IntegerField(min_value=1, label='Cantidad')
+
+
+class BaseLineasSalidaFormSet(forms.BaseFormSet):
+    def clean(self):
+        super().clean()
+        if any(self.errors):
+            return
+        datos = [f.cleaned_data for f in self.forms if f.cleaned_data and not self._should_delete_form(f)]
+        if not datos:
+            raise forms.ValidationError('Agregue al menos un producto')
+
+        # Una sola consulta para resolver todos los códigos del documento
+        productos = Productos.objects.in_bulk({d['codigo'] for d in datos}, field_name='codigo')
+        faltantes = sorted({d['codigo'] for d in datos if d['codigo'] not in productos})
+        if faltantes:
+            raise forms.ValidationError(f"Códigos inexistentes: {', '.join(faltantes)}")
+
+        self.lineas = [(productos[d['codigo']].id, d['cantidad']) for d in datos]
+
+
+
+MAX_COMPROBANTES_LOTE = 5000
+
+
+class ComprobantesSalidaForm(forms.Form):
+    desde = forms.DateField(label='Desde', widget=forms.DateInput(attrs={'type': 'date'}))
+    hasta = forms.DateField(label='Hasta', widget=forms.DateInput(attrs={'type': 'date'}))
+    formato = forms.ChoiceField(label='Formato', choices=[('pdf', 'PDF único'), ('zip', 'ZIP')])
+
+    def clean(self):
+        cleaned_data = super().clean()
+        desde = cleaned_data.get('desde')
+        hasta = cleaned_data.get('hasta')
+        if desde and hasta and desde > hasta:
+            raise forms.ValidationError('La fecha "desde" no puede ser posterior a "hasta"')
+        return cleaned_data
+
+
+class RangoFechasForm(forms.Form):
+    # Rango opcional del historial y del tablero; sin fechas cada vista usa su período por defecto
+    desde = forms.DateField(label='Desde', required=False, widget=forms.DateInput(attrs={'type': 'date'}))
+    hasta = forms.DateField(label='Hasta', required=False, widget=forms.DateInput(attrs={'type': 'date'}))
+
+    def clean(self):
+        cleaned_data = super().clean()
+        desde = cleaned_data.get('desde')
+        hasta = cleaned_data.get('hasta')
+        if desde and hasta and desde > hasta:
+            raise forms.ValidationError('La fecha "desde" no puede ser posterior a "hasta"')
+        return cleaned_data
+
+
+class ReglaPrecioForm(forms.ModelForm):
+    class Meta:
+        model = ReglaPrecio
+        fields = ['categoria', 'proveedor', 'margen']
+        labels = {
+            'margen': 'Margen (%)',
+        }
+
+    def clean(self):
+        cleaned_data = super().clean()
+        # Una sola regla por categoría y proveedor: si ya existe se modifica su margen
+        existente = ReglaPrecio.objects.filter(
+            categoria=cleaned_data.get('categoria', ''), proveedor=cleaned_data.get('proveedor')
+        ).first()
+        if existente:
+            self.instance = existente
+        return cleaned_data
+
+
 class ImportarExcelForm(forms.Form):
     archivo_excel = forms.FileField(
         label='Archivo Excel',
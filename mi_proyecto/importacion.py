@@ -0,0 +1,421 @@
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.conf import settings
+from django.db import DataError, IntegrityError, transaction
+from django.db.models import Case, F, When
+from django.utils import timezone
+from openpyxl import load_workbook
+
+from . import stock
+from .auditoria import registrar, vaciar
+from .models import Productos, Proveedor, HistorialMovimiento, ImportacionExcel, MovimientoStock
+from .precios import aplicar_precios
+from .senales import productos_actualizados
+
+
+TAMANO_LOTE = 500
+
+CATEGORIAS_VALIDAS = [cat[0] for cat in Productos.CATEGORIAS]
+
+# El stock no: se suma con un UPDATE relativo para no pisar salidas simultáneas
+CAMPOS_ACTUALIZABLES = ['nombre', 'descripcion', 'costo', 'precio', 'categoria', 'proveedor']
+
+# Límites de las columnas, validados antes de escribir para que una fila
+# inválida no haga fallar a todo su lote
+LARGOS = {
+    'codigo': Productos._meta.get_field('codigo').max_length,
+    'nombre': Productos._meta.get_field('nombre').max_length,
+    'descripcion': Productos._meta.get_field('descripcion').max_length,
+    'proveedor_nombre': Proveedor._meta.get_field('nombre').max_length,
+}
+COSTO_MAXIMO = Decimal(10) ** (
+    Productos._meta.get_field('costo').max_digits - Productos._meta.get_field('costo').decimal_places
+)
+STOCK_MAXIMO = 2 ** 31 - 1
+
+
+class FilaInvalida(Exception):
+    pass
+
+
+class ImportacionAbandonada(Exception):
+    """La importación se marcó como abandonada mientras el worker la procesaba."""
+
+
+def _copiar_a_temporal(archivo):
+    """Vuelca el archivo subido a disco por bloques y devuelve la ruta temporal."""
+    fd, ruta = tempfile.mkstemp(suffix='.xlsx')
+    with os.fdopen(fd, 'wb') as destino:
+        if hasattr(archivo, 'chunks'):
+            for bloque in archivo.chunks():
+                destino.write(bloque)
+        else:
+            archivo.seek(0)
+            shutil.copyfileobj(archivo, destino)
+    return ruta
+
+
+def leer_excel(archivo):
+    """
+    Recorre las filas de datos (sin encabezados) de la hoja activa del Excel.
+
+    Usa el modo de solo lectura de openpyxl, que lee el XML de la hoja a medida
+    que se piden las filas en lugar de construir todas las celdas en memoria,
+    por lo que el consumo de memoria no depende del tamaño de la hoja. Si se
+    recibe un archivo subido, se copia primero a un temporal para no tenerlo
+    completo en memoria; si se recibe una ruta, se lee directamente.
+    """
+    es_ruta = isinstance(archivo, (str, os.PathLike))
+    ruta = archivo if es_ruta else _copiar_a_temporal(archivo)
+    workbook = None
+    try:
+        workbook = load_workbook(ruta, read_only=True, data_only=True)
+        sheet = workbook.active
+        for row in sheet.iter_rows(min_row=2, values_only=True):
+            # Las filas cortas en modo solo lectura traen menos columnas
+            if len(row) < 7:
+                row = tuple(row) + (None,) * (7 - len(row))
+            yield row
+    finally:
+        if workbook is not None:
+            workbook.close()
+        if not es_ruta:
+            os.remove(ruta)
+
+
+def contar_filas(ruta):
+    """Cantidad de filas de datos según la dimensión declarada en la hoja (puede ser None)."""
+    workbook = load_workbook(ruta, read_only=True)
+    try:
+        max_row = workbook.active.max_row
+    finally:
+        workbook.close()
+    return max_row - 1 if max_row else None
+
+
+def leer_fila(row):
+    """Convierte una fila del Excel en un diccionario con los datos del producto."""
+    codigo = str(row[0]).strip() if row[0] else None
+    nombre = str(row[1]).strip() if row[1] else None
+    descripcion = str(row[2]).strip() if row[2] else ""
+    # La columna Precio de la planilla es el costo; el precio de venta sale de las reglas de margen
+    try:
+        costo = Decimal(str(row[3])).quantize(Decimal('0.01')) if row[3] else Decimal('0')
+    except InvalidOperation:
+        raise FilaInvalida(f"Precio inválido: {row[3]}")
+    stock = int(row[4]) if row[4] else 0
+    categoria = str(row[5]).strip() if row[5] else "COMPUTADORAS"
+    proveedor_nombre = str(row[6]).strip() if row[6] else None
+
+    if not nombre or not codigo:
+        raise FilaInvalida("Nombre y código son requeridos")
+    for campo, valor in (('codigo', codigo), ('nombre', nombre), ('descripcion', descripcion),
+                         ('proveedor_nombre', proveedor_nombre)):
+        if valor and len(valor) > LARGOS[campo]:
+            raise FilaInvalida(f"{campo} supera los {LARGOS[campo]} caracteres")
+    if not 0 <= costo < COSTO_MAXIMO:
+        raise FilaInvalida(f"Precio fuera de rango: {costo}")
+    if abs(stock) > STOCK_MAXIMO:
+        raise FilaInvalida(f"Stock fuera de rango: {stock}")
+
+    # Validar categoría
+    categoria = categoria.upper()
+    if categoria not in CATEGORIAS_VALIDAS:
+        categoria = "COMPUTADORAS"  # Valor por defecto
+
+    return {
+        'codigo': codigo,
+        'nombre': nombre,
+        'descripcion': descripcion,
+        'costo': costo,
+        'stock': stock,
+        'categoria': categoria,
+        'proveedor_nombre': proveedor_nombre,
+    }
+
+
+def _resolver_proveedores(nombres):
+    """Busca los proveedores del lote con una sola consulta y crea los que falten."""
+    proveedores = {}
+    for proveedor in Proveedor.objects.filter(nombre__in=nombres).order_by('-id'):
+        proveedores[proveedor.nombre] = proveedor
+
+    faltantes = [
+        Proveedor(
+            nombre=nombre,
+            direccion='Dirección por definir',
+            telefono='0000-0000',
+            email='email@ejemplo.com',
+        )
+        for nombre in nombres if nombre not in proveedores
+    ]
+    for proveedor in Proveedor.objects.bulk_create(faltantes):
+        proveedores[proveedor.nombre] = proveedor
+    return proveedores
+
+
+def _procesar_lote(lote, usuario, resultado, origen=''):
+    datos_validos = []
+    for row_num, row in lote:
+        try:
+            datos_validos.append((row_num, leer_fila(row)))
+        except FilaInvalida as e:
+            resultado['errores'].append(f"Fila {row_num}: {str(e)}")
+        except Exception as e:
+            resultado['errores'].append(f"Fila {row_num}: Error procesando datos - {str(e)}")
+
+    if not datos_validos:
+        return
+
+    try:
+        _guardar_lote([datos for _, datos in datos_validos], usuario, resultado, origen)
+    except (DataError, IntegrityError):
+        # Una fila que la base rechaza haría fallar el lote entero: se reintenta
+        # fila por fila y solo esas quedan en los errores
+        for row_num, datos in datos_validos:
+            try:
+                _guardar_lote([datos], usuario, resultado, origen)
+            except (DataError, IntegrityError) as e:
+                resultado['errores'].append(f"Fila {row_num}: Error guardando - {str(e)}")
+
+
+def _guardar_lote(datos_validos, usuario, resultado, origen):
+    with transaction.atomic():
+        nombres = {d['proveedor_nombre'] for d in datos_validos if d['proveedor_nombre']}
+        proveedores = _resolver_proveedores(nombres) if nombres else {}
+
+        codigos = {d['codigo'] for d in datos_validos}
+        existentes = Productos.objects.in_bulk(codigos, field_name='codigo')
+        estados_previos = {codigo: p.estado_agregados() for codigo, p in existentes.items()}
+
+        nuevos = {}
+        actualizados = {}
+        # Unidades a sumar al stock de cada producto existente
+        sumas = {}
+        historial = []
+        entradas = []
+        importados_lote = 0
+        actualizados_lote = 0
+        for datos in datos_validos:
+            codigo = datos['codigo']
+            proveedor = proveedores.get(datos['proveedor_nombre'])
+            producto = existentes.get(codigo) or nuevos.get(codigo)
+
+            if producto:
+                # Actualizar producto existente, sumando al stock existente
+                producto.nombre = datos['nombre']
+                producto.descripcion = datos['descripcion']
+                producto.costo = datos['costo']
+                producto.categoria = datos['categoria']
+                producto.proveedor = proveedor
+                if codigo in existentes:
+                    actualizados[codigo] = producto
+                    sumas[codigo] = sumas.get(codigo, 0) + datos['stock']
+                else:
+                    producto.stock += datos['stock']
+                historial.append((producto, 'EDICION', f"Actualización desde Excel - Stock agregado: {datos['stock']}"))
+                entradas.append((producto, datos['stock']))
+                actualizados_lote += 1
+            else:
+                producto = Productos(
+                    nombre=datos['nombre'],
+                    codigo=codigo,
+                    descripcion=datos['descripcion'],
+                    costo=datos['costo'],
+                    stock=datos['stock'],
+                    categoria=datos['categoria'],
+                    proveedor=proveedor,
+                )
+                nuevos[codigo] = producto
+                historial.append((producto, 'CREACION', 'Creación desde Excel'))
+                entradas.append((producto, datos['stock']))
+                importados_lote += 1
+
+        aplicar_precios(list(nuevos.values()) + list(actualizados.values()))
+        Productos.objects.bulk_create(nuevos.values())
+        Productos.objects.bulk_update(actualizados.values(), CAMPOS_ACTUALIZABLES)
+        sumas = {codigo: cantidad for codigo, cantidad in sumas.items() if cantidad}
+        if sumas:
+            # Relativo al stock de la fila: una salida confirmada después de leer
+            # los productos no se pierde
+            Productos.objects.filter(codigo__in=sumas).update(stock=Case(
+                *[When(codigo=codigo, then=F('stock') + cantidad) for codigo, cantidad in sumas.items()]
+            ))
+            for codigo, stock_actual in Productos.objects.filter(codigo__in=sumas).values_list('codigo', 'stock'):
+                actualizados[codigo].stock = stock_actual
+        cambios = [(None, p.estado_agregados()) for p in nuevos.values()]
+        for codigo, producto in actualizados.items():
+            despues = producto.estado_agregados()
+            antes = estados_previos[codigo]
+            if antes:
+                antes = (despues[0] - sumas.get(codigo, 0),) + antes[1:]
+            cambios.append((antes, despues))
+        productos_actualizados.send(sender=Productos, cambios=cambios)
+        stock.registrar(*[
+            MovimientoStock(producto=producto, cantidad=cantidad, motivo='IMPORTACION', origen=origen, usuario=usuario)
+            for producto, cantidad in entradas
+        ])
+
+        registrar(*[
+            HistorialMovimiento(
+                producto=producto,
+                nombre_producto=producto.nombre,
+                serial_producto=producto.codigo,
+                usuario=usuario,
+                tipo_movimiento=tipo,
+                detalles=detalles,
+            )
+            for producto, tipo, detalles in historial
+        ])
+
+    resultado['importados'] += importados_lote
+    resultado['actualizados'] += actualizados_lote
+
+
+def importar_filas(filas, usuario=None, tamano_lote=TAMANO_LOTE, al_procesar_lote=None, origen=''):
+    """
+    Importa productos a partir de las filas de datos del Excel (sin encabezados).
+
+    Las filas se procesan por lotes: cada lote resuelve proveedores y códigos
+    existentes con una consulta ``IN`` y escribe con ``bulk_create``/``bulk_update``
+    dentro de una transacción, de modo que el número de consultas depende de la
+    cantidad de lotes y no de la cantidad de filas.
+
+    ``al_procesar_lote``, si se indica, se llama tras cada lote con la cantidad
+    de filas procesadas y el resultado parcial. ``origen`` identifica la
+    importación en el libro de stock.
+    """
+    resultado = {'importados': 0, 'actualizados': 0, 'errores': []}
+    numeradas = enumerate(filas, start=2)
+    procesadas = 0
+    while True:
+        lote = list(islice(numeradas, tamano_lote))
+        if not lote:
+            break
+        try:
+            _procesar_lote(lote, usuario, resultado, origen)
+        except Exception as e:
+            resultado['errores'].append(f"Filas {lote[0][0]}-{lote[-1][0]}: Error guardando lote - {str(e)}")
+        procesadas += len(lote)
+        if al_procesar_lote:
+            al_procesar_lote(procesadas, resultado)
+    return resultado
+
+
+MAX_ERRORES_GUARDADOS = 50
+
+
+def marcar_abandonadas():
+    """
+    Marca con ERROR las importaciones PROCESANDO sin avances (``fecha_actualizacion``)
+    en los últimos ``IMPORTACION_TIEMPO_LIMITE`` segundos: el worker que las
+    tomó murió sin llegar a terminarlas. Devuelve cuántas se marcaron.
+
+    No se reanudan: las filas suman stock, y las de un lote a medio confirmar
+    se aplicarían dos veces. El mensaje indica hasta qué fila se guardó el avance.
+    """
+    limite = timezone.now() - timedelta(seconds=settings.IMPORTACION_TIEMPO_LIMITE)
+    marcadas = 0
+    for importacion in ImportacionExcel.objects.filter(estado='PROCESANDO', fecha_actualizacion__lt=limite):
+        # Condicionado al mismo avance: si el worker guardó otro lote mientras
+        # tanto, sigue vivo
+        marcada = ImportacionExcel.objects.filter(
+            id=importacion.id, estado='PROCESANDO', fecha_actualizacion=importacion.fecha_actualizacion,
+        ).update(
+            estado='ERROR',
+            errores=(
+                f"La importación se interrumpió: el worker dejó de responder después de "
+                f"{importacion.filas_procesadas} filas procesadas, que ya se aplicaron. Revise "
+                f"las {TAMANO_LOTE} filas siguientes (el último lote pudo guardarse sin registrar "
+                f"el avance) antes de subir las restantes."
+            ),
+            fecha_fin=timezone.now(),
+        )
+        if marcada:
+            importacion.archivo.delete(save=False)
+            ImportacionExcel.objects.filter(id=importacion.id).update(archivo='')
+            marcadas += 1
+    return marcadas
+
+
+def reclamar_importacion():
+    """
+    Toma la importación pendiente más antigua y la marca como en proceso.
+
+    El cambio de estado se hace con un UPDATE condicionado al estado
+    ``PENDIENTE``, así dos workers nunca procesan la misma importación. Antes
+    se marcan con ERROR las importaciones abandonadas (``marcar_abandonadas``).
+    """
+    marcar_abandonadas()
+    pendientes = ImportacionExcel.objects.filter(estado='PENDIENTE').order_by('fecha_creacion')
+    for importacion_id in pendientes.values_list('id', flat=True)[:10]:
+        ahora = timezone.now()
+        tomada = ImportacionExcel.objects.filter(id=importacion_id, estado='PENDIENTE').update(
+            estado='PROCESANDO',
+            fecha_inicio=ahora,
+            fecha_actualizacion=ahora,
+        )
+        if tomada:
+            return ImportacionExcel.objects.get(id=importacion_id)
+    return None
+
+
+def ejecutar_importacion(importacion):
+    """
+    Procesa una importación en cola, guardando el progreso después de cada lote.
+
+    Cada guardado renueva ``fecha_actualizacion``. Si mientras tanto se marcó
+    como abandonada (``marcar_abandonadas``) se deja de procesar y no se pisa su estado.
+    """
+    # Solo mientras siga siendo de este worker
+    propia = ImportacionExcel.objects.filter(id=importacion.id, estado='PROCESANDO')
+
+    def guardar_progreso(procesadas, resultado):
+        if not propia.update(
+            filas_procesadas=procesadas,
+            importados=resultado['importados'],
+            actualizados=resultado['actualizados'],
+            total_errores=len(resultado['errores']),
+            fecha_actualizacion=timezone.now(),
+        ):
+            raise ImportacionAbandonada(importacion.id)
+
+    try:
+        ruta = importacion.archivo.path
+        propia.update(filas_totales=contar_filas(ruta), fecha_actualizacion=timezone.now())
+        resultado = importar_filas(
+            leer_excel(ruta),
+            usuario=importacion.usuario,
+            al_procesar_lote=guardar_progreso,
+            origen=f'importacion:{importacion.id}',
+        )
+    except ImportacionAbandonada:
+        pass
+    except Exception as e:
+        propia.update(
+            estado='ERROR',
+            errores=f"Error al procesar el archivo Excel: {str(e)}",
+            fecha_fin=timezone.now(),
+        )
+    else:
+        propia.update(
+            estado='COMPLETADA',
+            importados=resultado['importados'],
+            actualizados=resultado['actualizados'],
+            total_errores=len(resultado['errores']),
+            errores='\n'.join(resultado['errores'][:MAX_ERRORES_GUARDADOS]),
+            fecha_fin=timezone.now(),
+        )
+    finally:
+        # El worker no termina peticiones: escribe aquí el historial pendiente
+        vaciar()
+        # El archivo ya no se necesita una vez procesado
+        importacion.archivo.delete(save=False)
+        ImportacionExcel.objects.filter(id=importacion.id).update(archivo='')
+    importacion.refresh_from_db()
+    return importacion
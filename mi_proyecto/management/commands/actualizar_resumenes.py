@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from mi_proyecto import resumenes
+
+
+class Command(BaseCommand):
+    help = 'Actualiza los resúmenes diarios del tablero de reportes (programar cada pocos minutos u horas)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', help='Recalcula a partir de este día (AAAA-MM-DD) en lugar del último resumido')
+        parser.add_argument('--completo', action='store_true', help='Recalcula todos los resúmenes')
+
+    def handle(self, *args, **options):
+        desde = None
+        if options['desde']:
+            desde = parse_date(options['desde'])
+            if desde is None:
+                raise CommandError('Fecha inválida: use el formato AAAA-MM-DD')
+        inicio = time.perf_counter()
+        filas = resumenes.actualizar_resumenes(desde, completo=options['completo'])
+        segundos = time.perf_counter() - inicio
+        self.stdout.write(self.style.SUCCESS(
+            f"{filas['salidas']} fila(s) de salidas por día, {filas['productos']} de productos por mes y "
+            f"{filas['proveedores']} de proveedores por mes "
+            f"escritas en {segundos:.2f} s"
+        ))
@@ -0,0 +1,28 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from mi_proyecto import archivo
+
+
+class Command(BaseCommand):
+    help = 'Mueve al archivo los movimientos del historial anteriores a los últimos meses, un mes por transacción'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--meses', type=int, default=settings.HISTORIAL_MESES_RECIENTES,
+            help='Meses completos que se conservan en la tabla del historial (además del actual)',
+        )
+
+    def handle(self, *args, **options):
+        limite = archivo.limite_archivo(options['meses'])
+        self.stdout.write(f'Archivando movimientos anteriores a {limite:%d/%m/%Y}')
+
+        def al_archivar(inicio, movidos):
+            self.stdout.write(f'  {inicio:%m/%Y}: {movidos} movimiento(s)')
+
+        inicio = time.perf_counter()
+        total = archivo.archivar(options['meses'], al_archivar)
+        segundos = time.perf_counter() - inicio
+        self.stdout.write(self.style.SUCCESS(f'{total} movimiento(s) archivados en {segundos:.2f} s'))
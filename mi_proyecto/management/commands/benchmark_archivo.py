@@ -0,0 +1,97 @@
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from mi_proyecto import archivo
+from mi_proyecto.datos_prueba import sembrar
+from mi_proyecto.models import HistorialMovimiento, HistorialArchivado
+from mi_proyecto.paginacion import paginar_por_cursor
+
+from .benchmark_importacion import Rollback
+
+
+def listar(desde=None, hasta=None, categoria=None, paginas=1):
+    # Lo mismo que hace la vista historial_movimientos, siguiendo ``paginas`` páginas
+    querysets = [qs.select_related('usuario') for qs in archivo.historial_por_rango(desde, hasta)]
+    if categoria:
+        querysets = [qs.filter(producto__categoria=categoria) for qs in querysets]
+    cursor = None
+    for _ in range(paginas):
+        pagina = paginar_por_cursor(querysets, cursor, 10, 'fecha_movimiento')
+        cursor = pagina.next_cursor
+        if cursor is None:
+            break
+
+
+def consultas():
+    hoy = timezone.localdate()
+    return {
+        'primera página': lambda: listar(),
+        'página 50 (siguiendo cursores)': lambda: listar(paginas=50),
+        'primera página (categoría)': lambda: listar(categoria='UPS'),
+        'rango: último mes': lambda: listar(hoy - timedelta(days=30), hoy),
+        'rango: hace un año (archivo)': lambda: listar(hoy - timedelta(days=395), hoy - timedelta(days=365)),
+    }
+
+
+class Command(BaseCommand):
+    help = 'Siembra N movimientos y compara la latencia del listado del historial antes y después de archivar'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--movimientos', type=int, default=10_000_000)
+        parser.add_argument('--productos', type=int, default=10000)
+        parser.add_argument('--dias', type=int, default=730, help='Días sobre los que se reparten los movimientos')
+        parser.add_argument('--meses', type=int, default=6, help='Meses recientes que no se archivan')
+        parser.add_argument('--repeticiones', type=int, default=5)
+
+    def medir(self, titulo, repeticiones):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'{titulo}: {HistorialMovimiento.objects.count()} recientes, '
+            f'{HistorialArchivado.objects.count()} archivados'
+        ))
+        tiempos = {}
+        for nombre, consulta in consultas().items():
+            muestras = []
+            for _ in range(repeticiones):
+                inicio = time.perf_counter()
+                consulta()
+                muestras.append((time.perf_counter() - inicio) * 1000)
+            tiempos[nombre] = statistics.median(muestras)
+            self.stdout.write(f'  {nombre:<34} {tiempos[nombre]:>9.2f} ms')
+        return tiempos
+
+    def handle(self, *args, **options):
+        repeticiones = options['repeticiones']
+        try:
+            with transaction.atomic():
+                self.stdout.write(f"Sembrando {options['movimientos']} movimientos...")
+                inicio = time.perf_counter()
+                sembrar(
+                    productos=options['productos'],
+                    proveedores=10,
+                    salidas=0,
+                    movimientos=options['movimientos'],
+                    dias=options['dias'],
+                    prefijo='BENCHARCH',
+                )
+                self.stdout.write(f'  {time.perf_counter() - inicio:.1f} s')
+                antes = self.medir('Sin archivar', repeticiones)
+
+                inicio = time.perf_counter()
+                archivados = archivo.archivar(options['meses'])
+                self.stdout.write(f'Archivados {archivados} movimientos en {time.perf_counter() - inicio:.1f} s')
+                despues = self.medir('Archivado', repeticiones)
+                raise Rollback
+        except Rollback:
+            pass
+
+        self.stdout.write(self.style.MIGRATE_HEADING('Resumen (mediana en ms)'))
+        self.stdout.write(f"  {'consulta':<34} {'sin archivar':>13} {'archivado':>10}")
+        for nombre in antes:
+            self.stdout.write(f'  {nombre:<34} {antes[nombre]:>13.2f} {despues[nombre]:>10.2f}')
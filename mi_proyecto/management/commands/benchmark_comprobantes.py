@@ -0,0 +1,64 @@
+import os
+import shutil
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from mi_proyecto import comprobantes
+from mi_proyecto.models import SalidaProducto
+
+
+class Command(BaseCommand):
+    help = 'Mide comprobantes PDF por segundo: uno a uno, desde caché y en lote (PDF único y ZIP con procesos)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cantidad', type=int, default=500, help='Salidas a usar (las más recientes)')
+        parser.add_argument('--procesos', type=int, default=None)
+
+    def handle(self, *args, **options):
+        salidas = list(
+            SalidaProducto.objects.select_related('producto', 'usuario').order_by('-fecha_salida', '-id')[:options['cantidad']]
+        )
+        if not salidas:
+            raise CommandError('No hay salidas: ejecute antes un sembrado de datos de prueba')
+        cantidad = len(salidas)
+        carpeta = tempfile.mkdtemp()
+
+        def medir(nombre, funcion):
+            t0 = time.perf_counter()
+            funcion()
+            segundos = time.perf_counter() - t0
+            self.stdout.write(f"{nombre:<32} {segundos:>8.2f} s {cantidad / segundos:>10.1f} PDF/s")
+
+        def limpiar():
+            shutil.rmtree(os.path.join(carpeta, comprobantes.CARPETA), ignore_errors=True)
+
+        try:
+            with override_settings(MEDIA_ROOT=carpeta):
+                self.stdout.write(f"{cantidad} comprobantes")
+                medir('Uno a uno (sin caché)', lambda: [comprobantes.obtener_comprobante(s) for s in salidas])
+                medir('Uno a uno (desde caché)', lambda: [comprobantes.obtener_comprobante(s) for s in salidas])
+
+                with tempfile.TemporaryFile() as destino:
+                    medir('Lote: PDF único', lambda: comprobantes.renderizar_varios(
+                        [comprobantes.datos_salida(s) for s in salidas], destino
+                    ))
+
+                limpiar()
+                with tempfile.TemporaryFile() as destino:
+                    medir('Lote: ZIP, 1 proceso', lambda: comprobantes.comprimir(salidas, destino, procesos=1))
+
+                procesos = options['procesos'] or os.cpu_count() or 1
+                with override_settings(COMPROBANTES_PROCESOS=procesos):
+                    # El pool compartido se crea una vez por proceso web: el
+                    # arranque de sus procesos no entra en la medición
+                    list(comprobantes._pool_procesos().map(time.sleep, [0.5] * procesos))
+                    limpiar()
+                    with tempfile.TemporaryFile() as destino:
+                        medir(f'Lote: ZIP, {procesos} procesos', lambda: comprobantes.comprimir(salidas, destino))
+                    with tempfile.TemporaryFile() as destino:
+                        medir('Lote: PDF único, en el pool', lambda: comprobantes.combinar(salidas, destino))
+        finally:
+            shutil.rmtree(carpeta, ignore_errors=True)
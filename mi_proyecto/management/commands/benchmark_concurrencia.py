@@ -0,0 +1,230 @@
+import http.client
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from itertools import cycle
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+
+from mi_proyecto import comprobantes
+from mi_proyecto.datos_prueba import sembrar
+from mi_proyecto.models import HistorialMovimiento, MovimientoStock, Productos, Proveedor, SalidaProducto
+
+
+PREFIJO = 'BENCHCONC'
+
+LECTURAS = ('lista_productos', 'historial_movimientos', 'lista_salidas')
+
+ASGI = ['-k', 'uvicorn_worker.UvicornWorker', 'proyecto_config.asgi:application']
+
+# nombre: (argumentos de gunicorn, variables de entorno)
+MODOS = {
+    'wsgi': (['proyecto_config.wsgi:application'], {}),
+    'asgi, vistas síncronas': (ASGI, {'VISTAS_ASINCRONAS': 'False'}),
+    'asgi': (ASGI, {'VISTAS_ASINCRONAS': 'True'}),
+}
+
+
+def _percentil(valores, q):
+    valores = sorted(valores)
+    return valores[min(int(q * len(valores)), len(valores) - 1)]
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara WSGI (workers síncronos) y ASGI (uvicorn, vistas async) con carga mixta: '
+        'clientes leyendo listados mientras otros piden PDF y exportaciones a Excel'
+    )
+    modos = MODOS
+
+    def add_arguments(self, parser):
+        parser.add_argument('--segundos', type=float, default=10, help='Duración de la carga por modo')
+        parser.add_argument('--lectores', type=int, default=8, help='Clientes concurrentes pidiendo listados')
+        parser.add_argument('--pesados', type=int, default=2, help='Clientes concurrentes pidiendo PDF y Excel')
+        parser.add_argument('--workers', type=int, default=2, help='Workers de gunicorn por servidor')
+        parser.add_argument('--puerto', type=int, default=8765)
+        parser.add_argument('--productos', type=int, default=2000)
+        parser.add_argument('--salidas', type=int, default=10000)
+        parser.add_argument('--modos', nargs='+', choices=list(self.modos), default=list(self.modos))
+        parser.add_argument('--conservar', action='store_true', help='No elimina los datos sembrados al terminar')
+
+    def handle(self, *args, **options):
+        try:
+            import gunicorn  # noqa: F401
+            import uvicorn_worker  # noqa: F401
+        except ImportError:
+            raise CommandError('Se necesitan gunicorn y uvicorn-worker (ver requirements.txt)')
+        if Productos.objects.filter(codigo__startswith=f'{PREFIJO}-').exists():
+            raise CommandError(f'Quedaron datos de una corrida anterior con el prefijo {PREFIJO}')
+
+        # Los servidores son otros procesos: los datos se confirman y se borran al terminar
+        self.stdout.write(f"Sembrando {options['productos']} productos y {options['salidas']} salidas...")
+        sembrar(
+            productos=options['productos'], proveedores=50, salidas=options['salidas'],
+            movimientos=options['salidas'], prefijo=PREFIJO,
+        )
+        usuario = User.objects.create(username=f'{PREFIJO.lower()}_cliente', is_staff=True)
+        cliente = Client()
+        cliente.force_login(usuario)
+        sesion = cliente.cookies[settings.SESSION_COOKIE_NAME].value
+        salidas = list(
+            SalidaProducto.objects.filter(producto__codigo__startswith=f'{PREFIJO}-').values_list('id', flat=True)[:2000]
+        )
+        try:
+            resultados = {}
+            for nombre in options['modos']:
+                self.stdout.write(f'Midiendo {nombre}...')
+                resultados[nombre] = self.medir_modo(nombre, options, sesion, salidas)
+        finally:
+            for salida_id in salidas:
+                comprobantes.invalidar_comprobante(salida_id)
+            if not options['conservar']:
+                self.limpiar(usuario, sesion)
+        self.informe(resultados, options)
+
+    def informe(self, resultados, options):
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"{options['lectores']} lectores y {options['pesados']} pesados, "
+            f"{options['workers']} workers, {options['segundos']:.0f} s por modo"
+        ))
+        self.stdout.write(
+            f"  {'modo':<24}{'lecturas/s':>11}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+            f"{'pesadas':>9}{'ms pesada':>11}{'errores':>9}"
+        )
+        for nombre, r in resultados.items():
+            lecturas = r['lecturas']
+            pesadas = r['pesadas']
+            self.stdout.write(
+                f"  {nombre:<24}{len(lecturas) / r['segundos']:>11.1f}"
+                + (
+                    f"{_percentil(lecturas, 0.5):>9.0f}{_percentil(lecturas, 0.95):>9.0f}"
+                    f"{_percentil(lecturas, 0.99):>9.0f}" if lecturas else f"{'—':>9}" * 3
+                )
+                + f"{len(pesadas):>9}{statistics.mean(pesadas) if pesadas else 0:>11.0f}{r['errores']:>9}"
+            )
+
+    def medir_modo(self, nombre, options, sesion, salidas):
+        argumentos, variables = self.modos[nombre]
+        puerto = options['puerto']
+        entorno = dict(
+            os.environ,
+            # Sin caché de vistas (se mediría la caché) ni presupuesto estricto
+            CACHE_VISTAS_SEGUNDOS='0',
+            PRESUPUESTO_CONSULTAS_ESTRICTO='False',
+            **variables,
+        )
+        servidor = subprocess.Popen(
+            [
+                sys.executable, '-m', 'gunicorn', *argumentos,
+                '--workers', str(options['workers']), '--bind', f'127.0.0.1:{puerto}',
+                '--timeout', '300', '--log-level', 'warning',
+            ],
+            cwd=settings.BASE_DIR, env=entorno,
+        )
+        try:
+            self.esperar(servidor, puerto)
+            return self.cargar(options, puerto, sesion, salidas)
+        finally:
+            servidor.terminate()
+            try:
+                servidor.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                servidor.kill()
+
+    def esperar(self, servidor, puerto):
+        limite = time.monotonic() + 30
+        while time.monotonic() < limite:
+            if servidor.poll() is not None:
+                raise CommandError(f'El servidor terminó al iniciar (código {servidor.returncode})')
+            try:
+                conexion = http.client.HTTPConnection('127.0.0.1', puerto, timeout=5)
+                conexion.request('GET', reverse('login'))
+                conexion.getresponse().read()
+                conexion.close()
+                return
+            except (ConnectionError, socket.timeout, http.client.HTTPException):
+                time.sleep(0.2)
+        raise CommandError('El servidor no respondió en 30 s')
+
+    def cargar(self, options, puerto, sesion, salidas):
+        cabeceras = {'Cookie': f'{settings.SESSION_COOKIE_NAME}={sesion}'}
+        lecturas = cycle(reverse(nombre) for nombre in LECTURAS)
+        pesadas = cycle(['excel', 'pdf'])
+        pdfs = cycle(salidas)
+        candado = threading.Lock()
+        resultado = {'lecturas': [], 'pesadas': [], 'errores': 0}
+        # Un segundo de calentamiento (pool de procesos, plantillas) que no se mide
+        inicio_medicion = time.monotonic() + 1
+        fin = inicio_medicion + options['segundos']
+
+        def pedir(conexion, url, medidas):
+            inicio = time.perf_counter()
+            try:
+                conexion.request('GET', url, headers=cabeceras)
+                respuesta = conexion.getresponse()
+                respuesta.read()
+                correcta = respuesta.status == 200
+            except (OSError, http.client.HTTPException):
+                conexion.close()
+                correcta = False
+            milisegundos = (time.perf_counter() - inicio) * 1000
+            if time.monotonic() >= inicio_medicion:
+                with candado:
+                    if correcta:
+                        medidas.append(milisegundos)
+                    else:
+                        resultado['errores'] += 1
+
+        def lector():
+            conexion = http.client.HTTPConnection('127.0.0.1', puerto, timeout=300)
+            while time.monotonic() < fin:
+                with candado:
+                    url = next(lecturas)
+                pedir(conexion, url, resultado['lecturas'])
+            conexion.close()
+
+        def pesado():
+            conexion = http.client.HTTPConnection('127.0.0.1', puerto, timeout=300)
+            while time.monotonic() < fin:
+                with candado:
+                    tipo = next(pesadas)
+                    salida_id = next(pdfs)
+                if tipo == 'excel':
+                    url = reverse('exportar_salidas') + '?formato=xlsx'
+                else:
+                    # Sin el PDF en disco, para que se genere en cada petición
+                    comprobantes.invalidar_comprobante(salida_id)
+                    url = reverse('generar_pdf_salida', args=[salida_id])
+                pedir(conexion, url, resultado['pesadas'])
+            conexion.close()
+
+        hilos = (
+            [threading.Thread(target=lector) for _ in range(options['lectores'])]
+            + [threading.Thread(target=pesado) for _ in range(options['pesados'])]
+        )
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        # Las peticiones pesadas pueden terminar después del tiempo previsto
+        resultado['segundos'] = max(time.monotonic() - inicio_medicion, options['segundos'])
+        return resultado
+
+    def limpiar(self, usuario, sesion):
+        productos = Productos.objects.filter(codigo__startswith=f'{PREFIJO}-')
+        HistorialMovimiento.objects.filter(producto__in=productos).delete()
+        SalidaProducto.objects.filter(producto__in=productos).delete()
+        MovimientoStock.objects.filter(producto__in=productos).delete()
+        productos.delete()
+        Proveedor.objects.filter(nombre__startswith=f'{PREFIJO} Proveedor ').delete()
+        User.objects.filter(username__in=[usuario.username, f'{PREFIJO.lower()}_usuario']).delete()
+        Session.objects.filter(session_key=sesion).delete()
@@ -0,0 +1,91 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.forms import formset_factory
+from django.test.utils import CaptureQueriesContext
+
+from mi_proyecto.forms import ProductoForm, ProductoLoteForm, BaseProductosFormSet, MAX_PRODUCTOS_LOTE
+from mi_proyecto.models import Productos, Proveedor, HistorialMovimiento
+from mi_proyecto.precios import aplicar_precios
+from mi_proyecto.productos import crear_productos
+
+from .benchmark_importacion import Rollback
+
+
+def datos_formset(cantidad, proveedor_id, prefijo='BENCHMUL'):
+    categorias = [cat[0] for cat in Productos.CATEGORIAS]
+    datos = {
+        'form-TOTAL_FORMS': str(cantidad),
+        'form-INITIAL_FORMS': '0',
+        'form-MIN_NUM_FORMS': '0',
+        'form-MAX_NUM_FORMS': str(MAX_PRODUCTOS_LOTE),
+    }
+    for i in range(cantidad):
+        datos.update({
+            f'form-{i}-nombre': f'Producto múltiple {i}',
+            f'form-{i}-codigo': f'{prefijo}-{i:07d}',
+            f'form-{i}-descripcion': 'Descripción generada para el benchmark',
+            f'form-{i}-costo': '100.00',
+            f'form-{i}-stock': str(i % 20),
+            f'form-{i}-categoria': categorias[i % len(categorias)],
+            f'form-{i}-proveedor': str(proveedor_id),
+        })
+    return datos
+
+
+def guardar_uno_a_uno(datos):
+    # Camino anterior: un ModelForm, un save y un registro de historial por producto
+    ProductoFormSet = formset_factory(ProductoForm)
+    formset = ProductoFormSet(datos)
+    if not formset.is_valid():
+        raise ValueError(formset.errors)
+    for f in formset:
+        producto = f.save(commit=False)
+        aplicar_precios([producto])
+        producto.save()
+        HistorialMovimiento.objects.create(
+            producto=producto,
+            nombre_producto=producto.nombre,
+            serial_producto=producto.codigo,
+            tipo_movimiento='CREACION',
+            detalles='Creación múltiple de productos',
+        )
+
+
+def guardar_en_lote(datos):
+    ProductoFormSet = formset_factory(
+        ProductoLoteForm, formset=BaseProductosFormSet, max_num=MAX_PRODUCTOS_LOTE, validate_max=True
+    )
+    formset = ProductoFormSet(datos)
+    if not formset.is_valid():
+        raise ValueError(formset.errors or formset.non_form_errors())
+    aplicar_precios(formset.productos)
+    crear_productos(formset.productos)
+
+
+class Command(BaseCommand):
+    help = 'Mide consultas y tiempo de la creación múltiple de productos por cantidad de formularios'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--productos', type=int, nargs='+', default=[10, 100, 1000])
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'productos':>10} {'camino':>10} {'consultas':>10} {'segundos':>9} {'productos/s':>12}")
+        for cantidad in options['productos']:
+            for nombre, guardar in (('uno a uno', guardar_uno_a_uno), ('lote', guardar_en_lote)):
+                try:
+                    with transaction.atomic():
+                        proveedor = Proveedor.objects.create(nombre='Proveedor benchmark creación múltiple')
+                        datos = datos_formset(cantidad, proveedor.id)
+                        with CaptureQueriesContext(connection) as ctx:
+                            inicio = time.perf_counter()
+                            guardar(datos)
+                            segundos = time.perf_counter() - inicio
+                        raise Rollback
+                except Rollback:
+                    pass
+                self.stdout.write(
+                    f"{cantidad:>10} {nombre:>10} {len(ctx.captured_queries):>10} "
+                    f"{segundos:>9.3f} {cantidad / segundos:>12.0f}"
+                )
@@ -0,0 +1,58 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from mi_proyecto.importacion import importar_filas, TAMANO_LOTE
+from mi_proyecto.models import Productos
+
+
+class Rollback(Exception):
+    pass
+
+
+def generar_filas(cantidad, prefijo='BENCH'):
+    categorias = [cat[0] for cat in Productos.CATEGORIAS]
+    for i in range(cantidad):
+        yield (
+            f'{prefijo}-{i:07d}',
+            f'Producto de prueba {i}',
+            'Descripción generada para el benchmark',
+            100 + i % 50,
+            i % 20,
+            categorias[i % len(categorias)],
+            f'Proveedor {i % 25}',
+        )
+
+
+class Command(BaseCommand):
+    help = 'Mide consultas y tiempo de la importación de Excel según la cantidad de filas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--filas', type=int, nargs='+', default=[1000, 5000, 20000])
+        parser.add_argument('--lote', type=int, default=TAMANO_LOTE)
+
+    def handle(self, *args, **options):
+        tamano_lote = options['lote']
+        self.stdout.write(f"{'filas':>8} {'lotes':>6} {'consultas':>10} {'consultas/lote':>15} {'segundos':>9}")
+        for cantidad in options['filas']:
+            lotes = -(-cantidad // tamano_lote)
+            try:
+                with transaction.atomic():
+                    # Primera pasada crea los productos, la segunda los actualiza
+                    importar_filas(generar_filas(cantidad), tamano_lote=tamano_lote)
+                    with CaptureQueriesContext(connection) as ctx:
+                        inicio = time.perf_counter()
+                        resultado = importar_filas(generar_filas(cantidad), tamano_lote=tamano_lote)
+                        segundos = time.perf_counter() - inicio
+                    raise Rollback
+            except Rollback:
+                pass
+
+            consultas = len(ctx.captured_queries)
+            self.stdout.write(
+                f"{cantidad:>8} {lotes:>6} {consultas:>10} {consultas / lotes:>15.1f} {segundos:>9.2f}"
+            )
+            if resultado['errores']:
+                self.stdout.write(self.style.WARNING(f"  errores: {len(resultado['errores'])}"))
@@ -0,0 +1,106 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from mi_proyecto.datos_prueba import sembrar
+from mi_proyecto.models import Productos, SalidaProducto, HistorialMovimiento
+from mi_proyecto.paginacion import paginar_por_cursor
+
+
+class Rollback(Exception):
+    pass
+
+
+# Consultas que ejecuta cada vista de listado
+CONSULTAS = {
+    'lista_productos': lambda: list(
+        Productos.objects.filter(activo=True).select_related('proveedor').order_by('nombre')[:10]
+    ),
+    'lista_productos (categoría)': lambda: list(
+        Productos.objects.filter(activo=True, categoria='LAPTOPS').select_related('proveedor').order_by('nombre')[:10]
+    ),
+    'stock bajo': lambda: Productos.objects.filter(stock__lte=3, activo=True).count(),
+    'productos_inhabilitados': lambda: list(
+        Productos.objects.filter(activo=False).select_related('proveedor').order_by('nombre')[:10]
+    ),
+    'historial_movimientos': lambda: paginar_por_cursor(
+        HistorialMovimiento.objects.select_related('usuario'), None, 10, 'fecha_movimiento'
+    ),
+    'historial_movimientos (categoría)': lambda: paginar_por_cursor(
+        HistorialMovimiento.objects.select_related('usuario').filter(producto__categoria='UPS'),
+        None, 10, 'fecha_movimiento'
+    ),
+    'lista_salidas': lambda: paginar_por_cursor(
+        SalidaProducto.objects.select_related('producto', 'usuario'), None, 15, 'fecha_salida'
+    ),
+}
+
+
+def indices_del_modelo(*modelos):
+    return [indice.name for modelo in modelos for indice in modelo._meta.indexes]
+
+
+class Command(BaseCommand):
+    help = 'Siembra N filas y muestra planes EXPLAIN y tiempos de los listados sin y con los índices'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--productos', type=int, default=50000)
+        parser.add_argument('--movimientos', type=int, default=200000)
+        parser.add_argument('--salidas', type=int, default=50000)
+        parser.add_argument('--repeticiones', type=int, default=5)
+        parser.add_argument('--sin-planes', action='store_true', help='Muestra solo los tiempos')
+
+    def explicar(self, sql):
+        prefijo = 'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else 'EXPLAIN '
+        with connection.cursor() as cursor:
+            cursor.execute(prefijo + sql)
+            return [' '.join(str(c) for c in fila) for fila in cursor.fetchall()]
+
+    def medir(self, titulo, repeticiones, planes):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        self.stdout.write(self.style.MIGRATE_HEADING(titulo))
+        tiempos = {}
+        for nombre, consulta in CONSULTAS.items():
+            muestras = []
+            for _ in range(repeticiones):
+                with CaptureQueriesContext(connection) as ctx:
+                    inicio = time.perf_counter()
+                    consulta()
+                    muestras.append((time.perf_counter() - inicio) * 1000)
+            tiempos[nombre] = statistics.median(muestras)
+            self.stdout.write(f'  {nombre:<36} {tiempos[nombre]:>9.2f} ms')
+            if planes:
+                for linea in self.explicar(ctx.captured_queries[-1]['sql']):
+                    self.stdout.write(f'      {linea}')
+        return tiempos
+
+    def handle(self, *args, **options):
+        repeticiones = options['repeticiones']
+        planes = not options['sin_planes']
+        try:
+            with transaction.atomic():
+                self.stdout.write('Sembrando datos...')
+                sembrar(
+                    productos=options['productos'],
+                    salidas=options['salidas'],
+                    movimientos=options['movimientos'],
+                    prefijo='BENCHIDX',
+                )
+                con_indices = self.medir('Con índices', repeticiones, planes)
+
+                with connection.cursor() as cursor:
+                    for nombre in indices_del_modelo(Productos, SalidaProducto, HistorialMovimiento):
+                        cursor.execute(f'DROP INDEX {connection.ops.quote_name(nombre)}')
+                sin_indices = self.medir('Sin índices', repeticiones, planes)
+                raise Rollback
+        except Rollback:
+            pass
+
+        self.stdout.write(self.style.MIGRATE_HEADING('Resumen (mediana en ms)'))
+        self.stdout.write(f"  {'consulta':<36} {'sin índices':>12} {'con índices':>12}")
+        for nombre in CONSULTAS:
+            self.stdout.write(f'  {nombre:<36} {sin_indices[nombre]:>12.2f} {con_indices[nombre]:>12.2f}')
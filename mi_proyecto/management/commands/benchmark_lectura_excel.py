@@ -0,0 +1,66 @@
+import os
+import tempfile
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from openpyxl import Workbook, load_workbook
+
+from mi_proyecto.importacion import leer_excel
+from mi_proyecto.management.commands.benchmark_importacion import generar_filas
+
+
+def escribir_excel(ruta, cantidad):
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(['Código', 'Nombre', 'Descripción', 'Precio', 'Stock', 'Categoría', 'Proveedor'])
+    for fila in generar_filas(cantidad):
+        sheet.append(fila)
+    workbook.save(ruta)
+
+
+def lectura_completa(ruta):
+    workbook = load_workbook(ruta)
+    for _ in workbook.active.iter_rows(min_row=2, values_only=True):
+        pass
+
+
+def lectura_streaming(ruta):
+    with open(ruta, 'rb') as archivo:
+        for _ in leer_excel(archivo):
+            pass
+
+
+def medir(funcion, ruta):
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    funcion(ruta)
+    segundos = time.perf_counter() - inicio
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return pico / (1024 * 1024), segundos
+
+
+class Command(BaseCommand):
+    help = 'Compara el pico de memoria (tracemalloc) de la lectura completa y por streaming del Excel'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--filas', type=int, nargs='+', default=[1000, 10000, 50000])
+        parser.add_argument('--sin-completa', action='store_true',
+                            help='Omite la lectura completa (lenta con hojas grandes)')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'filas':>8} {'modo':>10} {'pico MB':>9} {'segundos':>9}")
+        for cantidad in options['filas']:
+            fd, ruta = tempfile.mkstemp(suffix='.xlsx')
+            os.close(fd)
+            try:
+                escribir_excel(ruta, cantidad)
+                modos = [('streaming', lectura_streaming)]
+                if not options['sin_completa']:
+                    modos.insert(0, ('completa', lectura_completa))
+                for nombre, funcion in modos:
+                    pico, segundos = medir(funcion, ruta)
+                    self.stdout.write(f"{cantidad:>8} {nombre:>10} {pico:>9.1f} {segundos:>9.2f}")
+            finally:
+                os.remove(ruta)
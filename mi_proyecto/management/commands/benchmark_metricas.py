@@ -0,0 +1,94 @@
+import statistics
+import time
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from mi_proyecto import resumenes
+from mi_proyecto.datos_prueba import sembrar
+
+from .benchmark_importacion import Rollback
+
+
+RONDAS = 10
+
+PAGINAS = ('lista_productos', 'lista_proveedores', 'lista_salidas', 'historial_movimientos', 'tablero')
+
+
+def sin_metricas():
+    # Configuración original: sin el middleware y con el backend de plantillas de Django
+    return override_settings(
+        MIDDLEWARE=[m for m in settings.MIDDLEWARE if m != 'mi_proyecto.metricas.MetricasMiddleware'],
+        TEMPLATES=[dict(t, BACKEND='django.template.backends.django.DjangoTemplates') for t in settings.TEMPLATES],
+    )
+
+
+class Command(BaseCommand):
+    help = 'Mide el costo por petición del middleware de métricas sobre las páginas de listado'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--peticiones', type=int, default=200, help='Peticiones por página y configuración')
+        parser.add_argument('--productos', type=int, default=5000)
+        parser.add_argument('--salidas', type=int, default=20000)
+
+    def medir(self, usuario, peticiones, muestras):
+        cliente = Client()
+        cliente.force_login(usuario)
+        for pagina in PAGINAS:
+            url = reverse(pagina)
+            cliente.get(url)
+            for _ in range(peticiones):
+                inicio = time.perf_counter()
+                cliente.get(url)
+                muestras.setdefault(pagina, []).append((time.perf_counter() - inicio) * 1000)
+
+    def handle(self, *args, **options):
+        peticiones = options['peticiones']
+        try:
+            with transaction.atomic():
+                self.stdout.write(f"Sembrando {options['productos']} productos y {options['salidas']} salidas...")
+                sembrar(
+                    productos=options['productos'], proveedores=50, salidas=options['salidas'],
+                    movimientos=options['salidas'], prefijo='BENCHMET',
+                )
+                resumenes.actualizar_resumenes(completo=True)
+                usuario = User.objects.create(username='benchmark_metricas', is_staff=True)
+
+                # Sin caché de vistas (se mediría la caché) ni copias a la caché compartida
+                with override_settings(CACHE_VISTAS_SEGUNDOS=0, METRICAS_INTERVALO=float('inf')):
+                    configuraciones = {
+                        'sin métricas': sin_metricas,
+                        'con métricas': nullcontext,
+                        'con cProfile': lambda: override_settings(
+                            METRICAS_PERFIL_MUESTREO=1.0, METRICAS_PERFIL_LENTA=float('inf')
+                        ),
+                    }
+                    # Rondas alternadas: la variación de la máquina afecta a todas por igual
+                    muestras = {nombre: {} for nombre in configuraciones}
+                    for _ in range(RONDAS):
+                        for nombre, configuracion in configuraciones.items():
+                            with configuracion():
+                                self.medir(usuario, max(peticiones // RONDAS, 1), muestras[nombre])
+                    medianas = {
+                        nombre: {pagina: statistics.median(tiempos) for pagina, tiempos in por_pagina.items()}
+                        for nombre, por_pagina in muestras.items()
+                    }
+
+                self.stdout.write(self.style.MIGRATE_HEADING('Mediana por petición (ms)'))
+                self.stdout.write(f"  {'página':<24}" + ''.join(f'{nombre:>16}' for nombre in configuraciones))
+                for pagina in PAGINAS:
+                    base = medianas['sin métricas'][pagina]
+                    columnas = [f'{base:.2f}'] + [
+                        f'{tiempos[pagina]:.2f} ({tiempos[pagina] - base:+.2f})'
+                        for nombre, tiempos in medianas.items() if nombre != 'sin métricas'
+                    ]
+                    self.stdout.write(f'  {pagina:<24}' + ''.join(f'{c:>16}' for c in columnas))
+                raise Rollback
+        except Rollback:
+            pass
@@ -0,0 +1,78 @@
+import threading
+
+from django.conf import settings
+from django.core.management.base import CommandError
+from django.db import connection
+
+from .benchmark_concurrencia import ASGI, Command as BenchmarkConcurrencia, _percentil
+
+
+# nombre: (argumentos de gunicorn, variables de entorno)
+MODOS = {
+    'wsgi persistentes': (['proyecto_config.wsgi:application'], {'BD_POOL': 'False'}),
+    'wsgi con pool': (['proyecto_config.wsgi:application'], {'BD_POOL': 'True'}),
+    'asgi sin pool': (ASGI, {'BD_POOL': 'False'}),
+    'asgi con pool': (ASGI, {'BD_POOL': 'True'}),
+}
+
+
+class Command(BenchmarkConcurrencia):
+    help = (
+        'Compara conexiones persistentes por hilo contra el pool de conexiones (BD_POOL), '
+        'con WSGI y ASGI y clientes concurrentes leyendo listados. Solo PostgreSQL'
+    )
+    modos = MODOS
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.set_defaults(lectores=16, pesados=0)
+
+    def handle(self, *args, **options):
+        if not settings.ES_POSTGRESQL:
+            raise CommandError('El pool de conexiones solo existe para PostgreSQL (DATABASE_URL)')
+        super().handle(*args, **options)
+
+    def cargar(self, options, puerto, sesion, salidas):
+        # Conexiones del servidor a la base, muestreadas durante la carga
+        muestras = []
+        fin = threading.Event()
+
+        def muestrear():
+            with connection.cursor() as cursor:
+                while not fin.wait(0.1):
+                    cursor.execute(
+                        "SELECT count(*) FROM pg_stat_activity "
+                        "WHERE datname = current_database() AND pid <> pg_backend_pid()"
+                    )
+                    muestras.append(cursor.fetchone()[0])
+            connection.close()
+
+        hilo = threading.Thread(target=muestrear)
+        hilo.start()
+        try:
+            resultado = super().cargar(options, puerto, sesion, salidas)
+        finally:
+            fin.set()
+            hilo.join()
+        resultado['conexiones'] = max(muestras, default=0)
+        return resultado
+
+    def informe(self, resultados, options):
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"{options['lectores']} lectores, {options['workers']} workers, "
+            f"{options['segundos']:.0f} s por modo"
+        ))
+        self.stdout.write(
+            f"  {'modo':<20}{'lecturas/s':>11}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+            f"{'conexiones':>12}{'errores':>9}"
+        )
+        for nombre, r in resultados.items():
+            lecturas = r['lecturas']
+            self.stdout.write(
+                f"  {nombre:<20}{len(lecturas) / r['segundos']:>11.1f}"
+                + (
+                    f"{_percentil(lecturas, 0.5):>9.0f}{_percentil(lecturas, 0.95):>9.0f}"
+                    f"{_percentil(lecturas, 0.99):>9.0f}" if lecturas else f"{'—':>9}" * 3
+                )
+                + f"{r['conexiones']:>12}{r['errores']:>9}"
+            )
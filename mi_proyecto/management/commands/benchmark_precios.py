@@ -0,0 +1,49 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from mi_proyecto import precios
+from mi_proyecto.datos_prueba import sembrar
+from mi_proyecto.models import Productos, ReglaPrecio
+
+from .benchmark_importacion import Rollback
+
+
+class Command(BaseCommand):
+    help = 'Mide el recálculo de precios con un UPDATE frente a recorrer los productos en Python'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--productos', type=int, nargs='+', default=[10000, 100000])
+        parser.add_argument('--sin-comparar', action='store_true', help='Omite el recálculo objeto por objeto')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'productos':>10} {'UPDATE (s)':>11} {'objetos (s)':>12}")
+        for cantidad in options['productos']:
+            try:
+                with transaction.atomic():
+                    sembrar(productos=cantidad, proveedores=20, salidas=0, movimientos=0, prefijo='BENCHPRE')
+                    seleccion = Productos.objects.filter(codigo__startswith='BENCHPRE-')
+                    # Algunas reglas específicas para que el CASE no sea trivial
+                    for i, (categoria, _) in enumerate(Productos.CATEGORIAS):
+                        ReglaPrecio.objects.update_or_create(
+                            categoria=categoria, proveedor=None, defaults={'margen': 20 + i * 5}
+                        )
+
+                    inicio = time.perf_counter()
+                    precios.recalcular_precios(seleccion)
+                    segundos_update = time.perf_counter() - inicio
+
+                    segundos_objetos = None
+                    if not options['sin_comparar']:
+                        inicio = time.perf_counter()
+                        reglas = precios.cargar_reglas()
+                        productos = list(seleccion.only('id', 'costo', 'categoria', 'proveedor_id'))
+                        precios.aplicar_precios(productos, reglas)
+                        Productos.objects.bulk_update(productos, ['precio'], batch_size=1000)
+                        segundos_objetos = time.perf_counter() - inicio
+                    raise Rollback
+            except Rollback:
+                pass
+            objetos = f'{segundos_objetos:>12.2f}' if segundos_objetos is not None else f"{'-':>12}"
+            self.stdout.write(f"{cantidad:>10} {segundos_update:>11.2f} {objetos}")
@@ -0,0 +1,340 @@
+import json
+import statistics
+import subprocess
+import time
+import tracemalloc
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import URLPattern, reverse
+from django.utils import timezone
+from openpyxl import Workbook
+
+from mi_proyecto import comprobantes, resumenes
+from mi_proyecto import urls as urls_proyecto
+from mi_proyecto.datos_prueba import sembrar
+from mi_proyecto.importacion import ejecutar_importacion
+from mi_proyecto.models import Productos, Proveedor, SalidaProducto, ImportacionExcel, ReglaPrecio
+
+from .benchmark_importacion import Rollback, generar_filas
+
+
+PREFIJO = 'BENCHSUITE'
+
+# Rutas que no se miden: cerrar sesión invalida la del cliente
+OMITIDAS = {'logout'}
+
+# Objeto sembrado que recibe cada ruta con ``<int:id>``
+OBJETOS = {
+    'editar_producto': 'producto',
+    'eliminar_producto': 'producto',
+    'deshabilitar_producto': 'producto',
+    'habilitar_producto': 'inhabilitado',
+    'editar_proveedor': 'proveedor',
+    'eliminar_proveedor': 'proveedor',
+    'eliminar_regla_precio': 'regla',
+    'generar_pdf_salida': 'salida',
+    'estado_importacion': 'importacion',
+    'progreso_importacion': 'importacion',
+}
+
+# Parámetros GET de las rutas que sin ellos no hacen el trabajo que se quiere medir
+PARAMETROS = {
+    'exportar_productos': {'formato': 'csv'},
+    'exportar_historial': {'formato': 'csv'},
+    'exportar_salidas': {'formato': 'csv'},
+    'comprobantes_salidas': {'formato': 'pdf'},
+    'autocompletar_productos': {'q': 'producto 12'},
+}
+
+# Rutas que además reciben el rango de fechas ``desde``/``hasta`` (el día de hoy)
+CON_RANGO = {'comprobantes_salidas'}
+
+# Variantes medidas además de cada ruta: (nombre, ruta, parámetros)
+VARIANTES = [
+    ('exportar_productos (xlsx)', 'exportar_productos', {'formato': 'xlsx'}),
+    ('exportar_salidas (xlsx)', 'exportar_salidas', {'formato': 'xlsx'}),
+    ('comprobantes_salidas (zip)', 'comprobantes_salidas', {'formato': 'zip'}),
+    ('lista_productos (búsqueda)', 'lista_productos', {'busqueda': 'producto 12'}),
+    ('historial_movimientos (categoría)', 'historial_movimientos', {'categoria': 'UPS'}),
+]
+
+
+def _rutas():
+    # Un nombre puede tener varias rutas (login, lista_productos): se mide la de reverse()
+    vistas = {}
+    for patron in urls_proyecto.urlpatterns:
+        if isinstance(patron, URLPattern) and patron.name and patron.name not in vistas:
+            vistas[patron.name] = patron
+    return vistas
+
+
+def _commit():
+    try:
+        salida = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR, capture_output=True, text=True, timeout=5
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return salida.stdout.strip() or None
+
+
+def _excel(filas):
+    libro = Workbook(write_only=True)
+    hoja = libro.create_sheet()
+    hoja.append(['Código', 'Nombre', 'Descripción', 'Costo', 'Stock', 'Categoría', 'Proveedor'])
+    for fila in generar_filas(filas, prefijo=f'{PREFIJO}-XLS'):
+        hoja.append(fila)
+    contenido = BytesIO()
+    libro.save(contenido)
+    return contenido.getvalue()
+
+
+def _percentil(muestras, q):
+    ordenadas = sorted(muestras)
+    return ordenadas[min(int(q * len(ordenadas)), len(ordenadas) - 1)]
+
+
+class Command(BaseCommand):
+    help = (
+        'Siembra volúmenes configurables y mide latencia, consultas y memoria de cada ruta de '
+        'mi_proyecto/urls.py, la importación de Excel y los comprobantes PDF; escribe un informe JSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--productos', type=int, default=5000)
+        parser.add_argument('--proveedores', type=int, default=100)
+        parser.add_argument('--salidas', type=int, default=50000)
+        parser.add_argument('--movimientos', type=int, default=100000)
+        parser.add_argument('--dias', type=int, default=365)
+        parser.add_argument('--filas-excel', type=int, default=2000)
+        parser.add_argument('--repeticiones', type=int, default=10)
+        parser.add_argument('--solo', nargs='+', help='Mide solo los escenarios que contienen alguno de estos textos')
+        parser.add_argument('--informe', help='Archivo JSON donde guardar el informe')
+        parser.add_argument('--comparar', help='Informe JSON anterior con el que comparar')
+        parser.add_argument('--umbral', type=float, default=20, help='Porcentaje de aumento de la mediana que se marca')
+        parser.add_argument('--fallar', action='store_true', help='Termina con error si hay regresiones')
+
+    def medir(self, nombre, peticion, preparar=None):
+        """
+        Ejecuta ``peticion`` ``repeticiones`` veces midiendo el tiempo, y una vez
+        más con tracemalloc (que la hace más lenta) para la memoria y las consultas.
+        """
+        if self.solo and not any(texto in nombre for texto in self.solo):
+            return
+        if preparar:
+            preparar()
+        estado = peticion()
+        muestras = []
+        for _ in range(self.repeticiones):
+            if preparar:
+                preparar()
+            inicio = time.perf_counter()
+            peticion()
+            muestras.append((time.perf_counter() - inicio) * 1000)
+        if preparar:
+            preparar()
+        tracemalloc.start()
+        try:
+            with CaptureQueriesContext(connection) as ctx:
+                peticion()
+            _, pico = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        resultado = {
+            'estado': estado,
+            'mediana_ms': round(statistics.median(muestras), 2),
+            'p95_ms': round(_percentil(muestras, 0.95), 2),
+            'min_ms': round(min(muestras), 2),
+            'consultas': len(ctx.captured_queries),
+            'memoria_kb': round(pico / 1024),
+        }
+        self.resultados[nombre] = resultado
+        self.stdout.write(
+            f"  {nombre:<40} {estado:>6} {resultado['mediana_ms']:>9.1f} {resultado['p95_ms']:>9.1f} "
+            f"{resultado['consultas']:>9} {resultado['memoria_kb']:>10}"
+        )
+
+    def get(self, cliente, ruta, parametros=None, kwargs=None):
+        parametros = dict(parametros or {})
+        if ruta in CON_RANGO:
+            hoy = timezone.localdate().isoformat()
+            parametros.update(desde=hoy, hasta=hoy)
+        url = reverse(ruta, kwargs=kwargs)
+
+        def peticion():
+            respuesta = cliente.get(url, parametros)
+            if respuesta.streaming:
+                # Las exportaciones se generan mientras se envían
+                for _ in respuesta.streaming_content:
+                    pass
+            return respuesta.status_code
+        return peticion
+
+    def sembrar(self, options):
+        self.stdout.write(
+            f"Sembrando {options['productos']} productos, {options['proveedores']} proveedores, "
+            f"{options['salidas']} salidas y {options['movimientos']} movimientos..."
+        )
+        inicio = time.perf_counter()
+        sembrar(
+            productos=options['productos'], proveedores=options['proveedores'], salidas=options['salidas'],
+            movimientos=options['movimientos'], dias=options['dias'], prefijo=PREFIJO,
+        )
+        resumenes.actualizar_resumenes(completo=True)
+        productos = Productos.objects.filter(codigo__startswith=f'{PREFIJO}-')
+        inhabilitado = productos.order_by('-id').first()
+        Productos.objects.filter(id=inhabilitado.id).update(activo=False)
+        self.stdout.write(f'  {time.perf_counter() - inicio:.1f} s')
+        return {
+            'producto': productos.order_by('id').values_list('id', flat=True).first(),
+            'inhabilitado': inhabilitado.id,
+            'proveedor': Proveedor.objects.filter(nombre__startswith=f'{PREFIJO} ').values_list('id', flat=True).first(),
+            'regla': ReglaPrecio.objects.create(categoria='UPS', margen=25).id,
+            'salida': SalidaProducto.objects.order_by('-id').values_list('id', flat=True).first(),
+        }
+
+    def importar(self, cliente, usuario, filas):
+        contenido = _excel(filas)
+
+        def subir():
+            archivo = SimpleUploadedFile('productos.xlsx', contenido)
+            return cliente.post(reverse('importar_excel'), {'archivo_excel': archivo}).status_code
+
+        importaciones = []
+
+        def procesar():
+            # Ya tomada, como la deja reclamar_importacion (que elegiría la más antigua de las subidas)
+            ahora = timezone.now()
+            importacion = ImportacionExcel.objects.create(
+                archivo=SimpleUploadedFile('productos.xlsx', contenido), usuario=usuario,
+                estado='PROCESANDO', fecha_inicio=ahora, fecha_actualizacion=ahora,
+            )
+            importaciones.append(importacion.id)
+            ejecutar_importacion(importacion)
+            importacion.refresh_from_db(fields=['estado'])
+            return 200 if importacion.estado == 'COMPLETADA' else 500
+
+        self.medir('importar_excel (subida)', subir)
+        # La primera importación crea los productos y las siguientes los actualizan
+        self.medir(f'importación de {filas} filas (worker)', procesar)
+        if importaciones:
+            return importaciones[0]
+        return ImportacionExcel.objects.create(usuario=usuario, estado='COMPLETADA').id
+
+    def handle(self, *args, **options):
+        self.repeticiones = options['repeticiones']
+        self.solo = options['solo']
+        self.resultados = {}
+        anterior = None
+        if options['comparar']:
+            with open(options['comparar'], encoding='utf-8') as archivo:
+                anterior = json.load(archivo)
+
+        informe = {
+            'fecha': timezone.now().isoformat(),
+            'commit': _commit(),
+            'base_de_datos': connection.vendor,
+            'volumenes': {
+                clave: options[clave]
+                for clave in ('productos', 'proveedores', 'salidas', 'movimientos', 'dias', 'filas_excel')
+            },
+            'repeticiones': self.repeticiones,
+            'resultados': self.resultados,
+        }
+        salidas_sembradas = []
+        # Sin caché de vistas (se mediría la caché), sin presupuesto estricto (las
+        # consultas de más se informan) y sin copiar estas peticiones a las métricas
+        with override_settings(
+            CACHE_VISTAS_SEGUNDOS=0, PRESUPUESTO_CONSULTAS_ESTRICTO=False, METRICAS_INTERVALO=float('inf'),
+            AUDITORIA_SINCRONA=True,
+        ):
+            try:
+                with transaction.atomic():
+                    ids = self.sembrar(options)
+                    salidas_sembradas = list(
+                        SalidaProducto.objects.filter(producto__codigo__startswith=f'{PREFIJO}-')
+                        .values_list('id', flat=True)
+                    )
+                    usuario = User.objects.create(username=f'{PREFIJO.lower()}_staff', is_staff=True)
+                    cliente = Client()
+                    cliente.force_login(usuario)
+
+                    self.stdout.write(self.style.MIGRATE_HEADING(
+                        f"  {'escenario':<40} {'estado':>6} {'mediana':>9} {'p95':>9} {'consultas':>9} {'memoria KB':>10}"
+                    ))
+                    ids['importacion'] = self.importar(cliente, usuario, options['filas_excel'])
+
+                    for nombre, patron in _rutas().items():
+                        if nombre in OMITIDAS:
+                            continue
+                        kwargs = None
+                        if patron.pattern.converters:
+                            if nombre not in OBJETOS:
+                                self.stdout.write(self.style.WARNING(f'  {nombre}: sin objeto para sus parámetros, se omite'))
+                                continue
+                            kwargs = {'id': ids[OBJETOS[nombre]]}
+                        self.medir(nombre, self.get(cliente, nombre, PARAMETROS.get(nombre), kwargs))
+
+                    for nombre, ruta, parametros in VARIANTES:
+                        self.medir(nombre, self.get(cliente, ruta, parametros))
+
+                    salida = ids['salida']
+                    self.medir(
+                        'generar_pdf_salida (sin caché)',
+                        self.get(cliente, 'generar_pdf_salida', kwargs={'id': salida}),
+                        preparar=lambda: comprobantes.invalidar_comprobante(salida),
+                    )
+                    # Los archivos subidos no se borran con el rollback
+                    for importacion in ImportacionExcel.objects.filter(usuario=usuario).exclude(archivo=''):
+                        importacion.archivo.delete(save=False)
+                    raise Rollback
+            except Rollback:
+                pass
+            finally:
+                # Los ids de las salidas sembradas se reutilizarán: sus PDF no deben quedar en disco
+                for salida_id in salidas_sembradas:
+                    comprobantes.invalidar_comprobante(salida_id)
+
+        if options['informe']:
+            with open(options['informe'], 'w', encoding='utf-8') as archivo:
+                json.dump(informe, archivo, ensure_ascii=False, indent=2)
+            self.stdout.write(f"Informe guardado en {options['informe']}")
+        if anterior is not None:
+            regresiones = self.comparar(anterior, informe, options['umbral'])
+            if regresiones and options['fallar']:
+                raise CommandError(f'{regresiones} escenarios empeoraron respecto de {options["comparar"]}')
+
+    def comparar(self, anterior, actual, umbral):
+        """Muestra la diferencia con un informe anterior y devuelve cuántos escenarios empeoraron."""
+        if anterior.get('volumenes') != actual['volumenes']:
+            self.stdout.write(self.style.WARNING('Los informes se tomaron con volúmenes distintos'))
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"Comparación con {anterior.get('commit') or 'el informe anterior'} (mediana ms y consultas)"
+        ))
+        regresiones = 0
+        for nombre, ahora in actual['resultados'].items():
+            antes = anterior['resultados'].get(nombre)
+            if antes is None:
+                self.stdout.write(f'  {nombre:<40} nuevo')
+                continue
+            cambio = (ahora['mediana_ms'] - antes['mediana_ms']) * 100 / (antes['mediana_ms'] or 1)
+            # Menos de un milisegundo de diferencia es ruido aunque el porcentaje sea alto
+            lento = cambio > umbral and ahora['mediana_ms'] - antes['mediana_ms'] > 1
+            mas_consultas = ahora['consultas'] > antes['consultas']
+            linea = (
+                f"  {nombre:<40} {antes['mediana_ms']:>9.1f} -> {ahora['mediana_ms']:>9.1f} ({cambio:+.0f}%) "
+                f"{antes['consultas']:>5} -> {ahora['consultas']:<5}"
+            )
+            if lento or mas_consultas:
+                regresiones += 1
+                self.stdout.write(self.style.WARNING(linea))
+            else:
+                self.stdout.write(linea)
+        return regresiones
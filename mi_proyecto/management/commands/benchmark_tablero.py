@@ -0,0 +1,107 @@
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, Sum
+from django.db.models.functions import TruncMonth
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from mi_proyecto import resumenes
+from mi_proyecto.archivo import inicio_del_dia
+from mi_proyecto.datos_prueba import sembrar
+from mi_proyecto.models import Productos, SalidaProducto
+
+from .benchmark_importacion import Rollback
+
+
+def datos_sin_resumenes(desde, hasta):
+    # Las mismas cifras del tablero calculadas sobre las salidas
+    salidas = SalidaProducto.objects.filter(
+        fecha_salida__gte=inicio_del_dia(desde), fecha_salida__lt=inicio_del_dia(hasta + timedelta(days=1))
+    )
+    valor = ExpressionWrapper(F('precio') * F('stock'), output_field=DecimalField(max_digits=20, decimal_places=2))
+    list(Productos.objects.filter(activo=True).values('categoria').annotate(total=Sum(valor)).order_by())
+    list(salidas.values('motivo').annotate(total=Sum('cantidad')).order_by('-total'))
+    list(
+        salidas.annotate(inicio_mes=TruncMonth('fecha_salida')).values('inicio_mes', 'producto__categoria')
+        .annotate(total=Sum('cantidad')).order_by('inicio_mes')
+    )
+    list(salidas.values('producto', 'producto__nombre').annotate(total=Sum('cantidad')).order_by('-total')[:10])
+    list(
+        salidas.values('producto__proveedor', 'producto__proveedor__nombre')
+        .annotate(total=Sum('cantidad')).order_by('-total')
+    )
+
+
+class Command(BaseCommand):
+    help = 'Siembra años de salidas y compara el tablero leído de los resúmenes con el calculado sobre las salidas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--salidas', type=int, default=1_000_000)
+        parser.add_argument('--productos', type=int, default=10000)
+        parser.add_argument('--dias', type=int, default=3 * 365)
+        parser.add_argument('--nuevas', type=int, default=2000, help='Salidas del día para medir la actualización incremental')
+        parser.add_argument('--repeticiones', type=int, default=5)
+
+    def medir(self, funcion, repeticiones):
+        muestras = []
+        for _ in range(repeticiones):
+            with CaptureQueriesContext(connection) as ctx:
+                inicio = time.perf_counter()
+                funcion()
+                muestras.append((time.perf_counter() - inicio) * 1000)
+        return statistics.median(muestras), len(ctx.captured_queries)
+
+    def handle(self, *args, **options):
+        repeticiones = options['repeticiones']
+        hoy = timezone.localdate()
+        rangos = {
+            'último mes': (hoy - timedelta(days=30), hoy),
+            'últimos 12 meses': (hoy - timedelta(days=365), hoy),
+            f"{options['dias']} días": (hoy - timedelta(days=options['dias']), hoy),
+        }
+        try:
+            with transaction.atomic():
+                self.stdout.write(f"Sembrando {options['salidas']} salidas en {options['dias']} días...")
+                sembrar(
+                    productos=options['productos'],
+                    proveedores=50,
+                    salidas=options['salidas'],
+                    movimientos=0,
+                    dias=options['dias'],
+                    prefijo='BENCHTAB',
+                )
+
+                inicio = time.perf_counter()
+                filas = resumenes.actualizar_resumenes(completo=True)
+                self.stdout.write(
+                    f"Resúmenes completos: {filas['salidas']} filas por día, {filas['productos']} de productos "
+                    f"y {filas['proveedores']} de proveedores por mes en {time.perf_counter() - inicio:.1f} s"
+                )
+                producto = Productos.objects.filter(codigo__startswith='BENCHTAB-').first()
+                SalidaProducto.objects.bulk_create(
+                    SalidaProducto(producto=producto, cantidad=1, motivo='VENTA') for _ in range(options['nuevas'])
+                )
+                inicio = time.perf_counter()
+                resumenes.actualizar_resumenes()
+                self.stdout.write(
+                    f"Actualización incremental con {options['nuevas']} salidas nuevas: "
+                    f"{(time.perf_counter() - inicio) * 1000:.0f} ms"
+                )
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE')
+
+                self.stdout.write(self.style.MIGRATE_HEADING('Tablero (mediana en ms, consultas)'))
+                self.stdout.write(f"  {'rango':<20} {'sobre salidas':>16} {'con resúmenes':>16}")
+                for nombre, (desde, hasta) in rangos.items():
+                    crudo, consultas_crudo = self.medir(lambda: datos_sin_resumenes(desde, hasta), repeticiones)
+                    resumido, consultas = self.medir(lambda: resumenes.datos_tablero(desde, hasta), repeticiones)
+                    self.stdout.write(
+                        f'  {nombre:<20} {crudo:>10.1f} ({consultas_crudo}) {resumido:>10.1f} ({consultas})'
+                    )
+                raise Rollback
+        except Rollback:
+            pass
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from mi_proyecto import cache_vistas
+from mi_proyecto import views  # noqa: F401  (registra las vistas con caché)
+
+
+class Command(BaseCommand):
+    help = 'Muestra aciertos y fallos de la caché de vistas de listado'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reiniciar', action='store_true', help='Pone los contadores en cero')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'vista':<28} {'hit':>8} {'miss':>8} {'ratio':>7}")
+        for vista, datos in cache_vistas.metricas().items():
+            ratio = f"{datos['ratio']:.0%}" if datos['ratio'] is not None else '—'
+            self.stdout.write(f"{vista:<28} {datos['hit']:>8} {datos['miss']:>8} {ratio:>7}")
+        if options['reiniciar']:
+            cache_vistas.reiniciar_metricas()
+            self.stdout.write('Contadores reiniciados')
@@ -0,0 +1,66 @@
+from django.core.management.base import BaseCommand
+
+from mi_proyecto import metricas
+
+
+def _ms(segundos):
+    return f'{segundos * 1000:.0f}' if segundos is not None else '—'
+
+
+class Command(BaseCommand):
+    help = 'Resume las métricas por vista de todos los procesos (las mismas que publica /metricas/)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reiniciar', action='store_true', help='Pone las métricas en cero')
+
+    def handle(self, *args, **options):
+        valores = metricas.fotos()
+        por_vista = {}
+        pools = {}
+        for (nombre, etiquetas), valor in valores.items():
+            etiquetas = dict(etiquetas)
+            if 'vista' in etiquetas:
+                por_vista.setdefault(etiquetas['vista'], {})[nombre] = valor
+            elif nombre.startswith('bd_pool_'):
+                nombre = nombre[len('bd_pool_'):]
+                if 'tipo' in etiquetas:
+                    nombre = f"errores_{etiquetas['tipo']}"
+                pools.setdefault(etiquetas['alias'], {})[nombre] = valor
+
+        self.stdout.write(
+            f"{'vista':<28} {'peticiones':>10} {'p50 ms':>7} {'p95 ms':>7} {'consultas':>9} "
+            f"{'SQL ms':>7} {'render ms':>9} {'repetidas':>9} {'lentas':>6}"
+        )
+        orden = sorted(por_vista.items(), key=lambda item: -item[1].get('peticion_segundos', [0])[-1])
+        for vista, datos in orden:
+            latencia = datos.get('peticion_segundos')
+            if latencia is None:
+                continue
+            total = sum(latencia[:-1])
+            p50 = metricas.cuantil(latencia, metricas.CUBETAS_SEGUNDOS, 0.5)
+            p95 = metricas.cuantil(latencia, metricas.CUBETAS_SEGUNDOS, 0.95)
+            self.stdout.write(
+                f"{vista:<28} {total:>10} {_ms(p50):>7} {_ms(p95):>7} "
+                f"{datos['consultas_sql'][-1] / total:>9.1f} "
+                f"{datos['sql_segundos'][-1] / total * 1000:>7.1f} "
+                f"{datos['render_segundos'][-1] / total * 1000:>9.1f} "
+                f"{datos.get('consultas_repetidas_total', 0):>9} {datos.get('consultas_lentas_total', 0):>6}"
+            )
+        self.stdout.write('p50 y p95 son el límite superior de su cubeta; consultas, SQL y render son promedios')
+
+        for alias, datos in pools.items():
+            entregas = datos.get('checkouts_total', 0)
+            esperas = datos.get('esperas_total', 0)
+            espera_media = datos.get('espera_segundos_total', 0) / esperas * 1000 if esperas else 0
+            errores = ', '.join(
+                f'{nombre[len("errores_"):]} {valor}' for nombre, valor in sorted(datos.items()) if nombre.startswith('errores_')
+            )
+            self.stdout.write(
+                f"Pool {alias}: {datos.get('conexiones_abiertas', 0)} conexiones abiertas, "
+                f"{datos.get('conexiones_en_uso', 0)} en uso, {entregas} entregas, "
+                f"{esperas} esperas ({espera_media:.0f} ms en promedio), "
+                f"{datos.get('recicladas_total', 0)} recicladas, errores: {errores or 'ninguno'}"
+            )
+        if options['reiniciar']:
+            metricas.reiniciar()
+            self.stdout.write('Métricas reiniciadas')
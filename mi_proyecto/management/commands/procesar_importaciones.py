@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from mi_proyecto.importacion import reclamar_importacion, ejecutar_importacion
+
+
+class Command(BaseCommand):
+    help = 'Worker que procesa las importaciones de Excel en cola (usa la base de datos como cola)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--intervalo', type=float, default=2.0,
+                            help='Segundos de espera cuando no hay importaciones pendientes')
+        parser.add_argument('--una-vez', action='store_true',
+                            help='Procesa las importaciones pendientes y termina')
+
+    def handle(self, *args, **options):
+        self.stdout.write('Esperando importaciones...')
+        while True:
+            close_old_connections()
+            importacion = reclamar_importacion()
+            if importacion is None:
+                if options['una_vez']:
+                    return
+                time.sleep(options['intervalo'])
+                continue
+
+            self.stdout.write(f'Procesando importación {importacion.id} ({importacion.nombre_archivo})')
+            importacion = ejecutar_importacion(importacion)
+            self.stdout.write(
+                f'Importación {importacion.id}: {importacion.get_estado_display()} - '
+                f'{importacion.importados} nuevos, {importacion.actualizados} actualizados, '
+                f'{importacion.total_errores} errores'
+            )
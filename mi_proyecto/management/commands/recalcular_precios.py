@@ -0,0 +1,15 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from mi_proyecto import precios
+
+
+class Command(BaseCommand):
+    help = 'Recalcula el precio de venta de todo el catálogo a partir del costo y las reglas de margen'
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        actualizados = precios.recalcular_precios()
+        segundos = time.perf_counter() - inicio
+        self.stdout.write(self.style.SUCCESS(f'{actualizados} producto(s) actualizados en {segundos:.2f} s'))
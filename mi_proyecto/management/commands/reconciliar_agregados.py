@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from mi_proyecto import agregados
+
+
+class Command(BaseCommand):
+    help = 'Recalcula los agregados del inventario (stock bajo, productos por categoría, valor del stock)'
+
+    def handle(self, *args, **options):
+        diferencias = agregados.reconciliar()
+        if not diferencias:
+            self.stdout.write(self.style.SUCCESS('Agregados al día, sin diferencias'))
+            return
+        for clave, (anterior, actual) in diferencias.items():
+            self.stdout.write(f'{clave}: {anterior} -> {actual}')
+        self.stdout.write(self.style.WARNING(f'{len(diferencias)} agregado(s) corregido(s)'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from mi_proyecto import auditoria
+
+
+class Command(BaseCommand):
+    help = 'Escribe en el historial los movimientos que quedaron en diarios de procesos terminados'
+
+    def handle(self, *args, **options):
+        recuperados = auditoria.recuperar()
+        self.stdout.write(self.style.SUCCESS(f'{recuperados} movimiento(s) procesados desde los diarios'))
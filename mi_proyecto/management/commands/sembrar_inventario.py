@@ -0,0 +1,84 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from mi_proyecto import resumenes
+from mi_proyecto.datos_prueba import escribir_excel, sembrar_inventario
+from mi_proyecto.models import Productos
+
+
+class Command(BaseCommand):
+    help = (
+        'Genera un inventario grande con distribuciones realistas (productos, proveedores, salidas e '
+        'historial) y, opcionalmente, un Excel para probar la importación'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--productos', type=int, default=100000)
+        parser.add_argument('--proveedores', type=int, default=500)
+        parser.add_argument('--salidas', type=int, default=1000000)
+        parser.add_argument('--movimientos', type=int, default=1000000, help='Movimientos del historial')
+        parser.add_argument('--dias', type=int, default=730, help='Días sobre los que se reparten las fechas')
+        parser.add_argument('--usuarios', type=int, default=20)
+        parser.add_argument('--semilla', type=int, default=0)
+        parser.add_argument('--prefijo', default='INV', help='Prefijo de códigos, proveedores y usuarios')
+        parser.add_argument('--excel', help='Ruta del Excel de importación a generar')
+        parser.add_argument('--filas-excel', type=int, help='Filas del Excel (por defecto, --productos)')
+        parser.add_argument('--solo-excel', action='store_true', help='Genera el Excel sin sembrar la base de datos')
+        parser.add_argument('--resumenes', action='store_true', help='Recalcula los resúmenes del tablero al terminar')
+
+    def handle(self, *args, **options):
+        prefijo = options['prefijo']
+        if not options['solo_excel']:
+            if Productos.objects.filter(codigo__startswith=f'{prefijo}-').exists():
+                raise CommandError(f'Ya hay productos con el prefijo {prefijo}: use otro --prefijo')
+            self.sembrar(options)
+        elif not options['excel']:
+            raise CommandError('--solo-excel requiere --excel')
+
+        if options['excel']:
+            filas = options['filas_excel'] if options['filas_excel'] is not None else options['productos']
+            inicio = time.perf_counter()
+            escribir_excel(
+                options['excel'], filas, prefijo=prefijo, proveedores=options['proveedores'], semilla=options['semilla']
+            )
+            self.stdout.write(f"Excel con {filas} filas en {options['excel']} ({time.perf_counter() - inicio:.1f} s)")
+
+    def sembrar(self, options):
+        avisado = {}
+
+        def al_avanzar(tabla, escritas, total):
+            # Una línea por cada 10% de la tabla
+            paso = escritas * 10 // max(total, 1)
+            if avisado.get(tabla) != paso:
+                avisado[tabla] = paso
+                self.stdout.write(f'  {tabla}: {escritas}/{total} ({time.perf_counter() - inicio:.0f} s)')
+
+        inicio = time.perf_counter()
+        with transaction.atomic():
+            escritas = sembrar_inventario(
+                productos=options['productos'],
+                proveedores=options['proveedores'],
+                salidas=options['salidas'],
+                movimientos=options['movimientos'],
+                dias=options['dias'],
+                semilla=options['semilla'],
+                prefijo=options['prefijo'],
+                usuarios=options['usuarios'],
+                al_avanzar=al_avanzar,
+            )
+        segundos = time.perf_counter() - inicio
+        total = sum(escritas.values())
+        self.stdout.write(self.style.SUCCESS(
+            f"{total} filas en {segundos:.0f} s ({total / max(segundos, 0.001):.0f} filas/s): "
+            + ', '.join(f'{filas} {tabla}' for tabla, filas in escritas.items())
+        ))
+
+        if options['resumenes']:
+            inicio = time.perf_counter()
+            resumenes.actualizar_resumenes(completo=True)
+            self.stdout.write(f'Resúmenes del tablero recalculados ({time.perf_counter() - inicio:.0f} s)')
+        self.stdout.write(
+            'El historial anterior a los meses recientes se mueve al archivo con archivar_historial'
+        )
@@ -0,0 +1,27 @@
+from datetime import datetime, time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from mi_proyecto import stock
+from mi_proyecto.models import Productos
+
+
+class Command(BaseCommand):
+    help = 'Muestra el stock que tenía un producto al final de un día'
+
+    def add_arguments(self, parser):
+        parser.add_argument('codigo')
+        parser.add_argument('fecha', help='AAAA-MM-DD')
+
+    def handle(self, *args, **options):
+        dia = parse_date(options['fecha'])
+        if dia is None:
+            raise CommandError('Fecha inválida: use el formato AAAA-MM-DD')
+        producto = Productos.objects.filter(codigo=options['codigo']).first()
+        if producto is None:
+            raise CommandError(f"No existe un producto con código {options['codigo']}")
+        momento = timezone.make_aware(datetime.combine(dia, time.max))
+        cantidad = stock.stock_a_fecha(producto.id, momento)
+        self.stdout.write(f'{producto.codigo} - {producto.nombre}: {cantidad} unidad(es) al {dia:%d/%m/%Y}')
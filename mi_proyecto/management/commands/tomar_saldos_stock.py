@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from mi_proyecto import stock
+from mi_proyecto.archivo import inicio_del_dia
+
+
+class Command(BaseCommand):
+    help = 'Guarda el saldo de stock de los productos con movimientos desde el último saldo (programar a diario)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fecha', help='Día del saldo (AAAA-MM-DD); por defecto, hoy a las 00:00')
+
+    def handle(self, *args, **options):
+        dia = timezone.localdate()
+        if options['fecha']:
+            dia = parse_date(options['fecha'])
+            if dia is None:
+                raise CommandError('Fecha inválida: use el formato AAAA-MM-DD')
+        inicio = time.perf_counter()
+        guardados = stock.tomar_saldos(inicio_del_dia(dia))
+        segundos = time.perf_counter() - inicio
+        self.stdout.write(self.style.SUCCESS(f'{guardados} saldo(s) al {dia:%d/%m/%Y} guardados en {segundos:.2f} s'))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from mi_proyecto import stock
+
+
+class Command(BaseCommand):
+    help = 'Compara el stock de cada producto con la suma de su libro de stock'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mostrar', type=int, default=50, help='Diferencias a listar como máximo')
+
+    def handle(self, *args, **options):
+        diferencias = stock.verificar()
+        if not diferencias:
+            self.stdout.write(self.style.SUCCESS('El stock coincide con el libro en todos los productos'))
+            return
+        for producto_id, codigo, actual, libro in diferencias[:options['mostrar']]:
+            self.stdout.write(f'  {codigo} (id {producto_id}): stock {actual}, libro {libro}, diferencia {actual - libro:+d}')
+        raise CommandError(f'{len(diferencias)} producto(s) con stock distinto al del libro')
@@ -0,0 +1,413 @@
+import atexit
+import cProfile
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.template.backends.django import DjangoTemplates
+from django.utils import timezone
+
+from .asincrono import envolver_consultas
+from .pool_bd import pool as pool_bd
+
+
+logger = logging.getLogger(__name__)
+
+CUBETAS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+CUBETAS_CONSULTAS = (1, 2, 3, 5, 10, 20, 50, 100, 250, 500)
+
+# nombre: (tipo, ayuda, cubetas); en Prometheus llevan el prefijo ``inventario_``
+METRICAS = {
+    'peticiones_total': ('counter', 'Peticiones atendidas por vista, método y estado', None),
+    'peticion_segundos': ('histogram', 'Duración de la petición (sin el envío de respuestas en streaming)', CUBETAS_SEGUNDOS),
+    'consultas_sql': ('histogram', 'Consultas SQL por petición', CUBETAS_CONSULTAS),
+    'sql_segundos': ('histogram', 'Tiempo de SQL por petición', CUBETAS_SEGUNDOS),
+    'render_segundos': ('histogram', 'Tiempo de renderizado de plantillas por petición', CUBETAS_SEGUNDOS),
+    'consultas_repetidas_total': ('counter', 'Consultas con el mismo SQL (con cualquier parámetro) repetidas en la misma petición', None),
+    'consultas_lentas_total': ('counter', 'Consultas que superaron METRICAS_CONSULTA_LENTA', None),
+    'perfiles_guardados_total': ('counter', 'Perfiles cProfile guardados de peticiones lentas', None),
+    # Pool de conexiones (BD_POOL), por alias de base de datos
+    'bd_pool_checkouts_total': ('counter', 'Conexiones entregadas por el pool', None),
+    'bd_pool_esperas_total': ('counter', 'Entregas que tuvieron que esperar una conexión libre', None),
+    'bd_pool_espera_segundos_total': ('counter', 'Tiempo total esperando una conexión libre', None),
+    'bd_pool_errores_total': (
+        'counter', 'Errores del pool: conexion (no se pudo abrir), salud (conexión cortada), agotado (espera vencida)', None
+    ),
+    'bd_pool_recicladas_total': ('counter', 'Conexiones reemplazadas por superar BD_POOL_VIDA', None),
+    'bd_pool_conexiones_abiertas': ('gauge', 'Conexiones abiertas por el pool', None),
+    'bd_pool_conexiones_en_uso': ('gauge', 'Conexiones del pool entregadas en este momento', None),
+}
+
+# Procesos que pueden publicar sus métricas a la vez, cada uno en su ranura
+RANURAS = 64
+
+_medicion = ContextVar('medicion', default=None)
+_candado_perfil = threading.Lock()
+
+
+class _Registro:
+    """
+    Contadores e histogramas del proceso, en memoria.
+
+    Cada petición los actualiza una sola vez, al terminar; cada
+    ``METRICAS_INTERVALO`` segundos se copian a la caché compartida para que
+    el endpoint publique los de todos los procesos.
+
+    Cada proceso escribe en su propia ranura (``metricas:proceso:<n>``), que
+    reclama con ``cache.add`` y que vence a los ``METRICAS_VIGENCIA`` segundos
+    de la última copia: no hay una lista compartida que actualizar, y la copia
+    de un proceso que murió deja de sumarse sola.
+    """
+
+    def __init__(self):
+        self.id = f'{os.getpid()}-{uuid.uuid4().hex[:8]}'
+        self.candado = threading.Lock()
+        self.valores = {}
+        self.enviado = time.monotonic()
+        self.ranura = None
+
+    def sumar(self, nombre, etiquetas, valor=1):
+        clave = (nombre, etiquetas)
+        self.valores[clave] = self.valores.get(clave, 0) + valor
+
+    def observar(self, nombre, etiquetas, valor):
+        # [cuenta por cubeta..., cuenta sobre la última cubeta, suma]
+        cubetas = METRICAS[nombre][2]
+        clave = (nombre, etiquetas)
+        histograma = self.valores.get(clave)
+        if histograma is None:
+            histograma = self.valores[clave] = [0] * (len(cubetas) + 2)
+        histograma[bisect_left(cubetas, valor)] += 1
+        histograma[-1] += valor
+
+    def foto(self):
+        with self.candado:
+            valores = {clave: list(v) if isinstance(v, list) else v for clave, v in self.valores.items()}
+        for alias, datos in pool_bd.estadisticas().items():
+            for nombre, valor in datos.items():
+                etiquetas = (('alias', alias),)
+                if nombre.startswith('errores_'):
+                    nombre, etiquetas = 'errores_total', etiquetas + (('tipo', nombre[len('errores_'):]),)
+                valores[(f'bd_pool_{nombre}', etiquetas)] = valor
+        return valores
+
+    def enviar(self):
+        self.enviado = time.monotonic()
+        copia = {'proceso': self.id, 'valores': self.foto()}
+        vigencia = settings.METRICAS_VIGENCIA
+        if self.ranura is not None:
+            guardada = cache.get(_clave_ranura(self.ranura))
+            if guardada is not None and guardada['proceso'] == self.id:
+                cache.set(_clave_ranura(self.ranura), copia, timeout=vigencia)
+                return
+        # Sin ranura, vencida o reclamada por otro proceso: add no pisa la
+        # ranura ocupada por otro
+        for ranura in range(RANURAS):
+            if cache.add(_clave_ranura(ranura), copia, timeout=vigencia):
+                self.ranura = ranura
+                return
+        self.ranura = None
+        logger.warning('Sin ranura libre para publicar las métricas del proceso %s', self.id)
+
+    def retirar(self):
+        if self.ranura is not None:
+            guardada = cache.get(_clave_ranura(self.ranura))
+            if guardada is not None and guardada['proceso'] == self.id:
+                cache.delete(_clave_ranura(self.ranura))
+
+    def reiniciar(self):
+        with self.candado:
+            self.valores = {}
+
+
+def _clave_ranura(ranura):
+    return f'metricas:proceso:{ranura}'
+
+
+_registro = _Registro()
+
+
+@atexit.register
+def _al_salir():
+    # Un worker que termina bien deja de sumarse sin esperar a que venza su copia
+    _registro.retirar()
+
+
+class Medicion:
+    """Consultas, tiempo de SQL y de plantillas de una petición (``execute_wrapper``)."""
+
+    def __init__(self, request):
+        self.request = request
+        self.consultas = 0
+        self.sql_segundos = 0.0
+        self.render_segundos = 0.0
+        self.lentas = 0
+        self.distintas = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duracion = time.perf_counter() - inicio
+            self.consultas += 1
+            self.sql_segundos += duracion
+            # Por el SQL sin parámetros: el mismo SELECT por cada fila (N+1) cuenta
+            # como repetido, y no se arma el repr de los miles de parámetros de un bulk_create
+            self.distintas[sql] = self.distintas.get(sql, 0) + 1
+            if duracion >= settings.METRICAS_CONSULTA_LENTA:
+                self.lentas += 1
+                logger.warning('Consulta lenta (%.0f ms) en %s: %s', duracion * 1000, nombre_vista(self.request), sql)
+
+    @property
+    def repetidas(self):
+        return self.consultas - len(self.distintas)
+
+    def mas_repetida(self):
+        """(veces, sql) de la consulta más repetida."""
+        sql = max(self.distintas, key=self.distintas.get)
+        return self.distintas[sql], sql
+
+
+def nombre_vista(request):
+    match = getattr(request, 'resolver_match', None)
+    return (match.url_name or match.view_name) if match else 'sin_ruta'
+
+
+def _registrar(request, respuesta, duracion, medicion):
+    vista = nombre_vista(request)
+    etiquetas = (('vista', vista),)
+    estado = respuesta.status_code if respuesta is not None else 500
+    repetidas = medicion.repetidas
+    with _registro.candado:
+        _registro.sumar('peticiones_total', etiquetas + (('metodo', request.method), ('estado', str(estado))))
+        _registro.observar('peticion_segundos', etiquetas, duracion)
+        _registro.observar('consultas_sql', etiquetas, medicion.consultas)
+        _registro.observar('sql_segundos', etiquetas, medicion.sql_segundos)
+        _registro.observar('render_segundos', etiquetas, medicion.render_segundos)
+        if repetidas:
+            _registro.sumar('consultas_repetidas_total', etiquetas, repetidas)
+        if medicion.lentas:
+            _registro.sumar('consultas_lentas_total', etiquetas, medicion.lentas)
+    if repetidas >= settings.METRICAS_REPETIDAS_AVISO:
+        veces, sql = medicion.mas_repetida()
+        logger.warning(
+            '%s repitió %d consultas; la más repetida (%d veces): %s', vista, repetidas, veces, sql
+        )
+    if time.monotonic() - _registro.enviado >= settings.METRICAS_INTERVALO:
+        _registro.enviar()
+
+
+def _guardar_perfil(perfil, request, duracion):
+    carpeta = settings.METRICAS_PERFIL_CARPETA
+    os.makedirs(carpeta, exist_ok=True)
+    if len(os.listdir(carpeta)) >= settings.METRICAS_PERFIL_MAXIMO:
+        return
+    vista = nombre_vista(request)
+    nombre = f"{vista}-{timezone.now():%Y%m%d-%H%M%S}-{duracion * 1000:.0f}ms-{uuid.uuid4().hex[:6]}.prof"
+    perfil.dump_stats(os.path.join(carpeta, nombre))
+    with _registro.candado:
+        _registro.sumar('perfiles_guardados_total', (('vista', vista),))
+
+
+class MetricasMiddleware:
+    """
+    Mide cada petición: duración, consultas SQL y su tiempo, tiempo de
+    plantillas (con el backend ``PlantillasDjango``) y consultas repetidas.
+
+    Registra en el log las consultas más lentas que ``METRICAS_CONSULTA_LENTA``
+    y las peticiones con ``METRICAS_REPETIDAS_AVISO`` o más consultas
+    repetidas. Con ``METRICAS_PERFIL_MUESTREO`` > 0 ejecuta esa fracción de
+    las peticiones con cProfile y guarda el perfil de las que tardan más que
+    ``METRICAS_PERFIL_LENTA`` en ``METRICAS_PERFIL_CARPETA`` (se abre con
+    ``python -m pstats`` o snakeviz).
+
+    Funciona también en modo async (ASGI), sin cProfile: solo perfila el
+    hilo donde se activa y las vistas async reparten su trabajo entre el event
+    loop y el hilo de la petición.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICAS_ACTIVAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.asincrono = iscoroutinefunction(get_response)
+        if self.asincrono:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.asincrono:
+            return self._acall(request)
+        medicion = Medicion(request)
+        token = _medicion.set(medicion)
+        perfil = None
+        muestreo = settings.METRICAS_PERFIL_MUESTREO
+        # cProfile admite un solo perfil activo por proceso
+        if muestreo and random.random() < muestreo and _candado_perfil.acquire(blocking=False):
+            perfil = cProfile.Profile()
+        respuesta = None
+        inicio = time.perf_counter()
+        try:
+            with connection.execute_wrapper(medicion):
+                if perfil is not None:
+                    perfil.enable()
+                respuesta = self.get_response(request)
+        finally:
+            duracion = time.perf_counter() - inicio
+            if perfil is not None:
+                perfil.disable()
+                _candado_perfil.release()
+            _medicion.reset(token)
+            _registrar(request, respuesta, duracion, medicion)
+        if perfil is not None and duracion >= settings.METRICAS_PERFIL_LENTA:
+            _guardar_perfil(perfil, request, duracion)
+        return respuesta
+
+    async def _acall(self, request):
+        medicion = Medicion(request)
+        token = _medicion.set(medicion)
+        respuesta = None
+        inicio = time.perf_counter()
+        try:
+            async with envolver_consultas(medicion):
+                respuesta = await self.get_response(request)
+        finally:
+            duracion = time.perf_counter() - inicio
+            _medicion.reset(token)
+            # Puede escribir en el log y en la caché compartida
+            await sync_to_async(_registrar)(request, respuesta, duracion, medicion)
+        return respuesta
+
+
+class _PlantillaMedida:
+    def __init__(self, plantilla):
+        self.plantilla = plantilla
+
+    @property
+    def origin(self):
+        return self.plantilla.origin
+
+    def render(self, context=None, request=None):
+        medicion = _medicion.get()
+        if medicion is None:
+            return self.plantilla.render(context, request)
+        inicio = time.perf_counter()
+        try:
+            return self.plantilla.render(context, request)
+        finally:
+            medicion.render_segundos += time.perf_counter() - inicio
+
+
+class PlantillasDjango(DjangoTemplates):
+    """Backend de plantillas de Django que suma el tiempo de renderizado a la petición en curso."""
+
+    def from_string(self, template_code):
+        return _PlantillaMedida(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return _PlantillaMedida(super().get_template(template_name))
+
+
+def _copias():
+    # La del proceso actual, al día
+    _registro.enviar()
+    return cache.get_many([_clave_ranura(r) for r in range(RANURAS)]).values()
+
+
+def fotos():
+    """Valores de todos los procesos sumados por métrica y etiquetas."""
+    total = {}
+    for copia in _copias():
+        for clave, valor in copia['valores'].items():
+            if isinstance(valor, list):
+                acumulado = total.setdefault(clave, [0] * len(valor))
+                for i, v in enumerate(valor):
+                    acumulado[i] += v
+            else:
+                total[clave] = total.get(clave, 0) + valor
+    return total
+
+
+def reiniciar():
+    """Pone en cero las métricas de todos los procesos."""
+    _registro.reiniciar()
+    cache.delete_many([_clave_ranura(r) for r in range(RANURAS)])
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _etiquetas(etiquetas):
+    if not etiquetas:
+        return ''
+    return '{' + ','.join(f'{nombre}="{_escapar(valor)}"' for nombre, valor in etiquetas) + '}'
+
+
+def _numero(valor):
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+def por_proceso():
+    """Valores de cada proceso publicado, con la etiqueta ``proceso``."""
+    valores = {}
+    for copia in _copias():
+        proceso = (('proceso', copia['proceso']),)
+        for (nombre, etiquetas), valor in copia['valores'].items():
+            valores[(nombre, etiquetas + proceso)] = valor
+    return valores
+
+
+def texto_prometheus():
+    """
+    Métricas de todos los procesos en el formato de texto de Prometheus.
+
+    Una serie por proceso (etiqueta ``proceso``), no la suma: cuando un worker
+    termina o su copia vence desaparecen sus series, y un total bajaría como
+    si el contador se hubiera reiniciado. ``sum(rate(...))`` las combina.
+    """
+    valores = por_proceso()
+    lineas = []
+    for nombre, (tipo, ayuda, cubetas) in METRICAS.items():
+        series = sorted((etiquetas, valor) for (n, etiquetas), valor in valores.items() if n == nombre)
+        nombre = f'inventario_{nombre}'
+        lineas.append(f'# HELP {nombre} {ayuda}')
+        lineas.append(f'# TYPE {nombre} {tipo}')
+        for etiquetas, valor in series:
+            if tipo != 'histogram':
+                lineas.append(f'{nombre}{_etiquetas(etiquetas)} {_numero(valor)}')
+                continue
+            acumulado = 0
+            for limite, cuenta in zip(cubetas + ('+Inf',), valor[:-1]):
+                acumulado += cuenta
+                lineas.append(f'{nombre}_bucket{_etiquetas(etiquetas + (("le", limite),))} {acumulado}')
+            lineas.append(f'{nombre}_sum{_etiquetas(etiquetas)} {_numero(valor[-1])}')
+            lineas.append(f'{nombre}_count{_etiquetas(etiquetas)} {acumulado}')
+    return '\n'.join(lineas) + '\n'
+
+
+def cuantil(histograma, cubetas, q):
+    """Límite superior de la cubeta donde cae el cuantil ``q`` (None si pasa de la última)."""
+    total = sum(histograma[:-1])
+    if not total:
+        return None
+    objetivo = q * total
+    acumulado = 0
+    for limite, cuenta in zip(cubetas, histograma):
+        acumulado += cuenta
+        if acumulado >= objetivo:
+            return limite
+    return None
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.24 on 2026-10-18 12:32
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('mi_proyecto', '0008_userprofile'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportacionExcel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('archivo', models.FileField(upload_to='importaciones/')),
+                ('nombre_archivo', models.CharField(blank=True, max_length=255)),
+                ('estado', models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('PROCESANDO', 'Procesando'), ('COMPLETADA', 'Completada'), ('ERROR', 'Error')], default='PENDIENTE', max_length=20)),
+                ('filas_totales', models.IntegerField(blank=True, null=True)),
+                ('filas_procesadas', models.IntegerField(default=0)),
+                ('importados', models.IntegerField(default=0)),
+                ('actualizados', models.IntegerField(default=0)),
+                ('total_errores', models.IntegerField(default=0)),
+                ('errores', models.TextField(blank=True)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('fecha_inicio', models.DateTimeField(blank=True, null=True)),
+                ('fecha_fin', models.DateTimeField(blank=True, null=True)),
+                ('usuario', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-fecha_creacion'],
+            },
+        ),
+    ]
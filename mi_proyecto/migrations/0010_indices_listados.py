@@ -0,0 +1,37 @@
+# Generated by Django 4.2.24 on 2026-10-18 12:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mi_proyecto', '0009_importacionexcel'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='historialmovimiento',
+            index=models.Index(fields=['-fecha_movimiento', '-id'], name='historial_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productos',
+            index=models.Index(condition=models.Q(('activo', True)), fields=['nombre'], name='producto_activos_nombre_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productos',
+            index=models.Index(condition=models.Q(('activo', True)), fields=['categoria', 'nombre'], name='producto_activos_cat_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productos',
+            index=models.Index(condition=models.Q(('activo', False)), fields=['nombre'], name='producto_inactivos_nombre_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productos',
+            index=models.Index(condition=models.Q(('activo', True), ('stock__lte', 3)), fields=['stock'], name='producto_stock_bajo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='salidaproducto',
+            index=models.Index(fields=['-fecha_salida', '-id'], name='salida_fecha_idx'),
+        ),
+    ]
@@ -0,0 +1,101 @@
+from django.db import migrations
+
+
+TABLA_FTS = 'mi_proyecto_productos_fts'
+
+VECTOR_PRODUCTO = (
+    "to_tsvector('simple', coalesce(\"nombre\", '') || ' ' || "
+    "coalesce(\"codigo\", '') || ' ' || coalesce(\"descripcion\", ''))"
+)
+
+SQL_FTS5 = [
+    f"""CREATE VIRTUAL TABLE {TABLA_FTS} USING fts5(
+        nombre, codigo, descripcion, proveedor,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )""",
+    f"""INSERT INTO {TABLA_FTS} (rowid, nombre, codigo, descripcion, proveedor)
+        SELECT p.id, p.nombre, p.codigo, p.descripcion, coalesce(pr.nombre, '')
+        FROM mi_proyecto_productos p LEFT JOIN mi_proyecto_proveedor pr ON pr.id = p.proveedor_id""",
+    # Los triggers mantienen el índice también con bulk_create/bulk_update/update()
+    f"""CREATE TRIGGER {TABLA_FTS}_ai AFTER INSERT ON mi_proyecto_productos BEGIN
+        INSERT INTO {TABLA_FTS} (rowid, nombre, codigo, descripcion, proveedor)
+        VALUES (new.id, new.nombre, new.codigo, new.descripcion,
+                coalesce((SELECT nombre FROM mi_proyecto_proveedor WHERE id = new.proveedor_id), ''));
+    END""",
+    f"""CREATE TRIGGER {TABLA_FTS}_au AFTER UPDATE OF nombre, codigo, descripcion, proveedor_id
+        ON mi_proyecto_productos BEGIN
+        DELETE FROM {TABLA_FTS} WHERE rowid = old.id;
+        INSERT INTO {TABLA_FTS} (rowid, nombre, codigo, descripcion, proveedor)
+        VALUES (new.id, new.nombre, new.codigo, new.descripcion,
+                coalesce((SELECT nombre FROM mi_proyecto_proveedor WHERE id = new.proveedor_id), ''));
+    END""",
+    f"""CREATE TRIGGER {TABLA_FTS}_ad AFTER DELETE ON mi_proyecto_productos BEGIN
+        DELETE FROM {TABLA_FTS} WHERE rowid = old.id;
+    END""",
+    f"""CREATE TRIGGER {TABLA_FTS}_proveedor_au AFTER UPDATE OF nombre ON mi_proyecto_proveedor BEGIN
+        UPDATE {TABLA_FTS} SET proveedor = new.nombre
+        WHERE rowid IN (SELECT id FROM mi_proyecto_productos WHERE proveedor_id = new.id);
+    END""",
+]
+
+SQL_FTS5_REVERSA = [
+    f"DROP TRIGGER IF EXISTS {TABLA_FTS}_proveedor_au",
+    f"DROP TRIGGER IF EXISTS {TABLA_FTS}_ad",
+    f"DROP TRIGGER IF EXISTS {TABLA_FTS}_au",
+    f"DROP TRIGGER IF EXISTS {TABLA_FTS}_ai",
+    f"DROP TABLE IF EXISTS {TABLA_FTS}",
+]
+
+SQL_POSTGRES = [
+    f"CREATE INDEX IF NOT EXISTS producto_busqueda_idx ON mi_proyecto_productos USING gin ({VECTOR_PRODUCTO})",
+    "CREATE INDEX IF NOT EXISTS proveedor_busqueda_idx ON mi_proyecto_proveedor "
+    "USING gin (to_tsvector('simple', coalesce(\"nombre\", '')))",
+]
+
+SQL_POSTGRES_REVERSA = [
+    "DROP INDEX IF EXISTS producto_busqueda_idx",
+    "DROP INDEX IF EXISTS proveedor_busqueda_idx",
+]
+
+
+def _sqlite_tiene_fts5(cursor):
+    cursor.execute("PRAGMA compile_options")
+    return any('FTS5' in fila[0] for fila in cursor.fetchall())
+
+
+def crear_indices_busqueda(apps, schema_editor):
+    conexion = schema_editor.connection
+    with conexion.cursor() as cursor:
+        if conexion.vendor == 'postgresql':
+            sentencias = SQL_POSTGRES
+        elif conexion.vendor == 'sqlite' and _sqlite_tiene_fts5(cursor):
+            sentencias = SQL_FTS5
+        else:
+            # Sin soporte: la búsqueda usa icontains
+            return
+        for sql in sentencias:
+            cursor.execute(sql)
+
+
+def eliminar_indices_busqueda(apps, schema_editor):
+    conexion = schema_editor.connection
+    if conexion.vendor == 'postgresql':
+        sentencias = SQL_POSTGRES_REVERSA
+    elif conexion.vendor == 'sqlite':
+        sentencias = SQL_FTS5_REVERSA
+    else:
+        return
+    with conexion.cursor() as cursor:
+        for sql in sentencias:
+            cursor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mi_proyecto', '0010_indices_listados'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indices_busqueda, eliminar_indices_busqueda),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.24 on 2026-10-18 12:37
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('mi_proyecto', '0011_busqueda_productos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentoSalida',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('motivo', models.CharField(choices=[('VENTA', 'Venta'), ('GARANTIA', 'Garantía'), ('DEVOLUCION', 'Devolución al proveedor'), ('DONACION', 'Donación'), ('OTRO', 'Otro')], max_length=20)),
+                ('descripcion', models.TextField(blank=True, help_text='Detalles adicionales sobre la salida')),
+                ('fecha', models.DateTimeField(auto_now_add=True)),
+                ('usuario', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='salidaproducto',
+            name='documento',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='lineas', to='mi_proyecto.documentosalida'),
+        ),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 4.2.24 on 2026-10-18 12:45
+
+from decimal import Decimal
+from importlib import import_module
+
+from django.db import migrations, models
+from django.db.models import F
+from django.db.models.functions import Round
+import django.db.models.deletion
+
+
+busqueda = import_module('mi_proyecto.migrations.0011_busqueda_productos')
+
+
+def _fts_activo(schema_editor):
+    conexion = schema_editor.connection
+    return conexion.vendor == 'sqlite' and busqueda.TABLA_FTS in conexion.introspection.table_names()
+
+
+def quitar_triggers_busqueda(apps, schema_editor):
+    # SQLite reconstruye la tabla de productos al agregar la columna: los triggers
+    # de FTS5 impedirían renombrarla y, de todos modos, se perderían con ella
+    if _fts_activo(schema_editor):
+        with schema_editor.connection.cursor() as cursor:
+            for sql in busqueda.SQL_FTS5_REVERSA[:-1]:
+                cursor.execute(sql)
+
+
+def restaurar_triggers_busqueda(apps, schema_editor):
+    # Los rowid de la tabla FTS siguen siendo los id de los productos
+    if _fts_activo(schema_editor):
+        with schema_editor.connection.cursor() as cursor:
+            for sql in busqueda.SQL_FTS5[2:]:
+                cursor.execute(sql)
+
+
+def costos_iniciales(apps, schema_editor):
+    # Hasta ahora el precio guardado era el costo con un 30% de aumento
+    Productos = apps.get_model('mi_proyecto', 'Productos')
+    ReglaPrecio = apps.get_model('mi_proyecto', 'ReglaPrecio')
+    Productos.objects.update(costo=Round(F('precio') / Decimal('1.3'), 2))
+    ReglaPrecio.objects.create(categoria='', proveedor=None, margen=Decimal('30'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mi_proyecto', '0012_documentosalida'),
+    ]
+
+    operations = [
+        migrations.RunPython(quitar_triggers_busqueda, restaurar_triggers_busqueda),
+        migrations.AddField(
+            model_name='productos',
+            name='costo',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.CreateModel(
+            name='ReglaPrecio',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('categoria', models.CharField(blank=True, choices=[('COMPUTADORAS', 'Computadoras'), ('LAPTOPS', 'Laptops'), ('UPS', 'UPS'), ('PERIFERICOS', 'Periféricos')], max_length=20)),
+                ('margen', models.DecimalField(decimal_places=2, help_text='Porcentaje sobre el costo', max_digits=6)),
+                ('fecha_actualizacion', models.DateTimeField(auto_now=True)),
+                ('proveedor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='mi_proyecto.proveedor')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='reglaprecio',
+            constraint=models.UniqueConstraint(fields=('categoria', 'proveedor'), name='regla_precio_unica'),
+        ),
+        migrations.AddConstraint(
+            model_name='reglaprecio',
+            constraint=models.UniqueConstraint(condition=models.Q(('proveedor__isnull', True)), fields=('categoria',), name='regla_precio_sin_proveedor_unica'),
+        ),
+        migrations.RunPython(restaurar_triggers_busqueda, quitar_triggers_busqueda),
+        migrations.RunPython(costos_iniciales, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.24 on 2026-10-18 12:50
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mi_proyecto', '0013_precios'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='historialmovimiento',
+            name='evento',
+            field=models.UUIDField(blank=True, editable=False, null=True, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='historialmovimiento',
+            name='fecha_movimiento',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
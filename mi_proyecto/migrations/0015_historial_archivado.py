@@ -0,0 +1,76 @@
+# Generated by Django 4.2.24 on 2026-10-18 12:53
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# En PostgreSQL el archivo es una tabla particionada por rango de fecha: la
+# clave primaria debe incluir la columna de partición. archivo.py crea una
+# partición por mes antes de mover sus movimientos.
+SQL_PARTICIONADA = [
+    """
+    CREATE TABLE "mi_proyecto_historialarchivado" (
+        "id" bigint NOT NULL,
+        "producto_id" bigint NULL,
+        "nombre_producto" varchar(100) NOT NULL,
+        "serial_producto" varchar(50) NOT NULL,
+        "usuario_id" integer NULL,
+        "tipo_movimiento" varchar(20) NOT NULL,
+        "fecha_movimiento" timestamp with time zone NOT NULL,
+        "detalles" text NOT NULL,
+        "evento" uuid NULL,
+        PRIMARY KEY ("id", "fecha_movimiento")
+    ) PARTITION BY RANGE ("fecha_movimiento")
+    """,
+    'CREATE INDEX "archivado_fecha_idx" ON "mi_proyecto_historialarchivado" ("fecha_movimiento" DESC, "id" DESC)',
+    'CREATE INDEX "archivado_producto_idx" ON "mi_proyecto_historialarchivado" ("producto_id")',
+    'CREATE INDEX "archivado_usuario_idx" ON "mi_proyecto_historialarchivado" ("usuario_id")',
+]
+
+
+def crear_tabla(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for sql in SQL_PARTICIONADA:
+            schema_editor.execute(sql)
+    else:
+        schema_editor.create_model(apps.get_model('mi_proyecto', 'HistorialArchivado'))
+
+
+def eliminar_tabla(apps, schema_editor):
+    # En PostgreSQL elimina también las particiones
+    schema_editor.delete_model(apps.get_model('mi_proyecto', 'HistorialArchivado'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('mi_proyecto', '0014_historial_evento'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='HistorialArchivado',
+                    fields=[
+                        ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                        ('nombre_producto', models.CharField(blank=True, max_length=100)),
+                        ('serial_producto', models.CharField(blank=True, max_length=50)),
+                        ('tipo_movimiento', models.CharField(choices=[('CREACION', 'Creación'), ('EDICION', 'Edición'), ('ELIMINACION', 'Eliminación'), ('SALIDA', 'Salida'), ('DESHABILITACION', 'Deshabilitación')], max_length=20)),
+                        ('fecha_movimiento', models.DateTimeField()),
+                        ('detalles', models.TextField(blank=True)),
+                        ('evento', models.UUIDField(blank=True, editable=False, null=True)),
+                        ('producto', models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='mi_proyecto.productos')),
+                        ('usuario', models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+                    ],
+                    options={
+                        'ordering': ['-fecha_movimiento'],
+                        'indexes': [models.Index(fields=['-fecha_movimiento', '-id'], name='archivado_fecha_idx')],
+                    },
+                ),
+            ],
+        ),
+        migrations.RunPython(crear_tabla, eliminar_tabla),
+    ]
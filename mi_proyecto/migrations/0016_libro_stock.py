@@ -0,0 +1,61 @@
+# Generated by Django 4.2.24 on 2026-10-18 12:57
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def saldos_de_apertura(apps, schema_editor):
+    # El libro arranca con el stock actual de cada producto como stock inicial
+    Productos = apps.get_model('mi_proyecto', 'Productos')
+    MovimientoStock = apps.get_model('mi_proyecto', 'MovimientoStock')
+    ahora = django.utils.timezone.now()
+    lote = []
+    for producto_id, stock in Productos.objects.exclude(stock=0).values_list('id', 'stock').iterator(chunk_size=2000):
+        lote.append(MovimientoStock(producto_id=producto_id, cantidad=stock, motivo='INICIAL', origen='apertura', fecha=ahora))
+        if len(lote) >= 2000:
+            MovimientoStock.objects.bulk_create(lote)
+            lote = []
+    MovimientoStock.objects.bulk_create(lote)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('mi_proyecto', '0015_historial_archivado'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SaldoStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateTimeField()),
+                ('stock', models.IntegerField()),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='saldos_stock', to='mi_proyecto.productos')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='MovimientoStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cantidad', models.IntegerField()),
+                ('motivo', models.CharField(choices=[('INICIAL', 'Stock inicial'), ('IMPORTACION', 'Importación Excel'), ('SALIDA', 'Salida'), ('AJUSTE', 'Ajuste manual')], max_length=20)),
+                ('origen', models.CharField(blank=True, max_length=50)),
+                ('fecha', models.DateTimeField(default=django.utils.timezone.now)),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='movimientos_stock', to='mi_proyecto.productos')),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='saldostock',
+            constraint=models.UniqueConstraint(fields=('producto', 'fecha'), name='saldo_stock_unico'),
+        ),
+        migrations.AddIndex(
+            model_name='movimientostock',
+            index=models.Index(fields=['producto', 'fecha'], name='movimiento_stock_fecha_idx'),
+        ),
+        migrations.RunPython(saldos_de_apertura, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 4.2.24 on 2026-10-18 13:11
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mi_proyecto', '0016_libro_stock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenProductoMes',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mes', models.DateField()),
+                ('unidades', models.IntegerField()),
+                ('salidas', models.IntegerField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ResumenProveedorMes',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mes', models.DateField()),
+                ('unidades', models.IntegerField()),
+                ('salidas', models.IntegerField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ResumenSalidasDia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('mes', models.DateField()),
+                ('categoria', models.CharField(choices=[('COMPUTADORAS', 'Computadoras'), ('LAPTOPS', 'Laptops'), ('UPS', 'UPS'), ('PERIFERICOS', 'Periféricos')], max_length=20)),
+                ('motivo', models.CharField(choices=[('VENTA', 'Venta'), ('GARANTIA', 'Garantía'), ('DEVOLUCION', 'Devolución al proveedor'), ('DONACION', 'Donación'), ('OTRO', 'Otro')], max_length=20)),
+                ('unidades', models.IntegerField()),
+                ('salidas', models.IntegerField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ResumenStockDia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('categoria', models.CharField(choices=[('COMPUTADORAS', 'Computadoras'), ('LAPTOPS', 'Laptops'), ('UPS', 'UPS'), ('PERIFERICOS', 'Periféricos')], max_length=20)),
+                ('productos', models.IntegerField()),
+                ('unidades', models.IntegerField()),
+                ('valor', models.DecimalField(decimal_places=2, max_digits=16)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='resumenstockdia',
+            constraint=models.UniqueConstraint(fields=('fecha', 'categoria'), name='resumen_stock_unico'),
+        ),
+        migrations.AddIndex(
+            model_name='resumensalidasdia',
+            index=models.Index(fields=['fecha'], name='resumen_salidas_fecha_idx'),
+        ),
+        migrations.AddField(
+            model_name='resumenproveedormes',
+            name='proveedor',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='mi_proyecto.proveedor'),
+        ),
+        migrations.AddField(
+            model_name='resumenproductomes',
+            name='producto',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='mi_proyecto.productos'),
+        ),
+        migrations.AddIndex(
+            model_name='resumenproveedormes',
+            index=models.Index(fields=['mes'], name='resumen_proveedor_mes_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='resumenproductomes',
+            index=models.Index(fields=['mes', 'producto', 'unidades'], name='resumen_producto_mes_idx'),
+        ),
+    ]
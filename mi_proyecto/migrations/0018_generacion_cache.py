@@ -0,0 +1,20 @@
+# Generated by Django 4.2.24 on 2026-10-18 14:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mi_proyecto', '0017_resumenes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeneracionCache',
+            fields=[
+                ('modelo', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('generacion', models.BigIntegerField(default=0)),
+            ],
+        ),
+    ]
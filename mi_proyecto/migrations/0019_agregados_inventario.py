@@ -0,0 +1,20 @@
+# Generated by Django 4.2.24 on 2026-10-18 14:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mi_proyecto', '0018_generacion_cache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AgregadoInventario',
+            fields=[
+                ('clave', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('valor', models.BigIntegerField(default=0)),
+            ],
+        ),
+    ]
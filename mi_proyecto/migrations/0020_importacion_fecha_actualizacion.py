@@ -0,0 +1,26 @@
+# Generated by Django 4.2.24 on 2026-10-18 14:43
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def avance_inicial(apps, schema_editor):
+    # Las importaciones en curso toman como último avance su inicio
+    ImportacionExcel = apps.get_model('mi_proyecto', 'ImportacionExcel')
+    ImportacionExcel.objects.filter(estado='PROCESANDO').update(fecha_actualizacion=F('fecha_inicio'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mi_proyecto', '0019_agregados_inventario'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importacionexcel',
+            name='fecha_actualizacion',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(avance_inicial, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.24 on 2026-10-18 14:46
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def ultimo_movimiento_inicial(apps, schema_editor):
+    # Los saldos ya tomados se consideran completos hasta el último movimiento actual
+    MovimientoStock = apps.get_model('mi_proyecto', 'MovimientoStock')
+    SaldoStock = apps.get_model('mi_proyecto', 'SaldoStock')
+    ultimo = MovimientoStock.objects.aggregate(ultimo=Max('id'))['ultimo'] or 0
+    SaldoStock.objects.update(ultimo_movimiento=ultimo)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mi_proyecto', '0020_importacion_fecha_actualizacion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='saldostock',
+            name='ultimo_movimiento',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.RunPython(ultimo_movimiento_inicial, migrations.RunPython.noop),
+    ]
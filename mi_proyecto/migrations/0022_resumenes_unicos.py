@@ -0,0 +1,44 @@
+# Generated by Django 4.2.24 on 2026-10-18 14:48
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+CLAVES = {
+    'ResumenSalidasDia': ['fecha', 'categoria', 'motivo'],
+    'ResumenProductoMes': ['mes', 'producto'],
+    'ResumenProveedorMes': ['mes', 'proveedor'],
+}
+
+
+def quitar_duplicados(apps, schema_editor):
+    # Actualizaciones en paralelo pudieron repetir filas: queda la última de cada clave
+    for nombre, clave in CLAVES.items():
+        modelo = apps.get_model('mi_proyecto', nombre)
+        ultimas = modelo.objects.filter(**{f'{clave[-1]}__isnull': False}).values(*clave).annotate(ultima=Max('id'))
+        modelo.objects.filter(**{f'{clave[-1]}__isnull': False}).exclude(
+            id__in=ultimas.values('ultima')
+        ).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mi_proyecto', '0021_saldo_ultimo_movimiento'),
+    ]
+
+    operations = [
+        migrations.RunPython(quitar_duplicados, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='resumenproductomes',
+            constraint=models.UniqueConstraint(fields=('mes', 'producto'), name='resumen_producto_mes_unico'),
+        ),
+        migrations.AddConstraint(
+            model_name='resumenproveedormes',
+            constraint=models.UniqueConstraint(fields=('mes', 'proveedor'), name='resumen_proveedor_mes_unico'),
+        ),
+        migrations.AddConstraint(
+            model_name='resumensalidasdia',
+            constraint=models.UniqueConstraint(fields=('fecha', 'categoria', 'motivo'), name='resumen_salidas_unico'),
+        ),
+    ]
@@ -1,6 +1,10 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
+from django.utils import timezone
 from django.contrib.auth.models import User
 
+from .senales import productos_actualizados
+
 # Create your models here.
 
 
@@ -16,6 +20,8 @@ class Productos(models.Model):
     nombre = models.CharField(max_length=100)
     codigo = models.CharField(max_length=50, unique=True)
     descripcion = models.TextField(max_length=500)
+    costo = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    # Precio de venta: lo calcula precios.py a partir del costo y las reglas de margen
     precio = models.DecimalField(max_digits=10, decimal_places=2)
     stock = models.IntegerField(default=0)
     categoria = models.CharField(max_length=20, choices=CATEGORIAS)
@@ -27,6 +33,40 @@ class Productos(models.Model):
     def __str__(self):
         return self.nombre
 
+    # Campos que afectan a los agregados del inventario (ver agregados.py)
+    CAMPOS_AGREGADOS = ('stock', 'activo', 'categoria', 'precio')
+
+    def estado_agregados(self):
+        """Valores que afectan a los agregados, o False si no están todos cargados."""
+        if any(campo not in self.__dict__ for campo in self.CAMPOS_AGREGADOS):
+            return False
+        return (self.stock, self.activo, self.categoria, self.precio)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        # Estado original para actualizar los agregados de forma incremental
+        instancia._estado_agregados = instancia.estado_agregados()
+        return instancia
+
+    class Meta:
+        indexes = [
+            # Listados de activos (con o sin categoría) e inactivos ordenados por nombre
+            models.Index(fields=['nombre'], condition=models.Q(activo=True), name='producto_activos_nombre_idx'),
+            models.Index(
+                fields=['categoria', 'nombre'],
+                condition=models.Q(activo=True),
+                name='producto_activos_cat_idx',
+            ),
+            models.Index(fields=['nombre'], condition=models.Q(activo=False), name='producto_inactivos_nombre_idx'),
+            # Aviso de stock bajo: solo indexa los pocos productos activos con stock <= 3
+            models.Index(
+                fields=['stock'],
+                condition=models.Q(activo=True, stock__lte=3),
+                name='producto_stock_bajo_idx',
+            ),
+        ]
+
 class SalidaProducto(models.Model):
     MOTIVOS = [
         ('VENTA', 'Venta'),
@@ -42,29 +82,67 @@ class SalidaProducto(models.Model):
     descripcion = models.TextField(blank=True, help_text="Detalles adicionales sobre la salida")
     fecha_salida = models.DateTimeField(auto_now_add=True)
     usuario = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
+    documento = models.ForeignKey(
+        'DocumentoSalida', on_delete=models.PROTECT, null=True, blank=True, related_name='lineas'
+    )
 
     def __str__(self):
         return f"Salida de {self.cantidad} {self.producto.nombre} - {self.get_motivo_display()}"
     
     def save(self, *args, **kwargs):
-        # Verificar stock disponible antes de guardar
-        if self.cantidad > self.producto.stock:
-            raise ValueError(f"No hay suficiente stock. Stock disponible: {self.producto.stock}")
-        
-        # Actualizar el stock del producto
-        self.producto.stock -= self.cantidad
-        self.producto.save()
-        super().save(*args, **kwargs)
-        
-        # Registrar el movimiento en el historial
-        HistorialMovimiento.objects.create(
-            producto=self.producto,
-            nombre_producto=self.producto.nombre,
-            serial_producto=self.producto.codigo,  
-            usuario=self.usuario,
-            tipo_movimiento='EDICION',
-            detalles=f"Salida de {self.cantidad} unidades. Motivo: {self.get_motivo_display()}. {self.descripcion}"
-        )
+        # El stock solo se descuenta al registrar la salida, no al volver a guardarla
+        if not self._state.adding:
+            return super().save(*args, **kwargs)
+
+        with transaction.atomic():
+            # Descuento atómico: el UPDATE solo afecta la fila si hay stock suficiente,
+            # así dos salidas concurrentes no pueden dejar el stock en negativo
+            actualizado = Productos.objects.filter(
+                pk=self.producto_id, stock__gte=self.cantidad
+            ).update(stock=F('stock') - self.cantidad)
+            if not actualizado:
+                stock = Productos.objects.filter(pk=self.producto_id).values_list('stock', flat=True).first()
+                raise ValueError(f"No hay suficiente stock. Stock disponible: {stock}")
+
+            self.producto.refresh_from_db(fields=Productos.CAMPOS_AGREGADOS)
+            despues = self.producto.estado_agregados()
+            antes = (despues[0] + self.cantidad,) + despues[1:]
+            productos_actualizados.send(sender=Productos, cambios=[(antes, despues)])
+            super().save(*args, **kwargs)
+            MovimientoStock.objects.create(
+                producto_id=self.producto_id,
+                cantidad=-self.cantidad,
+                motivo='SALIDA',
+                origen=f'salida:{self.pk}',
+                usuario=self.usuario,
+            )
+
+            # Registrar el movimiento en el historial
+            from .auditoria import registrar
+            registrar(HistorialMovimiento(
+                producto=self.producto,
+                nombre_producto=self.producto.nombre,
+                serial_producto=self.producto.codigo,
+                usuario=self.usuario,
+                tipo_movimiento='EDICION',
+                detalles=f"Salida de {self.cantidad} unidades. Motivo: {self.get_motivo_display()}. {self.descripcion}"
+            ))
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-fecha_salida', '-id'], name='salida_fecha_idx'),
+        ]
+
+
+class DocumentoSalida(models.Model):
+    """Salida de varios productos a la vez; cada línea es un SalidaProducto."""
+    motivo = models.CharField(max_length=20, choices=SalidaProducto.MOTIVOS)
+    descripcion = models.TextField(blank=True, help_text="Detalles adicionales sobre la salida")
+    fecha = models.DateTimeField(auto_now_add=True)
+    usuario = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
+
+    def __str__(self):
+        return f"Documento de salida {self.id} - {self.get_motivo_display()}"
 
 
 class Proveedor(models.Model):
@@ -93,8 +171,12 @@ class HistorialMovimiento(models.Model):
     serial_producto = models.CharField(max_length=50, blank=True)
     usuario = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
     tipo_movimiento = models.CharField(max_length=20, choices=TIPO_MOVIMIENTO)
-    fecha_movimiento = models.DateTimeField(auto_now_add=True)
+    # Con default (no auto_now_add) para conservar la hora del evento cuando
+    # auditoria.py lo escribe diferido
+    fecha_movimiento = models.DateTimeField(default=timezone.now)
     detalles = models.TextField(blank=True)
+    # Identificador del evento: al reintentar desde el diario no se duplica
+    evento = models.UUIDField(null=True, blank=True, unique=True, editable=False)
 
     def __str__(self):
         nombre = self.nombre_producto or (self.producto.nombre if self.producto else 'Producto Eliminado')
@@ -102,6 +184,90 @@ class HistorialMovimiento(models.Model):
 
     class Meta:
         ordering = ['-fecha_movimiento']
+        indexes = [
+            models.Index(fields=['-fecha_movimiento', '-id'], name='historial_fecha_idx'),
+        ]
+
+
+class HistorialArchivado(models.Model):
+    """
+    Movimientos de meses anteriores, movidos por ``archivar_historial``.
+
+    Conserva el id original. En PostgreSQL la tabla está particionada por mes
+    (ver archivo.py); las referencias no tienen restricción en la base para que
+    eliminar un producto o usuario no recorra el archivo.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    producto = models.ForeignKey(
+        Productos, on_delete=models.DO_NOTHING, null=True, db_constraint=False, related_name='+'
+    )
+    nombre_producto = models.CharField(max_length=100, blank=True)
+    serial_producto = models.CharField(max_length=50, blank=True)
+    usuario = models.ForeignKey(
+        User, on_delete=models.DO_NOTHING, null=True, db_constraint=False, related_name='+'
+    )
+    tipo_movimiento = models.CharField(max_length=20, choices=HistorialMovimiento.TIPO_MOVIMIENTO)
+    fecha_movimiento = models.DateTimeField()
+    detalles = models.TextField(blank=True)
+    evento = models.UUIDField(null=True, blank=True, editable=False)
+
+    __str__ = HistorialMovimiento.__str__
+
+    class Meta:
+        ordering = ['-fecha_movimiento']
+        indexes = [
+            models.Index(fields=['-fecha_movimiento', '-id'], name='archivado_fecha_idx'),
+        ]
+
+
+class MovimientoStock(models.Model):
+    """
+    Libro de stock: cada cambio de ``Productos.stock`` con su cantidad (positiva
+    o negativa), motivo y origen. La suma de los movimientos de un producto es
+    su stock (ver stock.py).
+    """
+    MOTIVOS = [
+        ('INICIAL', 'Stock inicial'),
+        ('IMPORTACION', 'Importación Excel'),
+        ('SALIDA', 'Salida'),
+        ('AJUSTE', 'Ajuste manual'),
+    ]
+
+    producto = models.ForeignKey(Productos, on_delete=models.CASCADE, related_name='movimientos_stock')
+    cantidad = models.IntegerField()
+    motivo = models.CharField(max_length=20, choices=MOTIVOS)
+    # Registro que originó el movimiento, p. ej. "salida:15", "documento:3", "importacion:7"
+    origen = models.CharField(max_length=50, blank=True)
+    usuario = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    fecha = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.get_motivo_display()}: {self.cantidad:+d} - producto {self.producto_id}"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['producto', 'fecha'], name='movimiento_stock_fecha_idx'),
+        ]
+
+
+class SaldoStock(models.Model):
+    """
+    Stock de un producto al inicio de ``fecha``: suma de sus movimientos
+    anteriores con id hasta ``ultimo_movimiento``.
+    """
+    producto = models.ForeignKey(Productos, on_delete=models.CASCADE, related_name='saldos_stock')
+    fecha = models.DateTimeField()
+    stock = models.IntegerField()
+    # Id del último movimiento confirmado al tomar el saldo (ver stock.tomar_saldos)
+    ultimo_movimiento = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"Saldo de producto {self.producto_id} al {self.fecha:%d/%m/%Y}: {self.stock}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['producto', 'fecha'], name='saldo_stock_unico'),
+        ]
 
 
 class UserProfile(models.Model):
@@ -109,4 +275,162 @@ class UserProfile(models.Model):
     telefono = models.CharField(max_length=20, blank=True)
 
     def __str__(self):
-        return f"Perfil de {self.user.username}"
\ No newline at end of file
+        return f"Perfil de {self.user.username}"
+
+class ImportacionExcel(models.Model):
+    ESTADOS = [
+        ('PENDIENTE', 'Pendiente'),
+        ('PROCESANDO', 'Procesando'),
+        ('COMPLETADA', 'Completada'),
+        ('ERROR', 'Error'),
+    ]
+
+    archivo = models.FileField(upload_to='importaciones/')
+    nombre_archivo = models.CharField(max_length=255, blank=True)
+    usuario = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
+    estado = models.CharField(max_length=20, choices=ESTADOS, default='PENDIENTE')
+    filas_totales = models.IntegerField(null=True, blank=True)
+    filas_procesadas = models.IntegerField(default=0)
+    importados = models.IntegerField(default=0)
+    actualizados = models.IntegerField(default=0)
+    total_errores = models.IntegerField(default=0)
+    errores = models.TextField(blank=True)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_inicio = models.DateTimeField(null=True, blank=True)
+    # Último avance del worker (al tomarla y tras cada lote): sin avances
+    # recientes se da por abandonada
+    fecha_actualizacion = models.DateTimeField(null=True, blank=True)
+    fecha_fin = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Importación {self.id} - {self.nombre_archivo} ({self.get_estado_display()})"
+
+    @property
+    def eta_segundos(self):
+        """Tiempo restante estimado según el ritmo de filas procesadas hasta ahora."""
+        if self.estado != 'PROCESANDO' or not self.fecha_inicio or not self.filas_totales:
+            return None
+        if not self.filas_procesadas:
+            return None
+        transcurrido = (timezone.now() - self.fecha_inicio).total_seconds()
+        restantes = max(self.filas_totales - self.filas_procesadas, 0)
+        return round(transcurrido / self.filas_procesadas * restantes)
+
+    class Meta:
+        ordering = ['-fecha_creacion']
+
+
+class ReglaPrecio(models.Model):
+    """
+    Margen sobre el costo para una categoría, un proveedor o ambos.
+
+    Sin categoría ni proveedor es la regla general. Gana la regla más
+    específica (ver precios.py).
+    """
+    categoria = models.CharField(max_length=20, choices=Productos.CATEGORIAS, blank=True)
+    proveedor = models.ForeignKey('Proveedor', on_delete=models.CASCADE, null=True, blank=True)
+    margen = models.DecimalField(max_digits=6, decimal_places=2, help_text='Porcentaje sobre el costo')
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        alcance = ' / '.join(filter(None, [self.get_categoria_display(), str(self.proveedor or '')])) or 'General'
+        return f"{alcance}: {self.margen}%"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['categoria', 'proveedor'], name='regla_precio_unica'),
+            # NULL no se compara en las restricciones únicas: reglas sin proveedor aparte
+            models.UniqueConstraint(
+                fields=['categoria'],
+                condition=models.Q(proveedor__isnull=True),
+                name='regla_precio_sin_proveedor_unica',
+            ),
+        ]
+
+
+class ResumenSalidasDia(models.Model):
+    """Salidas agregadas por día, categoría y motivo (las mantiene resumenes.py)."""
+    fecha = models.DateField()
+    # Primer día del mes de ``fecha``: agrupa por mes sin funciones de fecha por fila
+    mes = models.DateField()
+    categoria = models.CharField(max_length=20, choices=Productos.CATEGORIAS)
+    motivo = models.CharField(max_length=20, choices=SalidaProducto.MOTIVOS)
+    unidades = models.IntegerField()
+    salidas = models.IntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['fecha'], name='resumen_salidas_fecha_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['fecha', 'categoria', 'motivo'], name='resumen_salidas_unico'),
+        ]
+
+
+class ResumenProveedorMes(models.Model):
+    """Unidades salidas por proveedor y mes, para la participación por proveedor."""
+    mes = models.DateField()
+    proveedor = models.ForeignKey(Proveedor, on_delete=models.SET_NULL, null=True, blank=True)
+    unidades = models.IntegerField()
+    salidas = models.IntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['mes'], name='resumen_proveedor_mes_idx'),
+        ]
+        constraints = [
+            # Sin restricción para las filas sin proveedor: NULL no se compara (ver resumenes.py)
+            models.UniqueConstraint(fields=['mes', 'proveedor'], name='resumen_proveedor_mes_unico'),
+        ]
+
+
+class ResumenProductoMes(models.Model):
+    """Unidades salidas por producto y mes, para el ranking de productos del tablero."""
+    mes = models.DateField()
+    producto = models.ForeignKey(Productos, on_delete=models.CASCADE)
+    unidades = models.IntegerField()
+    salidas = models.IntegerField()
+
+    class Meta:
+        indexes = [
+            # Cubre el ranking: se agrupa por producto sin leer la tabla
+            models.Index(fields=['mes', 'producto', 'unidades'], name='resumen_producto_mes_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['mes', 'producto'], name='resumen_producto_mes_unico'),
+        ]
+
+
+class ResumenStockDia(models.Model):
+    """Foto diaria del stock activo por categoría: productos, unidades y valor a precio de venta."""
+    fecha = models.DateField()
+    categoria = models.CharField(max_length=20, choices=Productos.CATEGORIAS)
+    productos = models.IntegerField()
+    unidades = models.IntegerField()
+    valor = models.DecimalField(max_digits=16, decimal_places=2)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['fecha', 'categoria'], name='resumen_stock_unico'),
+        ]
+
+
+class GeneracionCache(models.Model):
+    """
+    Generación de cada modelo observado por la caché de vistas (ver cache_vistas.py).
+
+    Vive en la base y no en la caché: allí se descarta con las demás entradas
+    y su ``incr`` no es atómico entre workers.
+    """
+    modelo = models.CharField(max_length=100, primary_key=True)
+    generacion = models.BigIntegerField(default=0)
+
+
+class AgregadoInventario(models.Model):
+    """
+    Contadores del inventario mantenidos por agregados.py (stock bajo, productos
+    por categoría, valor del stock), uno por fila y actualizados con UPDATE
+    relativos: el ``incr`` de la caché de archivos no es atómico entre procesos.
+    """
+    clave = models.CharField(max_length=50, primary_key=True)
+    valor = models.BigIntegerField(default=0)
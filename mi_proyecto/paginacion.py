@@ -0,0 +1,143 @@
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.db.models import Q
+
+
+class PaginaCursor:
+    """Página obtenida por cursor: conoce sus vecinas pero no el total exacto."""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None, total_aproximado=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.total_aproximado = total_aproximado
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+def _codificar(direccion, valor, pk):
+    datos = json.dumps([direccion, valor, pk]).encode()
+    return base64.urlsafe_b64encode(datos).decode().rstrip('=')
+
+
+def _decodificar(cursor):
+    try:
+        relleno = '=' * (-len(cursor) % 4)
+        direccion, valor, pk = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+        # Los cursores que arma _codificar siempre llevan el valor como texto
+        if direccion not in ('sig', 'ant') or not isinstance(valor, str):
+            raise ValueError(direccion)
+        return direccion, valor, int(pk)
+    except (ValueError, TypeError):
+        # Un cursor inválido lleva a la primera página
+        return 'sig', None, None
+
+
+def _consultas_pagina(queryset, cursor, por_pagina, campo):
+    querysets = queryset if isinstance(queryset, (list, tuple)) else [queryset]
+    modelo_campo = querysets[0].model._meta.get_field(campo)
+    direccion, valor, pk = _decodificar(cursor) if cursor else ('sig', None, None)
+    if valor is not None:
+        try:
+            valor = modelo_campo.to_python(valor)
+        except (ValidationError, TypeError, ValueError):
+            valor = None
+        if valor is None:
+            direccion, pk = 'sig', None
+
+    consultas = []
+    for qs in querysets:
+        if direccion == 'sig':
+            qs = qs.order_by(f'-{campo}', '-id')
+            if valor is not None:
+                qs = qs.filter(Q(**{f'{campo}__lt': valor}) | Q(**{campo: valor, 'id__lt': pk}))
+        else:
+            qs = qs.order_by(campo, 'id')
+            qs = qs.filter(Q(**{f'{campo}__gt': valor}) | Q(**{campo: valor, 'id__gt': pk}))
+        consultas.append(qs[:por_pagina + 1])
+    return consultas, (modelo_campo, direccion, valor)
+
+
+def _armar_pagina(filas, varias, por_pagina, campo, estado):
+    modelo_campo, direccion, valor = estado
+    if varias:
+        filas.sort(key=lambda fila: (getattr(fila, campo), fila.id), reverse=direccion == 'sig')
+
+    hay_mas = len(filas) > por_pagina
+    filas = filas[:por_pagina]
+    if direccion == 'ant':
+        filas.reverse()
+        hay_siguiente, hay_anterior = True, hay_mas
+    else:
+        hay_siguiente, hay_anterior = hay_mas, valor is not None
+
+    next_cursor = previous_cursor = None
+    if filas and hay_siguiente:
+        ultimo = filas[-1]
+        next_cursor = _codificar('sig', modelo_campo.value_to_string(ultimo), ultimo.id)
+    if filas and hay_anterior:
+        primero = filas[0]
+        previous_cursor = _codificar('ant', modelo_campo.value_to_string(primero), primero.id)
+
+    return PaginaCursor(filas, next_cursor, previous_cursor)
+
+
+def paginar_por_cursor(queryset, cursor, por_pagina, campo):
+    """
+    Pagina ``queryset`` en orden descendente por (``campo``, ``id``) usando keyset.
+
+    En lugar de ``COUNT(*)`` + ``OFFSET n`` filtra a partir del último registro
+    visto (``campo < valor OR (campo = valor AND id < pk)``), por lo que el costo
+    es el mismo en la primera página que en la página 10.000.
+
+    ``queryset`` también puede ser una lista de querysets con ids que no se
+    repiten entre sí (el historial reciente y el archivado): se pide una página
+    a cada uno y se combinan ordenadas, con una consulta por queryset.
+    """
+    consultas, estado = _consultas_pagina(queryset, cursor, por_pagina, campo)
+    filas = []
+    for qs in consultas:
+        filas.extend(qs)
+    return _armar_pagina(filas, len(consultas) > 1, por_pagina, campo, estado)
+
+
+async def apaginar_por_cursor(queryset, cursor, por_pagina, campo):
+    """Versión async de ``paginar_por_cursor`` (las mismas consultas, con el ORM async)."""
+    consultas, estado = _consultas_pagina(queryset, cursor, por_pagina, campo)
+    filas = []
+    for qs in consultas:
+        filas.extend([fila async for fila in qs])
+    return _armar_pagina(filas, len(consultas) > 1, por_pagina, campo, estado)
+
+
+def total_aproximado(modelo):
+    """
+    Total estimado de filas de la tabla sin hacer ``COUNT(*)``.
+
+    En PostgreSQL usa la estadística ``reltuples`` del planificador; en otros
+    motores no hay una estimación barata y devuelve ``None``.
+    """
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT reltuples::bigint FROM pg_class WHERE relname = %s",
+            [modelo._meta.db_table],
+        )
+        fila = cursor.fetchone()
+    if not fila or fila[0] < 0:
+        return None
+    return fila[0]
@@ -0,0 +1,7 @@
+"""
+Backend de PostgreSQL con un pool de conexiones por proceso.
+
+Se activa con ``BD_POOL=True`` (``ENGINE = 'mi_proyecto.pool_bd'``); el
+tamaño, la espera, la verificación y la vida de las conexiones se configuran
+con las variables ``BD_POOL_*`` de ``settings.py``.
+"""
@@ -0,0 +1,98 @@
+import select
+
+from django.conf import settings
+from django.db.backends.postgresql import base
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE, TRANSACTION_STATUS_UNKNOWN
+
+from .pool import Pool, PoolAgotado, pool_para
+
+
+def _cerrar(conexion):
+    try:
+        conexion.close()
+    except base.Database.Error:
+        pass
+
+
+def _es_usable(conexion, consultar):
+    if conexion.closed:
+        return False
+    # Una conexión libre no espera nada del servidor: si hay algo para leer es
+    # el aviso de cierre (reinicio de la base, pg_terminate_backend) o el fin
+    # del socket. Se detecta sin ida y vuelta
+    try:
+        legible, _, _ = select.select([conexion.fileno()], [], [], 0)
+    except (OSError, ValueError):
+        return False
+    if legible:
+        return False
+    if not consultar:
+        return True
+    try:
+        with conexion.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        return True
+    except base.Database.Error:
+        return False
+
+
+def _limpiar(conexion):
+    """Deja la conexión fuera de toda transacción; False (y cerrada) si no se puede."""
+    if conexion.closed:
+        return False
+    estado = conexion.info.transaction_status
+    if estado == TRANSACTION_STATUS_UNKNOWN:
+        _cerrar(conexion)
+        return False
+    if estado != TRANSACTION_STATUS_IDLE:
+        try:
+            conexion.rollback()
+        except base.Database.Error:
+            _cerrar(conexion)
+            return False
+    return True
+
+
+def _crear_pool():
+    return Pool(
+        maximo=settings.BD_POOL_TAMANO,
+        espera=settings.BD_POOL_ESPERA,
+        verificar=settings.BD_POOL_VERIFICAR,
+        vida=settings.BD_POOL_VIDA,
+    )
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    El backend de PostgreSQL de Django, pero abrir y cerrar la conexión la
+    toma y la devuelve al pool del proceso.
+
+    Django sigue haciendo lo suyo en cada conexión entregada (autocommit, zona
+    horaria) y las cierra al final de cada petición con ``CONN_MAX_AGE = 0``.
+    """
+
+    def get_new_connection(self, conn_params):
+        # Las conexiones nuevas lo vuelven a fijar en get_new_connection
+        self.isolation_level = base.IsolationLevel(
+            self.settings_dict['OPTIONS'].get('isolation_level', base.IsolationLevel.READ_COMMITTED)
+        )
+        pool = pool_para(self.alias, _crear_pool)
+        try:
+            return pool.obtener(
+                lambda: super(DatabaseWrapper, self).get_new_connection(conn_params), _es_usable, _cerrar,
+            )
+        except PoolAgotado as error:
+            raise self.Database.OperationalError(str(error)) from error
+
+    def _close(self):
+        if self.connection is None:
+            return
+        pool = pool_para(self.alias, _crear_pool)
+        if self.in_atomic_block:
+            # Django conserva la referencia hasta salir del bloque atomic: se
+            # cierra de verdad, como haría el backend original
+            _cerrar(self.connection)
+            pool.descartar(self.connection)
+            return
+        # Después de un error de la base se prueba antes de volver a entregarla
+        pool.devolver(self.connection, _limpiar(self.connection), verificar=self.errors_occurred)
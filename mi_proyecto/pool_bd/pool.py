@@ -0,0 +1,144 @@
+import os
+import threading
+import time
+from collections import Counter
+
+
+class PoolAgotado(Exception):
+    pass
+
+
+class Pool:
+    """
+    Conexiones abiertas de un alias de base de datos, compartidas por los hilos del proceso.
+
+    ``obtener`` entrega la última conexión devuelta (la más "caliente") o abre
+    una nueva mientras haya lugar; si las ``maximo`` están en uso espera hasta
+    ``espera`` segundos a que se libere alguna. Antes de entregar una conexión
+    se revisa que siga abierta (las que llevan más de ``verificar`` segundos
+    sin usarse, con una consulta) y las que tienen más de ``vida`` segundos se
+    reemplazan.
+
+    No conoce el driver: recibe funciones para conectar, probar y cerrar;
+    ``es_usable(conexion, consultar)``.
+    """
+
+    def __init__(self, maximo, espera, verificar, vida):
+        self.pid = os.getpid()
+        self.maximo = maximo
+        self.espera = espera
+        self.verificar = verificar
+        self.vida = vida
+        self.condicion = threading.Condition()
+        # (conexión, creada, devuelta), la última devuelta al final
+        self.libres = []
+        # id(conexión) -> creada
+        self.en_uso = {}
+        self.abiertas = 0
+        self.contadores = Counter()
+
+    def obtener(self, conectar, es_usable, cerrar):
+        inicio_espera = None
+        with self.condicion:
+            while True:
+                if self.libres:
+                    conexion, creada, devuelta = self.libres.pop()
+                    break
+                if self.abiertas < self.maximo:
+                    self.abiertas += 1
+                    conexion = None
+                    break
+                if inicio_espera is None:
+                    inicio_espera = time.monotonic()
+                    self.contadores['esperas_total'] += 1
+                restante = inicio_espera + self.espera - time.monotonic()
+                if restante <= 0:
+                    self.contadores['errores_agotado'] += 1
+                    raise PoolAgotado(
+                        f'Las {self.maximo} conexiones del pool siguen en uso después de {self.espera:g} s'
+                    )
+                self.condicion.wait(restante)
+            if inicio_espera is not None:
+                self.contadores['espera_segundos_total'] += time.monotonic() - inicio_espera
+            self.contadores['checkouts_total'] += 1
+
+        # Conectar y probar se hace fuera del candado: no bloquea a los demás hilos
+        ahora = time.monotonic()
+        if conexion is not None:
+            if ahora - creada >= self.vida:
+                self.contadores['recicladas_total'] += 1
+                cerrar(conexion)
+            elif not es_usable(conexion, ahora - devuelta >= self.verificar):
+                self.contadores['errores_salud'] += 1
+                cerrar(conexion)
+            else:
+                with self.condicion:
+                    self.en_uso[id(conexion)] = creada
+                return conexion
+
+        try:
+            conexion = conectar()
+        except Exception:
+            with self.condicion:
+                self.abiertas -= 1
+                self.contadores['errores_conexion'] += 1
+                self.condicion.notify()
+            raise
+        with self.condicion:
+            self.en_uso[id(conexion)] = ahora
+        return conexion
+
+    def devolver(self, conexion, sana, verificar=False):
+        """
+        Recibe una conexión entregada por ``obtener``.
+
+        Si no está ``sana`` (cortada o sin poder volver a un estado limpio) ya
+        debe venir cerrada y se libera su lugar; con ``verificar`` se prueba
+        antes de volver a entregarla.
+        """
+        with self.condicion:
+            creada = self.en_uso.pop(id(conexion), None)
+            if creada is None:
+                return
+            if sana:
+                devuelta = float('-inf') if verificar else time.monotonic()
+                self.libres.append((conexion, creada, devuelta))
+            else:
+                self.abiertas -= 1
+                self.contadores['errores_salud'] += 1
+            self.condicion.notify()
+
+    def descartar(self, conexion):
+        """Libera el lugar de una conexión entregada que ya se cerró."""
+        with self.condicion:
+            if self.en_uso.pop(id(conexion), None) is not None:
+                self.abiertas -= 1
+                self.condicion.notify()
+
+    def estadisticas(self):
+        with self.condicion:
+            return dict(
+                self.contadores,
+                conexiones_abiertas=self.abiertas,
+                conexiones_en_uso=len(self.en_uso),
+            )
+
+
+_pools = {}
+_candado = threading.Lock()
+
+
+def pool_para(alias, crear):
+    """El pool del alias en este proceso (uno nuevo después de un fork: las conexiones no se comparten)."""
+    with _candado:
+        pool = _pools.get(alias)
+        if pool is None or pool.pid != os.getpid():
+            pool = _pools[alias] = crear()
+        return pool
+
+
+def estadisticas():
+    """Contadores y conexiones de cada pool del proceso: {alias: {nombre: valor}}."""
+    with _candado:
+        pools = [(alias, pool) for alias, pool in _pools.items() if pool.pid == os.getpid()]
+    return {alias: pool.estadisticas() for alias, pool in pools}
@@ -0,0 +1,97 @@
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, Q, Value, When
+from django.db.models.functions import Round
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Productos, ReglaPrecio
+from .senales import productos_actualizados
+
+
+CENTAVO = Decimal('0.01')
+
+
+def margen_por_defecto():
+    """Margen cuando no hay ninguna regla, ni siquiera la general."""
+    return Decimal(str(getattr(settings, 'MARGEN_PRECIO_POR_DEFECTO', '30')))
+
+
+def cargar_reglas():
+    """Reglas vigentes: {(categoria, proveedor_id): margen}, con '' y None como comodines."""
+    return {
+        (categoria, proveedor_id): margen
+        for categoria, proveedor_id, margen in ReglaPrecio.objects.values_list('categoria', 'proveedor_id', 'margen')
+    }
+
+
+def _por_especificidad(reglas):
+    # Categoría y proveedor, solo proveedor, solo categoría, general
+    def prioridad(clave):
+        categoria, proveedor_id = clave
+        return (proveedor_id is None, categoria == '')
+    return sorted(reglas.items(), key=lambda item: prioridad(item[0]))
+
+
+def margen_para(categoria, proveedor_id, reglas):
+    for clave in ((categoria, proveedor_id), ('', proveedor_id), (categoria, None), ('', None)):
+        if clave in reglas:
+            return reglas[clave]
+    return margen_por_defecto()
+
+
+def calcular_precio(costo, margen):
+    return (Decimal(costo) * (1 + Decimal(margen) / 100)).quantize(CENTAVO, rounding=ROUND_HALF_UP)
+
+
+def aplicar_precios(productos, reglas=None):
+    """Calcula el precio de venta de cada producto a partir de su costo (sin guardar)."""
+    if reglas is None:
+        reglas = cargar_reglas()
+    for producto in productos:
+        margen = margen_para(producto.categoria, producto.proveedor_id, reglas)
+        producto.precio = calcular_precio(producto.costo, margen)
+    return productos
+
+
+def expresion_precio(reglas):
+    """Expresión SQL equivalente a ``aplicar_precios`` para usar en un UPDATE."""
+    campo = DecimalField(max_digits=10, decimal_places=4)
+    casos = []
+    general = margen_por_defecto()
+    for (categoria, proveedor_id), margen in _por_especificidad(reglas):
+        condicion = Q()
+        if categoria:
+            condicion &= Q(categoria=categoria)
+        if proveedor_id is not None:
+            condicion &= Q(proveedor_id=proveedor_id)
+        if not condicion:
+            general = margen
+            continue
+        casos.append(When(condicion, then=Value(1 + margen / 100, output_field=campo)))
+    factor = Value(1 + general / 100, output_field=campo)
+    if casos:
+        factor = Case(*casos, default=factor, output_field=campo)
+    return Round(F('costo') * factor, 2, output_field=Productos._meta.get_field('precio'))
+
+
+def recalcular_precios(queryset=None):
+    """
+    Recalcula el precio de venta de ``queryset`` (todo el catálogo por defecto)
+    con un único UPDATE. Devuelve la cantidad de productos actualizados.
+    """
+    if queryset is None:
+        queryset = Productos.objects.all()
+    with transaction.atomic():
+        actualizados = queryset.update(precio=expresion_precio(cargar_reglas()))
+        # Cambia el valor del stock: los agregados se recalculan completos
+        productos_actualizados.send(sender=Productos, cambios=None)
+    return actualizados
+
+
+@receiver(post_save, sender=ReglaPrecio)
+@receiver(post_delete, sender=ReglaPrecio)
+def _regla_modificada(sender, **kwargs):
+    transaction.on_commit(recalcular_precios)
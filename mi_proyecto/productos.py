@@ -0,0 +1,36 @@
+from django.db import transaction
+
+from . import stock
+from .auditoria import registrar
+from .models import Productos, HistorialMovimiento
+from .senales import productos_actualizados
+
+
+TAMANO_LOTE = 500
+
+
+def crear_productos(productos, usuario=None, detalles='Creación múltiple de productos'):
+    """
+    Inserta productos nuevos, su stock inicial y su historial con ``bulk_create``
+    en una sola transacción.
+
+    ``productos`` son instancias sin guardar; la unicidad de los códigos debe
+    haberse comprobado antes (si otro usuario se adelanta, el IntegrityError
+    revierte todo el lote).
+    """
+    with transaction.atomic():
+        Productos.objects.bulk_create(productos, batch_size=TAMANO_LOTE)
+        productos_actualizados.send(sender=Productos, cambios=[(None, p.estado_agregados()) for p in productos])
+        stock.registrar(*stock.stock_inicial(productos, usuario))
+        registrar(*[
+            HistorialMovimiento(
+                producto=producto,
+                nombre_producto=producto.nombre,
+                serial_producto=producto.codigo,
+                usuario=usuario,
+                tipo_movimiento='CREACION',
+                detalles=detalles,
+            )
+            for producto in productos
+        ])
+    return productos
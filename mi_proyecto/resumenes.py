@@ -0,0 +1,219 @@
+from datetime import date
+
+from django.db import connection, transaction
+from django.db.models import Count, DateField, DecimalField, ExpressionWrapper, F, Max, Sum
+from django.db.models.functions import TruncDate, TruncMonth
+from django.utils import timezone
+
+from .archivo import inicio_del_dia
+from .models import (
+    Productos, SalidaProducto, ResumenSalidasDia, ResumenProductoMes, ResumenProveedorMes, ResumenStockDia,
+)
+
+
+TAMANO_LOTE = 5000
+# Columnas que se reescriben cuando la fila del resumen ya existe
+CAMPOS_RESUMEN = ['unidades', 'salidas']
+
+
+def _borrar_desde(modelo, campo, desde):
+    # DELETE directo: el borrado del ORM cargaría cada fila para enviar señales
+    qn = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        if desde is None:
+            cursor.execute(f'DELETE FROM {qn(modelo._meta.db_table)}')
+        else:
+            cursor.execute(
+                f'DELETE FROM {qn(modelo._meta.db_table)} WHERE {qn(campo)} >= %s',
+                [connection.ops.adapt_datefield_value(desde)],
+            )
+
+
+def _salidas_desde(desde):
+    salidas = SalidaProducto.objects.all()
+    if desde is not None:
+        salidas = salidas.filter(fecha_salida__gte=inicio_del_dia(desde))
+    return salidas
+
+
+def _actualizar_salidas(desde):
+    _borrar_desde(ResumenSalidasDia, 'fecha', desde)
+    filas = (
+        _salidas_desde(desde)
+        .annotate(dia=TruncDate('fecha_salida'))
+        .values('dia', 'producto__categoria', 'motivo')
+        .annotate(unidades=Sum('cantidad'), salidas=Count('id'))
+        .order_by()
+    )
+    resumen = [
+        ResumenSalidasDia(
+            fecha=fila['dia'],
+            mes=fila['dia'].replace(day=1),
+            categoria=fila['producto__categoria'],
+            motivo=fila['motivo'],
+            unidades=fila['unidades'],
+            salidas=fila['salidas'],
+        )
+        for fila in filas
+    ]
+    ResumenSalidasDia.objects.bulk_create(
+        resumen, batch_size=TAMANO_LOTE,
+        update_conflicts=True, unique_fields=['fecha', 'categoria', 'motivo'], update_fields=CAMPOS_RESUMEN,
+    )
+    return len(resumen)
+
+
+def _actualizar_mensual(modelo, campo, agrupar_por, desde):
+    """Unidades y salidas por mes y ``agrupar_por`` en ``modelo`` (cuyo campo es ``campo``_id)."""
+    _borrar_desde(modelo, 'mes', desde)
+    filas = (
+        _salidas_desde(desde)
+        .annotate(inicio_mes=TruncMonth('fecha_salida', output_field=DateField()))
+        .values_list('inicio_mes', agrupar_por)
+        .annotate(unidades=Sum('cantidad'), salidas=Count('id'))
+        .order_by()
+    )
+    resumen = [
+        modelo(mes=mes, **{f'{campo}_id': valor}, unidades=unidades, salidas=salidas)
+        for mes, valor, unidades, salidas in filas
+    ]
+    # Si otra actualización escribió el mismo mes en paralelo, se reemplazan sus filas
+    modelo.objects.bulk_create(
+        [fila for fila in resumen if getattr(fila, f'{campo}_id') is not None], batch_size=TAMANO_LOTE,
+        update_conflicts=True, unique_fields=['mes', campo], update_fields=CAMPOS_RESUMEN,
+    )
+    # La restricción única no cubre ``campo`` en NULL: esas filas se actualizan antes de crearlas
+    for fila in resumen:
+        if getattr(fila, f'{campo}_id') is None and not modelo.objects.filter(
+            mes=fila.mes, **{f'{campo}__isnull': True}
+        ).update(unidades=fila.unidades, salidas=fila.salidas):
+            fila.save()
+    return len(resumen)
+
+
+def _actualizar_stock(hoy):
+    ResumenStockDia.objects.filter(fecha=hoy).delete()
+    valor = ExpressionWrapper(F('precio') * F('stock'), output_field=DecimalField(max_digits=20, decimal_places=2))
+    filas = (
+        Productos.objects.filter(activo=True)
+        .values('categoria')
+        .annotate(productos=Count('id'), unidades=Sum('stock'), valor=Sum(valor))
+        .order_by()
+    )
+    ResumenStockDia.objects.bulk_create(
+        [
+            ResumenStockDia(
+                fecha=hoy, categoria=fila['categoria'], productos=fila['productos'],
+                unidades=fila['unidades'] or 0, valor=fila['valor'] or 0,
+            )
+            for fila in filas
+        ],
+        update_conflicts=True, unique_fields=['fecha', 'categoria'], update_fields=['productos', 'unidades', 'valor'],
+    )
+
+
+def actualizar_resumenes(desde=None, completo=False):
+    """
+    Actualiza los resúmenes del tablero de forma incremental.
+
+    Cada resumen se recalcula desde su último día (o mes) ya resumido, que
+    pudo quedar incompleto; ``desde`` (``date``) fuerza a recalcular a partir
+    de ese día y ``completo`` los recalcula enteros. La foto del stock se toma
+    para el día de hoy. Devuelve las filas escritas por resumen.
+
+    Las filas se escriben con upsert sobre su clave: dos actualizaciones en
+    paralelo no duplican un día ni un mes.
+    """
+    hoy = timezone.localdate()
+    with transaction.atomic():
+        desde_salidas = desde
+        desde_meses = desde.replace(day=1) if desde else None
+        if desde is None and not completo:
+            desde_salidas = ResumenSalidasDia.objects.aggregate(ultimo=Max('fecha'))['ultimo']
+            # Los resúmenes mensuales se escriben juntos: basta con el último mes de uno
+            desde_meses = ResumenProductoMes.objects.aggregate(ultimo=Max('mes'))['ultimo']
+        filas = {
+            'salidas': _actualizar_salidas(desde_salidas),
+            'productos': _actualizar_mensual(ResumenProductoMes, 'producto', 'producto', desde_meses),
+            'proveedores': _actualizar_mensual(
+                ResumenProveedorMes, 'proveedor', 'producto__proveedor', desde_meses
+            ),
+        }
+        _actualizar_stock(hoy)
+    return filas
+
+
+def _con_porcentaje(filas, campo):
+    maximo = max((fila[campo] for fila in filas), default=0) or 1
+    total = sum(fila[campo] for fila in filas) or 1
+    for fila in filas:
+        fila['ancho'] = round(fila[campo] * 100 / maximo)
+        fila['porcentaje'] = round(fila[campo] * 100 / total, 1)
+    return filas
+
+
+def datos_tablero(desde, hasta):
+    """
+    Datos del tablero entre ``desde`` y ``hasta`` (``date``), leídos solo de los
+    resúmenes: cada consulta recorre días × categorías (o meses × proveedores,
+    meses × productos), no las salidas.
+    """
+    categorias = dict(Productos.CATEGORIAS)
+    motivos = dict(SalidaProducto.MOTIVOS)
+    salidas = ResumenSalidasDia.objects.filter(fecha__gte=desde, fecha__lte=hasta)
+
+    ultimo_stock = ResumenStockDia.objects.aggregate(ultimo=Max('fecha'))['ultimo']
+    stock = list(
+        ResumenStockDia.objects.filter(fecha=ultimo_stock).order_by('-valor')
+        .values('categoria', 'productos', 'unidades', 'valor')
+    )
+    for fila in stock:
+        fila['nombre'] = categorias.get(fila['categoria'], fila['categoria'])
+
+    por_motivo = list(salidas.values('motivo').annotate(total=Sum('unidades')).order_by('-total'))
+    for fila in por_motivo:
+        fila['nombre'] = motivos.get(fila['motivo'], fila['motivo'])
+
+    por_mes = {}
+    filas_mes = (
+        salidas.values('mes', 'categoria').annotate(total=Sum('unidades')).order_by('mes')
+    )
+    for fila in filas_mes:
+        por_mes.setdefault(fila['mes'], {})[fila['categoria']] = fila['total']
+    meses = [
+        {'mes': mes, 'totales': [valores.get(codigo, 0) for codigo in categorias]}
+        for mes, valores in por_mes.items()
+    ]
+
+    # Ranking y proveedores por meses completos: incluyen el mes de ``desde`` entero
+    top_productos = list(
+        ResumenProductoMes.objects.filter(mes__gte=date(desde.year, desde.month, 1), mes__lte=hasta)
+        .values('producto')
+        .annotate(total=Sum('unidades'))
+        .order_by('-total')[:10]
+    )
+    # Nombres solo de los diez productos, después de agrupar
+    nombres = Productos.objects.only('nombre', 'codigo').in_bulk([fila['producto'] for fila in top_productos])
+    for fila in top_productos:
+        producto = nombres.get(fila['producto'])
+        fila['producto__nombre'] = producto.nombre if producto else ''
+        fila['producto__codigo'] = producto.codigo if producto else ''
+
+    proveedores = list(
+        ResumenProveedorMes.objects.filter(mes__gte=date(desde.year, desde.month, 1), mes__lte=hasta)
+        .values('proveedor', 'proveedor__nombre')
+        .annotate(total=Sum('unidades'))
+        .order_by('-total')
+    )
+    for fila in proveedores:
+        fila['nombre'] = fila['proveedor__nombre'] or 'Sin proveedor'
+
+    return {
+        'fecha_stock': ultimo_stock,
+        'stock': _con_porcentaje(stock, 'valor'),
+        'por_motivo': _con_porcentaje(por_motivo, 'total'),
+        'categorias': list(categorias.values()),
+        'meses': meses,
+        'top_productos': _con_porcentaje(top_productos, 'total'),
+        'proveedores': _con_porcentaje(proveedores, 'total'),
+    }
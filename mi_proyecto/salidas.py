@@ -0,0 +1,94 @@
+from django.db import transaction
+from django.db.models import Case, F, When
+
+from . import stock
+from .auditoria import registrar
+from .models import Productos, SalidaProducto, DocumentoSalida, HistorialMovimiento, MovimientoStock
+from .senales import productos_actualizados
+
+
+class StockInsuficiente(ValueError):
+    pass
+
+
+def agrupar_lineas(lineas):
+    """Suma las cantidades de las líneas que repiten producto: {producto_id: cantidad}."""
+    cantidades = {}
+    for producto_id, cantidad in lineas:
+        cantidades[producto_id] = cantidades.get(producto_id, 0) + cantidad
+    return cantidades
+
+
+def registrar_documento_salida(lineas, motivo, descripcion='', usuario=None):
+    """
+    Registra una salida de varios productos en una sola transacción.
+
+    ``lineas`` es una lista de ``(producto_id, cantidad)``. Se valida el stock de
+    todos los productos con una consulta, se descuentan todos con un único
+    UPDATE y se insertan las líneas y el historial con ``bulk_create``. Si algún
+    producto no tiene stock suficiente no se registra nada.
+    """
+    cantidades = agrupar_lineas(lineas)
+    with transaction.atomic():
+        productos = Productos.objects.select_for_update().in_bulk(cantidades.keys())
+        faltantes = [
+            f"{productos[pid].nombre if pid in productos else pid}: "
+            f"stock disponible {productos[pid].stock if pid in productos else 0}"
+            for pid, cantidad in cantidades.items()
+            if pid not in productos or cantidad > productos[pid].stock
+        ]
+        if faltantes:
+            raise StockInsuficiente("No hay suficiente stock. " + "; ".join(faltantes))
+
+        Productos.objects.filter(id__in=cantidades.keys()).update(
+            stock=Case(*[When(id=pid, then=F('stock') - cantidad) for pid, cantidad in cantidades.items()])
+        )
+        # Sin bloqueo de filas (SQLite) otra salida pudo adelantarse: se revierte todo
+        if Productos.objects.filter(id__in=cantidades.keys(), stock__lt=0).exists():
+            raise StockInsuficiente("No hay suficiente stock: otra salida modificó el stock al mismo tiempo")
+
+        cambios = []
+        for pid, cantidad in cantidades.items():
+            antes = productos[pid].estado_agregados()
+            cambios.append((antes, (antes[0] - cantidad,) + antes[1:]))
+        productos_actualizados.send(sender=Productos, cambios=cambios)
+
+        documento = DocumentoSalida.objects.create(motivo=motivo, descripcion=descripcion, usuario=usuario)
+        motivo_display = documento.get_motivo_display()
+
+        SalidaProducto.objects.bulk_create([
+            SalidaProducto(
+                producto=productos[producto_id],
+                cantidad=cantidad,
+                motivo=motivo,
+                descripcion=descripcion,
+                usuario=usuario,
+                documento=documento,
+            )
+            for producto_id, cantidad in lineas
+        ])
+        stock.registrar(*[
+            MovimientoStock(
+                producto_id=producto_id,
+                cantidad=-cantidad,
+                motivo='SALIDA',
+                origen=f'documento:{documento.id}',
+                usuario=usuario,
+            )
+            for producto_id, cantidad in cantidades.items()
+        ])
+        registrar(*[
+            HistorialMovimiento(
+                producto=productos[producto_id],
+                nombre_producto=productos[producto_id].nombre,
+                serial_producto=productos[producto_id].codigo,
+                usuario=usuario,
+                tipo_movimiento='EDICION',
+                detalles=(
+                    f"Salida de {cantidad} unidades. Motivo: {motivo_display}. "
+                    f"Documento {documento.id}. {descripcion}"
+                ),
+            )
+            for producto_id, cantidad in lineas
+        ])
+    return documento
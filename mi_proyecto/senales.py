@@ -0,0 +1,11 @@
+from django.dispatch import Signal
+
+
+# Se envía cuando se modifican productos sin pasar por save() (update(), bulk_create,
+# bulk_update), con cambios=[(antes, despues), ...] usando Productos.estado_agregados()
+# (None para un producto nuevo o eliminado, False si el estado es desconocido).
+# cambios=None indica que cambiaron productos sin detallar cuáles (UPDATE masivo).
+productos_actualizados = Signal()
+
+# Se envía después de escribir en bloque movimientos del historial (auditoria.py).
+movimientos_registrados = Signal()
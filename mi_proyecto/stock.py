@@ -0,0 +1,119 @@
+from django.db import connection, transaction
+from django.db.models import F, Max, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .archivo import inicio_del_dia
+from .models import Productos, MovimientoStock, SaldoStock
+
+
+TAMANO_LOTE = 2000
+
+
+def registrar(*movimientos):
+    """
+    Guarda movimientos del libro de stock (instancias de ``MovimientoStock`` sin guardar).
+
+    Deben registrarse en la misma transacción que modifica ``Productos.stock``:
+    a diferencia del historial, el libro se escribe en el momento porque
+    ``verificar()`` lo compara con el stock. Los movimientos en cero se omiten.
+    """
+    movimientos = [m for m in movimientos if m.cantidad]
+    for movimiento in movimientos:
+        if movimiento.producto_id is None and movimiento.producto is not None:
+            movimiento.producto_id = movimiento.producto.pk
+    MovimientoStock.objects.bulk_create(movimientos, batch_size=TAMANO_LOTE)
+
+
+def stock_inicial(productos, usuario=None, origen=''):
+    """Movimientos de stock inicial para productos recién creados."""
+    return [
+        MovimientoStock(producto=producto, cantidad=producto.stock, motivo='INICIAL', origen=origen, usuario=usuario)
+        for producto in productos
+    ]
+
+
+def stock_a_fecha(producto_id, fecha):
+    """
+    Stock del producto al momento ``fecha``: el último saldo anterior más los
+    movimientos desde ese saldo (a lo sumo un período de ``tomar_saldos``) y
+    los confirmados después de tomarlo.
+    """
+    saldo = (
+        SaldoStock.objects.filter(producto_id=producto_id, fecha__lte=fecha)
+        .order_by('-fecha').values_list('fecha', 'stock', 'ultimo_movimiento').first()
+    )
+    movimientos = MovimientoStock.objects.filter(producto_id=producto_id, fecha__lte=fecha)
+    base = 0
+    if saldo:
+        desde, base, ultimo = saldo
+        movimientos = movimientos.filter(Q(fecha__gte=desde) | Q(id__gt=ultimo))
+    return base + (movimientos.aggregate(total=Sum('cantidad'))['total'] or 0)
+
+
+def _ultimo_movimiento():
+    """
+    Id del último movimiento del libro tal que todos los anteriores ya están
+    confirmados. En PostgreSQL los ids se asignan al insertar, no al confirmar:
+    el bloqueo SHARE espera a las transacciones que están escribiendo el libro
+    y se suelta al salir del bloque.
+    """
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(f'LOCK TABLE {connection.ops.quote_name(MovimientoStock._meta.db_table)} IN SHARE MODE')
+        return MovimientoStock.objects.aggregate(ultimo=Max('id'))['ultimo'] or 0
+
+
+def tomar_saldos(fecha=None):
+    """
+    Guarda el saldo al ``fecha`` (por defecto, el inicio del día) de los
+    productos con movimientos desde el saldo anterior. Devuelve cuántos guardó.
+
+    Solo recorre los movimientos que no entraron en el último corte: los
+    posteriores a su fecha y los confirmados después de tomarlo (id mayor que
+    su ``ultimo_movimiento``), aunque su fecha sea anterior. Un producto sin
+    saldo en ese corte no tuvo movimientos desde su propio saldo, que sigue
+    siendo válido. Repetir el mismo corte lo recalcula.
+    """
+    if fecha is None:
+        fecha = inicio_del_dia(timezone.localdate())
+    ultimo = _ultimo_movimiento()
+    with transaction.atomic():
+        SaldoStock.objects.filter(fecha=fecha).delete()
+        anterior = (
+            SaldoStock.objects.filter(fecha__lt=fecha)
+            .order_by('-fecha').values_list('fecha', 'ultimo_movimiento').first()
+        )
+        movimientos = MovimientoStock.objects.filter(fecha__lt=fecha, id__lte=ultimo)
+        if anterior is not None:
+            corte, ultimo_anterior = anterior
+            movimientos = movimientos.filter(Q(fecha__gte=corte) | Q(id__gt=ultimo_anterior))
+        saldo_anterior = SaldoStock.objects.filter(
+            producto=OuterRef('producto'), fecha__lt=fecha
+        ).order_by('-fecha').values('stock')[:1]
+        filas = (
+            movimientos.values('producto')
+            .annotate(cambio=Sum('cantidad'), anterior=Coalesce(Subquery(saldo_anterior), 0))
+            .values_list('producto', 'cambio', 'anterior')
+            .order_by()
+        )
+        saldos = [
+            SaldoStock(producto_id=producto_id, fecha=fecha, stock=anterior + cambio, ultimo_movimiento=ultimo)
+            for producto_id, cambio, anterior in filas.iterator(chunk_size=TAMANO_LOTE)
+        ]
+        SaldoStock.objects.bulk_create(saldos, batch_size=TAMANO_LOTE)
+    return len(saldos)
+
+
+def verificar():
+    """
+    Productos cuyo stock no coincide con la suma de su libro, con una sola
+    consulta de agregación: [(id, codigo, stock, stock según el libro)].
+    """
+    return list(
+        Productos.objects.annotate(libro=Coalesce(Sum('movimientos_stock__cantidad'), 0))
+        .exclude(stock=F('libro'))
+        .order_by('codigo')
+        .values_list('id', 'codigo', 'stock', 'libro')
+    )
@@ -1,3 +1,1538 @@
-from django.test import TestCase
+import csv
+import fcntl
+import importlib
+import json
+import re
+import os
+import socket
+import tempfile
+import threading
+import time
+import zipfile
+from datetime import datetime, timedelta
+from itertools import chain
+from decimal import Decimal
+from io import BytesIO, StringIO
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import IntegrityError, OperationalError, connection
+from django.db.models import QuerySet, Sum
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import clear_url_caches, resolve, reverse
+from django.utils import timezone
+from openpyxl import Workbook, load_workbook
+from psycopg2.extensions import (
+    TRANSACTION_STATUS_IDLE, TRANSACTION_STATUS_INERROR, TRANSACTION_STATUS_INTRANS, TRANSACTION_STATUS_UNKNOWN,
+)
+
+from . import (
+    agregados, archivo, asincrono, auditoria, busqueda, cache_vistas, comprobantes, importacion, metricas, precios,
+    resumenes, salidas, stock, urls, views,
+)
+from .consultas import limite_consultas
+from .datos_prueba import sembrar, sembrar_inventario
+from .forms import AUTOCOMPLETAR_LIMITE
+from .management.commands import benchmark_suite
+from .paginacion import _codificar, paginar_por_cursor
+from .pool_bd import base as pool_base
+from .pool_bd.pool import Pool, PoolAgotado
+from .models import (
+    AgregadoInventario, DocumentoSalida, GeneracionCache, HistorialArchivado, HistorialMovimiento, ImportacionExcel,
+    MovimientoStock, Productos, Proveedor, ResumenProductoMes, ResumenProveedorMes, ResumenSalidasDia, ReglaPrecio,
+    SaldoStock, SalidaProducto,
+)
+
+
+# Cachés en memoria: las pruebas no ven agregados ni páginas guardadas por el servidor de desarrollo
+CACHES_PRUEBA = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'pruebas'},
+    'vistas': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'pruebas-vistas'},
+}
+# Archivos estáticos sin manifiesto: las plantillas se renderizan sin haber corrido collectstatic
+STORAGES_PRUEBA = dict(
+    settings.STORAGES, staticfiles={'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+)
+
+
+def _producto(**campos):
+    return Productos(**{'descripcion': '', 'precio': 10, 'categoria': 'PERIFERICOS', **campos})
+
+
+def _excel_productos(filas):
+    """Contenido de un Excel de importación con ``filas`` (código, nombre, descripción, precio, stock, categoría, proveedor)."""
+    libro = Workbook()
+    libro.active.append(['Código', 'Nombre', 'Descripción', 'Precio', 'Stock', 'Categoría', 'Proveedor'])
+    for fila in filas:
+        libro.active.append(list(fila))
+    salida = BytesIO()
+    libro.save(salida)
+    return salida.getvalue()
+
+
+@override_settings(
+    PRESUPUESTO_CONSULTAS_ESTRICTO=True, CACHE_VISTAS_SEGUNDOS=0, CACHES=CACHES_PRUEBA, STORAGES=STORAGES_PRUEBA,
+)
+class AutocompletarProductosTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user('vendedor', password='x')
+        Productos.objects.bulk_create(
+            [_producto(nombre=f'Cable UTP {i}', codigo=f'CAB-{i:04d}', stock=5) for i in range(30)]
+            + [
+                _producto(nombre='Notebook sin stock', codigo='NOT-0001', stock=0),
+                _producto(nombre='Notebook Lenovo', codigo='NOT-0002', stock=3),
+                _producto(nombre='Mouse inalámbrico', codigo='MOU-0001', stock=8),
+            ]
+        )
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+
+    def buscar(self, texto):
+        respuesta = self.client.get(reverse('autocompletar_productos'), {'q': texto})
+        self.assertEqual(respuesta.status_code, 200)
+        return respuesta.json()['resultados']
+
+    def test_requiere_sesion(self):
+        self.client.logout()
+        respuesta = self.client.get(reverse('autocompletar_productos'), {'q': 'cable'})
+        self.assertEqual(respuesta.status_code, 302)
+
+    def test_texto_corto_no_consulta(self):
+        self.assertEqual(self.buscar('c'), [])
+
+    def test_por_codigo_solo_con_stock(self):
+        resultados = self.buscar('NOT-')
+        self.assertEqual([r['codigo'] for r in resultados], ['NOT-0002'])
+        self.assertEqual(set(resultados[0]), {'id', 'codigo', 'nombre', 'stock'})
+
+    def test_por_nombre(self):
+        self.assertEqual([r['codigo'] for r in self.buscar('inalámbrico')], ['MOU-0001'])
+        self.assertEqual([r['codigo'] for r in self.buscar('notebook')], ['NOT-0002'])
+
+    def test_limite(self):
+        self.assertEqual(len(self.buscar('CAB-')), AUTOCOMPLETAR_LIMITE)
+        self.assertEqual(len(self.buscar('cable')), AUTOCOMPLETAR_LIMITE)
+
+    def test_presupuesto_en_proceso_nuevo(self):
+        # Sin el motor de búsqueda resuelto, como la primera petición de un proceso
+        busqueda._motores.clear()
+        self.buscar('zzz')
+        self.buscar('cable')
+
+
+@override_settings(
+    PRESUPUESTO_CONSULTAS_ESTRICTO=True, CACHE_VISTAS_SEGUNDOS=0, CACHES=CACHES_PRUEBA, STORAGES=STORAGES_PRUEBA,
+)
+class ConsultasPorVistaTests(TestCase):
+    """Cada listado ejecuta siempre la misma cantidad de consultas, haya pocas o muchas filas."""
+
+    # Consultas por petición: sesión y usuario, más COUNT(*) y página o solo
+    # la página en los listados paginados por cursor (que en PostgreSQL además
+    # leen el total estimado de pg_class); lista_productos lee también los agregados
+    CONSULTAS = {
+        'lista_productos': 5,
+        'productos_inhabilitados': 4,
+        'lista_salidas': 3,
+        'historial_movimientos': 3,
+    }
+    CONSULTAS_POSTGRESQL = dict(CONSULTAS, lista_salidas=4, historial_movimientos=4)
+
+    def setUp(self):
+        for alias in CACHES_PRUEBA:
+            caches[alias].clear()
+        self.client.force_login(User.objects.create_user('auditor', password='x'))
+
+    def test_consultas_fijas(self):
+        sembradas = 0
+        for filas in (15, 150):
+            # Se suman filas a las de la vuelta anterior hasta llegar a ``filas``
+            sembrar(
+                productos=filas - sembradas, proveedores=5, salidas=filas - sembradas,
+                movimientos=filas - sembradas, dias=30, prefijo=f'P{filas}',
+            )
+            sembradas = filas
+            consultas = self.CONSULTAS_POSTGRESQL if connection.vendor == 'postgresql' else self.CONSULTAS
+            for nombre, esperadas in consultas.items():
+                with self.subTest(vista=nombre, filas=filas):
+                    url = reverse(nombre)
+                    # La primera petición calcula los contadores de agregados.py y los guarda
+                    self.client.get(url)
+                    with limite_consultas(esperadas, nombre) as contador:
+                        respuesta = self.client.get(url)
+                    self.assertEqual(respuesta.status_code, 200)
+                    self.assertEqual(contador.total, esperadas)
+
+
+@override_settings(CACHE_VISTAS_SEGUNDOS=60, CACHES=CACHES_PRUEBA, STORAGES=STORAGES_PRUEBA)
+class CacheVistasTests(TestCase):
+    """Las páginas guardadas dejan de servirse en cuanto cambia un modelo del que dependen."""
+
+    def setUp(self):
+        for alias in CACHES_PRUEBA:
+            caches[alias].clear()
+        self.client.force_login(User.objects.create_user('lector', password='x'))
+        Productos.objects.bulk_create([_producto(nombre='Teclado', codigo='TEC-0001', stock=4)])
+
+    def estado(self):
+        return self.client.get(reverse('lista_productos'))['X-Cache']
+
+    def test_edicion_invalida(self):
+        self.assertEqual(self.estado(), 'MISS')
+        self.assertEqual(self.estado(), 'HIT')
+        with self.captureOnCommitCallbacks(execute=True):
+            producto = Productos.objects.get(codigo='TEC-0001')
+            producto.nombre = 'Teclado USB'
+            producto.save(update_fields=['nombre'])
+        self.assertEqual(self.estado(), 'MISS')
+
+    def test_generacion_en_la_base(self):
+        self.estado()
+        cache_vistas.invalidar_modelo(Productos)
+        cache_vistas.invalidar_modelo(Productos)
+        self.assertEqual(GeneracionCache.objects.get(modelo='mi_proyecto.productos').generacion, 2)
+        # La caché no guarda generaciones: descartar sus entradas no vuelve a
+        # la generación 0 ni resucita páginas ya invalidadas
+        self.assertFalse([c for c in caches[cache_vistas.ALIAS_CACHE]._cache if 'generacion' in c])
+        self.assertEqual(self.estado(), 'MISS')
+
+
+@override_settings(CACHES=CACHES_PRUEBA, STORAGES=STORAGES_PRUEBA)
+class SalidasConcurrentesTests(TransactionTestCase):
+    """Salidas simultáneas sobre un mismo producto desde varios hilos, cada uno con su conexión."""
+
+    HILOS = 8
+    SALIDAS_POR_HILO = 25
+    # Menos que las unidades pedidas: parte de las salidas se rechaza por stock
+    STOCK = 150
+
+    def test_stock_cuadra(self):
+        producto = Productos.objects.create(
+            nombre='Producto concurrencia', codigo='CONC-0001', descripcion='', precio=1,
+            stock=self.STOCK, categoria='PERIFERICOS',
+        )
+        stock.registrar(*stock.stock_inicial([producto]))
+        conteo = {'ok': 0, 'sin_stock': 0, 'bloqueos': 0}
+        candado = threading.Lock()
+        inicio = threading.Barrier(self.HILOS)
+
+        def trabajador():
+            inicio.wait()
+            try:
+                for _ in range(self.SALIDAS_POR_HILO):
+                    salida = SalidaProducto(producto=Productos(id=producto.id), cantidad=1, motivo='OTRO')
+                    try:
+                        salida.save()
+                        resultado = 'ok'
+                    except ValueError:
+                        resultado = 'sin_stock'
+                    except OperationalError:
+                        # SQLite serializa las escrituras y puede agotar la espera del bloqueo
+                        resultado = 'bloqueos'
+                    with candado:
+                        conteo[resultado] += 1
+            finally:
+                connection.close()
+
+        hilos = [threading.Thread(target=trabajador) for _ in range(self.HILOS)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        auditoria.vaciar()
+
+        producto.refresh_from_db()
+        salidas = SalidaProducto.objects.filter(producto=producto)
+        unidades = salidas.aggregate(total=Sum('cantidad'))['total'] or 0
+        self.assertGreater(conteo['ok'], 0)
+        self.assertGreaterEqual(producto.stock, 0)
+        self.assertEqual(self.STOCK - unidades, producto.stock)
+        self.assertEqual(salidas.count(), conteo['ok'])
+        self.assertEqual(HistorialMovimiento.objects.filter(producto=producto).count(), conteo['ok'])
+        self.assertEqual(producto.movimientos_stock.aggregate(total=Sum('cantidad'))['total'], producto.stock)
+        if not conteo['bloqueos']:
+            self.assertEqual(producto.stock, 0)
+
+
+@override_settings(CACHES=CACHES_PRUEBA, STORAGES=STORAGES_PRUEBA, CACHE_VISTAS_SEGUNDOS=0)
+class EdicionConcurrenteTests(TestCase):
+    """Editar, habilitar o deshabilitar un producto no pisa una salida registrada mientras tanto."""
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('editor', password='x'))
+        self.producto = Productos.objects.create(
+            nombre='Producto editado', codigo='EDIT-0001', descripcion='', precio=1, costo=1,
+            stock=10, categoria='PERIFERICOS',
+        )
+
+    def post_con_salida(self, nombre, datos=None):
+        obtener = views.get_object_or_404
+
+        def obtener_y_vender(*args, **kwargs):
+            # Después de que la vista lee el producto, otra petición registra una salida
+            producto = obtener(*args, **kwargs)
+            SalidaProducto(producto=Productos.objects.get(pk=producto.pk), cantidad=3, motivo='VENTA').save()
+            return producto
+
+        with mock.patch.object(views, 'get_object_or_404', obtener_y_vender):
+            respuesta = self.client.post(reverse(nombre, args=[self.producto.id]), datos or {})
+        self.assertEqual(respuesta.status_code, 302)
+        self.producto.refresh_from_db()
+
+    def editar(self, **campos):
+        self.post_con_salida('editar_producto', {
+            'nombre': 'Producto renombrado', 'codigo': 'EDIT-0001', 'descripcion': 'x', 'costo': '1',
+            'stock': 10, 'categoria': 'PERIFERICOS', 'proveedor': '',
+            **campos,
+        })
+
+    def test_editar_sin_cambiar_stock(self):
+        self.editar()
+        self.assertEqual(self.producto.nombre, 'Producto renombrado')
+        self.assertEqual(self.producto.stock, 7)
+
+    def test_editar_ajustando_stock(self):
+        self.editar(stock=15)
+        self.assertEqual(self.producto.stock, 12)
+        self.assertEqual(self.producto.movimientos_stock.aggregate(total=Sum('cantidad'))['total'], 2)
+
+    def test_deshabilitar_y_habilitar(self):
+        self.post_con_salida('deshabilitar_producto')
+        self.assertFalse(self.producto.activo)
+        self.assertEqual(self.producto.stock, 7)
+        self.post_con_salida('habilitar_producto')
+        self.assertTrue(self.producto.activo)
+        self.assertEqual(self.producto.stock, 4)
+
+    @override_settings(AUDITORIA_SINCRONA=True)
+    def test_deshabilitar_dos_veces(self):
+        agregados.obtener()
+        # Dos pestañas abiertas: la segunda confirma cuando el producto ya está deshabilitado
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post_con_salida('deshabilitar_producto')
+            self.post_con_salida('deshabilitar_producto')
+        self.assertFalse(self.producto.activo)
+        self.assertEqual(self.producto.stock, 4)
+        self.assertEqual(
+            HistorialMovimiento.objects.filter(producto=self.producto, tipo_movimiento='DESHABILITACION').count(), 1
+        )
+        # Los contadores restaron el producto una sola vez y con su stock actual
+        self.assertEqual(agregados.reconciliar(), {})
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post_con_salida('habilitar_producto')
+        self.assertTrue(self.producto.activo)
+        self.assertEqual(agregados.reconciliar(), {})
+
+
+@override_settings(AUDITORIA_SINCRONA=True, CACHES=CACHES_PRUEBA, STORAGES=STORAGES_PRUEBA)
+class DocumentoSalidaTests(TestCase):
+    """Salidas de varios productos en un documento: todo o nada."""
+
+    def setUp(self):
+        self.usuario = User.objects.create_user('deposito', password='x')
+        self.mouse, self.teclado = Productos.objects.bulk_create([
+            _producto(nombre='Mouse', codigo='MOU-0001', stock=10),
+            _producto(nombre='Teclado', codigo='TEC-0001', stock=4),
+        ])
+        stock.registrar(*stock.stock_inicial([self.mouse, self.teclado]))
+        agregados.obtener()
+
+    def stocks(self):
+        return dict(Productos.objects.values_list('codigo', 'stock'))
+
+    def test_descuenta_y_registra(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            documento = salidas.registrar_documento_salida(
+                [(self.mouse.id, 3), (self.teclado.id, 4), (self.mouse.id, 2)], motivo='VENTA', usuario=self.usuario,
+            )
+        self.assertEqual(self.stocks(), {'MOU-0001': 5, 'TEC-0001': 0})
+        self.assertEqual(documento.lineas.count(), 3)
+        self.assertEqual(
+            HistorialMovimiento.objects.filter(detalles__contains=f'Documento {documento.id}.').count(), 3,
+        )
+        self.assertEqual(stock.verificar(), [])
+        self.assertEqual(agregados.reconciliar(), {})
+
+    def test_sin_stock_no_registra_nada(self):
+        # Cada línea alcanza por sí sola, pero no la suma de las dos
+        with self.assertRaises(salidas.StockInsuficiente) as contexto:
+            salidas.registrar_documento_salida(
+                [(self.teclado.id, 3), (self.mouse.id, 1), (self.teclado.id, 2)], motivo='VENTA',
+            )
+        self.assertIn('Teclado: stock disponible 4', str(contexto.exception))
+        self.assertEqual(self.stocks(), {'MOU-0001': 10, 'TEC-0001': 4})
+        self.assertFalse(DocumentoSalida.objects.exists())
+        self.assertFalse(SalidaProducto.objects.exists())
+        self.assertFalse(MovimientoStock.objects.filter(motivo='SALIDA').exists())
+
+    def test_salida_simultanea_revierte_el_descuento(self):
+        in_bulk = QuerySet.in_bulk
+
+        def leer_y_vender(queryset, *args, **kwargs):
+            productos = in_bulk(queryset, *args, **kwargs)
+            # Sin bloqueo de filas, otra salida se confirma después de la validación
+            Productos.objects.filter(pk=self.teclado.pk).update(stock=1)
+            return productos
+
+        with mock.patch.object(QuerySet, 'in_bulk', leer_y_vender), self.assertRaises(salidas.StockInsuficiente):
+            salidas.registrar_documento_salida([(self.mouse.id, 2), (self.teclado.id, 4)], motivo='VENTA')
+        # Se deshizo todo, también el descuento del mouse (y aquí la salida simulada,
+        # que corrió en la misma transacción)
+        self.assertEqual(self.stocks(), {'MOU-0001': 10, 'TEC-0001': 4})
+        self.assertFalse(DocumentoSalida.objects.exists())
+
+    def test_vista_muestra_el_faltante(self):
+        self.client.force_login(self.usuario)
+        datos = {
+            'motivo': 'VENTA', 'descripcion': '',
+            'form-TOTAL_FORMS': 2, 'form-INITIAL_FORMS': 0, 'form-MIN_NUM_FORMS': 0, 'form-MAX_NUM_FORMS': 1000,
+            'form-0-codigo': 'MOU-0001', 'form-0-cantidad': 1,
+            'form-1-codigo': 'TEC-0001', 'form-1-cantidad': 5,
+        }
+        respuesta = self.client.post(reverse('registrar_salida_multiple'), datos)
+        self.assertContains(respuesta, 'No hay suficiente stock')
+        self.assertEqual(self.stocks(), {'MOU-0001': 10, 'TEC-0001': 4})
+        self.assertFalse(SalidaProducto.objects.exists())
+
+        datos['form-1-cantidad'] = 4
+        respuesta = self.client.post(reverse('registrar_salida_multiple'), datos)
+        self.assertRedirects(respuesta, reverse('lista_salidas'), fetch_redirect_response=False)
+        self.assertEqual(self.stocks(), {'MOU-0001': 9, 'TEC-0001': 0})
+
+
+@override_settings(AUDITORIA_SINCRONA=True, CACHES=CACHES_PRUEBA, STORAGES=STORAGES_PRUEBA)
+class ProductosLoteTests(TestCase):
+    """Creación múltiple: los códigos no se repiten ni chocan con los registrados."""
+
+    def setUp(self):
+        self.usuario = User.objects.create_user('compras', password='x')
+        self.client.force_login(self.usuario)
+        self.proveedor = Proveedor.objects.create(nombre='Acme')
+        Productos.objects.create(
+            nombre='Monitor', codigo='MON-0001', descripcion='', precio=100, categoria='PERIFERICOS',
+        )
+
+    def datos(self, *codigos):
+        """Formset con un producto por código y un formulario extra sin tocar."""
+        datos = {
+            'guardar_multiple': '1',
+            'form-TOTAL_FORMS': len(codigos) + 1, 'form-INITIAL_FORMS': 0,
+            'form-MIN_NUM_FORMS': 0, 'form-MAX_NUM_FORMS': 1000,
+            f'form-{len(codigos)}-costo': 0, f'form-{len(codigos)}-stock': 0,
+        }
+        for i, codigo in enumerate(codigos):
+            datos.update({
+                f'form-{i}-nombre': f'Producto {codigo}', f'form-{i}-codigo': codigo,
+                f'form-{i}-descripcion': 'Lote', f'form-{i}-costo': 10, f'form-{i}-stock': 3,
+                f'form-{i}-categoria': 'UPS', f'form-{i}-proveedor': self.proveedor.pk,
+            })
+        return datos
+
+    def test_codigos_repetidos_en_el_formulario(self):
+        respuesta = self.client.post(reverse('crear_producto'), self.datos('UPS-0001', 'UPS-0002', 'UPS-0001'))
+        self.assertEqual(
+            respuesta.context['formset'].non_form_errors(), ['Códigos repetidos en el formulario: UPS-0001'],
+        )
+        self.assertEqual(Productos.objects.count(), 1)
+
+    def test_codigos_ya_registrados(self):
+        respuesta = self.client.post(reverse('crear_producto'), self.datos('UPS-0001', 'MON-0001'))
+        self.assertEqual(respuesta.context['formset'].non_form_errors(), ['Códigos ya registrados: MON-0001'])
+        self.assertContains(respuesta, 'Códigos ya registrados: MON-0001')
+        self.assertEqual(Productos.objects.count(), 1)
+
+    def test_crea_el_lote(self):
+        respuesta = self.client.post(reverse('crear_producto'), self.datos('UPS-0001', 'UPS-0002'))
+        self.assertRedirects(respuesta, reverse('lista_productos'), fetch_redirect_response=False)
+        # El formulario extra sin tocar no crea nada
+        creados = Productos.objects.filter(codigo__startswith='UPS-')
+        self.assertEqual(sorted(creados.values_list('codigo', flat=True)), ['UPS-0001', 'UPS-0002'])
+        self.assertEqual({producto.proveedor_id for producto in creados}, {self.proveedor.pk})
+        self.assertEqual(
+            HistorialMovimiento.objects.filter(tipo_movimiento='CREACION', serial_producto__startswith='UPS-').count(), 2,
+        )
+        self.assertEqual(stock.verificar(), [])
+
+    def test_codigo_registrado_al_mismo_tiempo(self):
+        aplicar_precios = precios.aplicar_precios
+
+        def aplicar_y_registrar(productos):
+            aplicar_precios(productos)
+            # Otro usuario crea uno de los códigos después de la validación del formset
+            Productos.objects.create(
+                nombre='Otro', codigo='UPS-0002', descripcion='', precio=10, categoria='UPS',
+            )
+
+        with mock.patch.object(precios, 'aplicar_precios', aplicar_y_registrar):
+            respuesta = self.client.post(reverse('crear_producto'), self.datos('UPS-0001', 'UPS-0002'))
+        self.assertContains(respuesta, 'Otro usuario registró alguno de los códigos al mismo tiempo')
+        self.assertEqual(
+            list(Productos.objects.filter(codigo__startswith='UPS-').values_list('nombre', flat=True)), ['Otro'],
+        )
+        self.assertFalse(MovimientoStock.objects.exists())
+
+
+@override_settings(MARGEN_PRECIO_POR_DEFECTO='30', CACHES=CACHES_PRUEBA, STORAGES=STORAGES_PRUEBA)
+class PreciosTests(TestCase):
+    """Gana la regla más específica, en Python y en el UPDATE de recalcular_precios."""
+
+    def setUp(self):
+        # Sin la regla general que crea la migración 0013
+        ReglaPrecio.objects.all().delete()
+        self.acme, self.otro = Proveedor.objects.bulk_create([Proveedor(nombre='Acme'), Proveedor(nombre='Otro')])
+        self.productos = Productos.objects.bulk_create([
+            # Categoría y proveedor, solo proveedor, solo categoría, general
+            _producto(codigo='UPS-ACME', categoria='UPS', proveedor=self.acme, costo=100, stock=1),
+            _producto(codigo='PER-ACME', proveedor=self.acme, costo=100, stock=2),
+            _producto(codigo='UPS-OTRO', categoria='UPS', proveedor=self.otro, costo=100, stock=3),
+            _producto(codigo='PER-SIN', costo='10.05', stock=4),
+        ])
+
+    def reglas(self):
+        ReglaPrecio.objects.bulk_create([
+            ReglaPrecio(margen=10),
+            ReglaPrecio(categoria='UPS', margen=20),
+            ReglaPrecio(proveedor=self.acme, margen=40),
+            ReglaPrecio(categoria='UPS', proveedor=self.acme, margen=50),
+        ])
+
+    def precios(self):
+        return {codigo: str(precio) for codigo, precio in Productos.objects.values_list('codigo', 'precio')}
+
+    def test_sin_reglas_usa_el_margen_por_defecto(self):
+        precios.aplicar_precios(self.productos)
+        self.assertEqual([str(producto.precio) for producto in self.productos], ['130.00', '130.00', '130.00', '13.07'])
+
+    def test_gana_la_regla_mas_especifica(self):
+        self.reglas()
+        precios.aplicar_precios(self.productos)
+        # El proveedor pesa más que la categoría
+        self.assertEqual(
+            [str(producto.precio) for producto in self.productos], ['150.00', '140.00', '120.00', '11.06'],
+        )
+
+    def test_recalcular_coincide_con_aplicar(self):
+        self.reglas()
+        agregados.obtener()
+        self.assertEqual(precios.recalcular_precios(Productos.objects.filter(proveedor=self.acme)), 2)
+        self.assertEqual(
+            self.precios(), {'UPS-ACME': '150.00', 'PER-ACME': '140.00', 'UPS-OTRO': '10.00', 'PER-SIN': '10.00'},
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(precios.recalcular_precios(), 4)
+        esperados = {producto.codigo: str(producto.precio) for producto in precios.aplicar_precios(self.productos)}
+        self.assertEqual(self.precios(), esperados)
+        self.assertEqual(agregados.reconciliar(), {})
+
+    def test_cambiar_una_regla_recalcula(self):
+        self.reglas()
+        precios.recalcular_precios()
+        regla = ReglaPrecio.objects.get(categoria='UPS', proveedor=None)
+        regla.margen = 25
+        with self.captureOnCommitCallbacks(execute=True):
+            regla.save()
+        self.assertEqual(self.precios()['UPS-OTRO'], '125.00')
+        with self.captureOnCommitCallbacks(execute=True):
+            regla.delete()
+        # Sin regla de la categoría queda la general
+        self.assertEqual(self.precios()['UPS-OTRO'], '110.00')
+        self.assertEqual(self.precios()['UPS-ACME'], '150.00')
+
+
+@override_settings(HISTORIAL_MESES_RECIENTES=2, CACHES=CACHES_PRUEBA, STORAGES=STORAGES_PRUEBA, CACHE_VISTAS_SEGUNDOS=0)
+class ArchivoHistorialTests(TestCase):
+    """Meses archivados y consultas por rango a ambos lados del límite."""
+
+    def setUp(self):
+        self.limite = archivo.limite_archivo()
+        fechas = {
+            'viejo': self.limite - timedelta(days=40),
+            'antes': self.limite - timedelta(hours=1),
+            'despues': self.limite + timedelta(hours=1),
+            'hoy': timezone.now(),
+        }
+        self.ids = {}
+        for detalles, fecha in fechas.items():
+            movimiento = HistorialMovimiento.objects.create(
+                nombre_producto='Mouse', serial_producto='MOU-0001', tipo_movimiento='EDICION',
+                fecha_movimiento=fecha, detalles=detalles,
+            )
+            self.ids[detalles] = movimiento.id
+
+    def ids_en(self, querysets):
+        return sorted(chain.from_iterable(qs.values_list('id', flat=True) for qs in querysets))
+
+    def test_limite_archivo(self):
+        ahora = timezone.make_aware(datetime(2026, 3, 18, 10))
+        self.assertEqual(archivo.limite_archivo(2, ahora), timezone.make_aware(datetime(2026, 1, 1)))
+        self.assertEqual(archivo.limite_archivo(0, ahora), timezone.make_aware(datetime(2026, 3, 1)))
+
+    def test_archiva_los_meses_anteriores_al_limite(self):
+        archivados = []
+        with self.captureOnCommitCallbacks(execute=True):
+            total = archivo.archivar(al_archivar=lambda inicio, movidos: archivados.append(movidos))
+        # Un mes por transacción: el del movimiento viejo y el anterior al límite
+        self.assertEqual((total, archivados), (2, [1, 1]))
+        self.assertEqual(
+            sorted(HistorialMovimiento.objects.values_list('id', flat=True)), [self.ids['despues'], self.ids['hoy']],
+        )
+        antes = HistorialArchivado.objects.get(id=self.ids['antes'])
+        self.assertEqual((antes.detalles, antes.serial_producto), ('antes', 'MOU-0001'))
+        self.assertEqual(antes.fecha_movimiento, self.limite - timedelta(hours=1))
+        # Volver a archivar no mueve nada
+        self.assertEqual(archivo.archivar(), 0)
+
+    def test_rango_a_ambos_lados_del_limite(self):
+        archivo.archivar()
+        dia_limite = timezone.localtime(self.limite).date()
+        self.assertEqual(self.ids_en(archivo.historial_por_rango()), [self.ids['despues'], self.ids['hoy']])
+        self.assertEqual(
+            self.ids_en(archivo.historial_por_rango(dia_limite - timedelta(days=1), dia_limite)),
+            [self.ids['antes'], self.ids['despues']],
+        )
+        self.assertEqual(
+            self.ids_en(archivo.historial_por_rango(hasta=dia_limite - timedelta(days=1))),
+            [self.ids['viejo'], self.ids['antes']],
+        )
+        self.assertEqual(
+            self.ids_en(archivo.historial_por_rango(desde=dia_limite)), [self.ids['despues'], self.ids['hoy']],
+        )
+
+    def test_vista_con_rango_incluye_el_archivo(self):
+        archivo.archivar()
+        self.client.force_login(User.objects.create_user('auditor', password='x'))
+        dia_limite = timezone.localtime(self.limite).date()
+        respuesta = self.client.get(reverse('historial_movimientos'), {
+            'desde': (dia_limite - timedelta(days=1)).isoformat(), 'hasta': dia_limite.isoformat(),
+        })
+        # Del más nuevo al más viejo, mezclando la tabla reciente y el archivo
+        self.assertEqual(
+            [movimiento.detalles for movimiento in respuesta.context['movimientos']], ['despues', 'antes'],
+        )
+
+
+@override_settings(AUDITORIA_SINCRONA=True, CACHES=CACHES_PRUEBA, STORAGES=STORAGES_PRUEBA)
+class ExportacionTests(TestCase):
+    """Contenido de las exportaciones CSV y Excel."""
+
+    ENCABEZADOS_PRODUCTOS = [
+        'Código', 'Nombre', 'Descripción', 'Categoría', 'Costo', 'Precio', 'Stock', 'Proveedor', 'Activo',
+        'Fecha de ingreso',
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user('exportador', password='x')
+        proveedor = Proveedor.objects.create(nombre='Mayorista', direccion='', telefono='')
+        cls.ups, cls.mouse, _ = Productos.objects.bulk_create([
+            _producto(nombre='UPS 800VA, "torre"', codigo='UPS-0001', categoria='UPS', costo=50, precio=65,
+                      stock=3, proveedor=proveedor),
+            _producto(nombre='Mouse óptico', codigo='MOU-0001', costo=5, precio='6.50', stock=8),
+            _producto(nombre='Mouse viejo', codigo='MOU-0002', stock=0, activo=False),
+        ])
+        SalidaProducto(producto=cls.ups, cantidad=1, motivo='GARANTIA', usuario=cls.usuario).save()
+        SalidaProducto(producto=cls.mouse, cantidad=2, motivo='VENTA', descripcion='mostrador').save()
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+
+    def csv(self, nombre, **parametros):
+        respuesta = self.client.get(reverse(nombre), parametros)
+        self.assertEqual(respuesta['Content-Type'], 'text/csv; charset=utf-8')
+        contenido = b''.join(respuesta.streaming_content).decode('utf-8')
+        self.assertTrue(contenido.startswith('\ufeff'))
+        return list(csv.reader(contenido[1:].splitlines()))
+
+    def xlsx(self, nombre, **parametros):
+        respuesta = self.client.get(reverse(nombre), {**parametros, 'formato': 'xlsx'})
+        self.assertIn('.xlsx', respuesta['Content-Disposition'])
+        libro = load_workbook(BytesIO(b''.join(respuesta.streaming_content)), read_only=True)
+        return [list(fila) for fila in libro.active.iter_rows(values_only=True)]
+
+    def test_productos_csv(self):
+        filas = self.csv('exportar_productos', categoria='UPS')
+        self.assertEqual(filas[0], self.ENCABEZADOS_PRODUCTOS)
+        self.assertEqual(filas[1][:9], ['UPS-0001', 'UPS 800VA, "torre"', '', 'UPS', '50.00', '65.00', '2', 'Mayorista', 'Sí'])
+        self.assertEqual(len(filas), 2)
+        # Los mismos filtros que la lista: la búsqueda y los inhabilitados
+        self.assertEqual([f[0] for f in self.csv('exportar_productos', busqueda='mouse')[1:]], ['MOU-0001'])
+        self.assertEqual([f[0] for f in self.csv('exportar_productos', inactivos='1')[1:]], ['MOU-0002'])
+
+    def test_productos_xlsx(self):
+        filas = self.xlsx('exportar_productos')
+        self.assertEqual(filas[0], self.ENCABEZADOS_PRODUCTOS)
+        por_codigo = {fila[0]: fila for fila in filas[1:]}
+        self.assertEqual(sorted(por_codigo), ['MOU-0001', 'UPS-0001'])
+        # Las celdas vacías se leen como None; los importes y el stock, como números
+        self.assertEqual(por_codigo['MOU-0001'][1:9], ['Mouse óptico', None, 'Periféricos', 5, 6.5, 6, None, 'Sí'])
+
+    def test_salidas(self):
+        encabezados = ['Fecha', 'Producto', 'Código', 'Cantidad', 'Motivo', 'Usuario', 'Descripción', 'Documento']
+        # Más recientes primero
+        esperadas = [
+            ['Mouse óptico', 'MOU-0001', '2', 'Venta', 'Sistema', 'mostrador', ''],
+            ['UPS 800VA, "torre"', 'UPS-0001', '1', 'Garantía', 'exportador', '', ''],
+        ]
+        filas = self.csv('exportar_salidas')
+        self.assertEqual(filas[0], encabezados)
+        self.assertEqual([fila[1:] for fila in filas[1:]], esperadas)
+        filas = self.xlsx('exportar_salidas')
+        self.assertEqual(filas[0], encabezados)
+        self.assertEqual([fila[1:] for fila in filas[1:]], [
+            ['Mouse óptico', 'MOU-0001', 2, 'Venta', 'Sistema', 'mostrador', None],
+            ['UPS 800VA, "torre"', 'UPS-0001', 1, 'Garantía', 'exportador', None, None],
+        ])
+
+    def test_historial(self):
+        filas = self.csv('exportar_historial', categoria='UPS')
+        self.assertEqual(filas[0], ['Fecha', 'Tipo', 'Producto', 'Código', 'Usuario', 'Detalles'])
+        self.assertEqual([fila[2:5] for fila in filas[1:]], [['UPS 800VA, "torre"', 'UPS-0001', 'exportador']])
+
+
+@override_settings(AUDITORIA_SINCRONA=False, CACHES=CACHES_PRUEBA, STORAGES=STORAGES_PRUEBA)
+class AuditoriaTests(TestCase):
+    """Eventos del historial que no se pueden escribir tal como se encolaron, y diarios huérfanos."""
+
+    def setUp(self):
+        carpeta = tempfile.TemporaryDirectory()
+        self.addCleanup(carpeta.cleanup)
+        ajuste = override_settings(AUDITORIA_DIARIO=carpeta.name)
+        ajuste.enable()
+        self.addCleanup(ajuste.disable)
+        self.producto = Productos.objects.create(
+            nombre='Producto auditado', codigo='AUD-0001', descripcion='', precio=1, categoria='PERIFERICOS',
+        )
+
+    def evento(self, **campos):
+        return auditoria._a_evento(HistorialMovimiento(
+            producto_id=self.producto.id, nombre_producto='Producto auditado', serial_producto='AUD-0001',
+            tipo_movimiento='EDICION', detalles='prueba', **campos,
+        ))
+
+    def descartados(self):
+        if not os.path.exists(auditoria.ruta_descartados()):
+            return []
+        with open(auditoria.ruta_descartados(), encoding='utf-8') as archivo:
+            return [json.loads(linea) for linea in archivo]
+
+    def test_usuario_eliminado(self):
+        usuario = User.objects.create_user('temporal')
+        evento = self.evento(usuario_id=usuario.id)
+        usuario.delete()
+        self.assertEqual(auditoria._escribir([evento]), 1)
+        movimiento = HistorialMovimiento.objects.get(evento=evento['evento'])
+        self.assertIsNone(movimiento.usuario_id)
+        self.assertEqual(movimiento.producto_id, self.producto.id)
+
+    def test_evento_invalido_se_descarta(self):
+        valido = self.evento()
+        invalido = dict(self.evento(), evento='no-es-un-uuid')
+        with mock.patch.object(auditoria._buffer, 'eventos', [invalido, valido]):
+            self.assertEqual(auditoria.vaciar(), 1)
+            # No vuelve a la cola: los próximos vaciados no lo reintentan
+            self.assertEqual(auditoria._buffer.eventos, [])
+        self.assertTrue(HistorialMovimiento.objects.filter(evento=valido['evento']).exists())
+        self.assertEqual([e['evento'] for e in self.descartados()], ['no-es-un-uuid'])
+
+    def diario(self, pid, eventos):
+        ruta = os.path.join(auditoria.carpeta_diario(), f'auditoria-{pid}-prueba.jsonl')
+        with open(ruta, 'w', encoding='utf-8') as archivo:
+            archivo.writelines(json.dumps(evento) + '\n' for evento in eventos)
+        return ruta
+
+    def test_recupera_diario_sin_dueno_aunque_el_pid_exista(self):
+        # El PID del nombre es de un proceso vivo, pero nadie tiene el diario bloqueado
+        evento = self.evento()
+        ruta = self.diario(os.getppid(), [evento])
+        self.assertEqual(auditoria.recuperar(), 1)
+        self.assertTrue(HistorialMovimiento.objects.filter(evento=evento['evento']).exists())
+        self.assertFalse(os.path.exists(ruta))
+
+    def test_no_toca_el_diario_de_un_proceso_vivo(self):
+        evento = self.evento()
+        ruta = self.diario(12345, [evento])
+        with open(ruta, encoding='utf-8') as dueno:
+            fcntl.flock(dueno, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            self.assertEqual(auditoria.recuperar(), 0)
+        self.assertTrue(os.path.exists(ruta))
+        self.assertFalse(HistorialMovimiento.objects.filter(evento=evento['evento']).exists())
+
+
+@override_settings(IMPORTACION_TIEMPO_LIMITE=3600, CACHES=CACHES_PRUEBA, STORAGES=STORAGES_PRUEBA)
+class ImportacionAbandonadaTests(TestCase):
+    """Una importación cuyo worker murió no queda PROCESANDO para siempre."""
+
+    def importacion(self, estado, inicio, avance):
+        ahora = timezone.now()
+        return ImportacionExcel.objects.create(
+            nombre_archivo='productos.xlsx', estado=estado, filas_procesadas=1000,
+            fecha_inicio=ahora - timedelta(seconds=inicio), fecha_actualizacion=ahora - timedelta(seconds=avance),
+        )
+
+    def test_marca_solo_las_sin_avances(self):
+        abandonada = self.importacion('PROCESANDO', 7200, 7200)
+        # Empezó hace horas pero sigue guardando lotes
+        larga = self.importacion('PROCESANDO', 7200, 60)
+        self.assertIsNone(importacion.reclamar_importacion())
+        abandonada.refresh_from_db()
+        larga.refresh_from_db()
+        self.assertEqual(abandonada.estado, 'ERROR')
+        self.assertIn('1000 filas', abandonada.errores)
+        self.assertIsNotNone(abandonada.fecha_fin)
+        self.assertEqual(larga.estado, 'PROCESANDO')
+
+    def test_worker_no_pisa_la_marca(self):
+        carpeta = tempfile.TemporaryDirectory()
+        self.addCleanup(carpeta.cleanup)
+        with override_settings(MEDIA_ROOT=carpeta.name):
+            registro = ImportacionExcel(nombre_archivo='productos.xlsx')
+            registro.archivo.save('productos.xlsx', ContentFile(
+                _excel_productos([(f'ABA-{i}', f'Producto {i}', '', 10, 1, 'UPS', None) for i in range(3)])
+            ))
+            tomada = importacion.reclamar_importacion()
+            importar_filas = importacion.importar_filas
+
+            def importar_y_abandonar(filas, al_procesar_lote, **opciones):
+                def al_procesar(procesadas, resultado):
+                    # Otro worker la dio por abandonada después del primer lote
+                    ImportacionExcel.objects.filter(id=tomada.id).update(estado='ERROR', errores='abandonada')
+                    al_procesar_lote(procesadas, resultado)
+                return importar_filas(filas, al_procesar_lote=al_procesar, tamano_lote=1, **opciones)
+
+            with mock.patch.object(importacion, 'importar_filas', importar_y_abandonar):
+                tomada = importacion.ejecutar_importacion(tomada)
+        self.assertEqual((tomada.estado, tomada.errores, tomada.filas_procesadas), ('ERROR', 'abandonada', 0))
+        # Deja de procesar después del lote en curso
+        self.assertEqual(list(Productos.objects.filter(codigo__startswith='ABA-').values_list('codigo', flat=True)), ['ABA-0'])
+
+
+@override_settings(AUDITORIA_SINCRONA=True, CACHES=CACHES_PRUEBA, STORAGES=STORAGES_PRUEBA)
+class EstadosImportacionTests(TestCase):
+    """Recorrido de una importación encolada: PENDIENTE, PROCESANDO y COMPLETADA o ERROR."""
+
+    def setUp(self):
+        carpeta = tempfile.TemporaryDirectory()
+        self.addCleanup(carpeta.cleanup)
+        ajuste = override_settings(MEDIA_ROOT=carpeta.name)
+        ajuste.enable()
+        self.addCleanup(ajuste.disable)
+        self.client.force_login(User.objects.create_user('importador', password='x'))
+
+    def subir(self, contenido):
+        archivo = SimpleUploadedFile('productos.xlsx', contenido)
+        respuesta = self.client.post(reverse('importar_excel'), {'archivo_excel': archivo})
+        registro = ImportacionExcel.objects.latest('id')
+        self.assertRedirects(respuesta, reverse('estado_importacion', args=[registro.id]))
+        return registro
+
+    def progreso(self, registro):
+        return self.client.get(reverse('progreso_importacion', args=[registro.id])).json()
+
+    def test_completada(self):
+        registro = self.subir(_excel_productos([(f'EST-{i}', f'Producto {i}', '', 10, 2, 'UPS', None) for i in range(3)]))
+        self.assertEqual(self.progreso(registro)['estado'], 'PENDIENTE')
+
+        tomada = importacion.reclamar_importacion()
+        self.assertEqual((tomada.id, tomada.estado), (registro.id, 'PROCESANDO'))
+        self.assertIsNotNone(tomada.fecha_inicio)
+        # Ya no está pendiente: otro worker no la vuelve a tomar
+        self.assertIsNone(importacion.reclamar_importacion())
+
+        terminada = importacion.ejecutar_importacion(tomada)
+        self.assertEqual(terminada.estado, 'COMPLETADA')
+        self.assertEqual((terminada.filas_totales, terminada.filas_procesadas, terminada.importados), (3, 3, 3))
+        self.assertIsNotNone(terminada.fecha_fin)
+        self.assertFalse(terminada.archivo)
+        self.assertEqual(self.progreso(registro)['estado'], 'COMPLETADA')
+        self.assertEqual(Productos.objects.filter(codigo__startswith='EST-').count(), 3)
+        # Terminada tampoco se vuelve a tomar
+        self.assertIsNone(importacion.reclamar_importacion())
+
+    def test_archivo_invalido(self):
+        registro = self.subir(b'no es un Excel')
+        terminada = importacion.ejecutar_importacion(importacion.reclamar_importacion())
+        self.assertEqual(terminada.id, registro.id)
+        self.assertEqual(terminada.estado, 'ERROR')
+        self.assertIn('Error al procesar el archivo Excel', terminada.errores)
+        self.assertIsNotNone(terminada.fecha_fin)
+        progreso = self.progreso(registro)
+        self.assertEqual(progreso['estado'], 'ERROR')
+        self.assertEqual(len(progreso['errores']), 1)
+        self.assertIsNone(importacion.reclamar_importacion())
+
+    def test_toma_la_mas_antigua(self):
+        primera = self.subir(_excel_productos([]))
+        segunda = self.subir(_excel_productos([]))
+        self.assertEqual(importacion.reclamar_importacion().id, primera.id)
+        self.assertEqual(importacion.reclamar_importacion().id, segunda.id)
+
+
+@override_settings(CACHES=CACHES_PRUEBA, STORAGES=STORAGES_PRUEBA, METRICAS_VIGENCIA=1, METRICAS_TOKEN='secreto')
+class MetricasTests(TestCase):
+    """Métricas sumadas entre procesos y acceso al endpoint."""
+
+    def setUp(self):
+        caches['default'].clear()
+        metricas.reiniciar()
+
+    def proceso(self, conexiones):
+        # Otro worker, con su propio registro
+        registro = metricas._Registro()
+        registro.sumar('bd_pool_conexiones_abiertas', (('alias', 'default'),), conexiones)
+        registro.enviar()
+        return registro
+
+    def abiertas(self):
+        return metricas.fotos().get(('bd_pool_conexiones_abiertas', (('alias', 'default'),)), 0)
+
+    def test_procesos_en_ranuras_distintas(self):
+        primero, segundo = self.proceso(3), self.proceso(4)
+        self.assertNotEqual(primero.ranura, segundo.ranura)
+        self.assertEqual(self.abiertas(), 7)
+        segundo.retirar()
+        self.assertEqual(self.abiertas(), 3)
+
+    def test_proceso_muerto_vence(self):
+        self.proceso(3)
+        self.assertEqual(self.abiertas(), 3)
+        # Sin volver a enviar, como un worker que murió
+        time.sleep(1.1)
+        self.assertEqual(self.abiertas(), 0)
+
+    def test_prometheus_por_proceso(self):
+        primero, segundo = self.proceso(3), self.proceso(4)
+        texto = metricas.texto_prometheus()
+        for registro, conexiones in ((primero, 3), (segundo, 4)):
+            self.assertIn(
+                f'inventario_bd_pool_conexiones_abiertas{{alias="default",proceso="{registro.id}"}} {conexiones}\n',
+                texto,
+            )
+        # Al irse un proceso desaparecen sus series; las de los demás no cambian
+        segundo.retirar()
+        texto = metricas.texto_prometheus()
+        self.assertIn(f'proceso="{primero.id}"}} 3\n', texto)
+        self.assertNotIn(segundo.id, texto)
+
+    def test_repetidas_por_sql_sin_parametros(self):
+        medicion = metricas.Medicion(None)
+        for params in ((1,), (2,), (1,)):
+            medicion(lambda *args: None, 'SELECT * FROM mi_proyecto_productos WHERE id = %s', params, False, {})
+        medicion(lambda *args: None, 'SELECT 1', (), False, {})
+        self.assertEqual(medicion.repetidas, 2)
+        self.assertEqual(medicion.mas_repetida(), (3, 'SELECT * FROM mi_proyecto_productos WHERE id = %s'))
+
+    def test_token(self):
+        url = reverse('metricas')
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer secreto').status_code, 200)
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer otro').status_code, 403)
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer contraseña').status_code, 403)
+
+
+@override_settings(CACHES=CACHES_PRUEBA, STORAGES=STORAGES_PRUEBA)
+class ImportacionTests(TestCase):
+    """Importación por lotes del Excel de productos."""
+
+    def setUp(self):
+        self.producto = Productos.objects.create(
+            nombre='Monitor', codigo='MON-0001', descripcion='', precio=1, stock=10, categoria='PERIFERICOS',
+        )
+        stock.registrar(*stock.stock_inicial([self.producto]))
+
+    def fila(self, codigo, nombre='Producto', stock=5, costo=10):
+        return (codigo, nombre, '', costo, stock, 'PERIFERICOS', None)
+
+    def test_suma_stock_sin_pisar_salidas(self):
+        aplicar_precios = importacion.aplicar_precios
+
+        def vender_y_aplicar(productos):
+            # Una salida se confirma después de que la importación leyó el producto
+            SalidaProducto(producto=Productos.objects.get(pk=self.producto.pk), cantidad=3, motivo='VENTA').save()
+            aplicar_precios(productos)
+
+        with mock.patch.object(importacion, 'aplicar_precios', vender_y_aplicar):
+            resultado = importacion.importar_filas([self.fila('MON-0001', 'Monitor 24'), self.fila('MON-0001')])
+        self.assertEqual(resultado['actualizados'], 2)
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.nombre, 'Producto')
+        self.assertEqual(self.producto.stock, 17)
+        self.assertEqual(stock.verificar(), [])
+
+    def test_fila_invalida_no_arrastra_al_lote(self):
+        resultado = importacion.importar_filas([
+            self.fila('NUE-0001'), self.fila('NUE-0002', nombre='x' * 101), self.fila('NUE-0003', costo=10 ** 9),
+        ])
+        self.assertEqual(resultado['importados'], 1)
+        self.assertEqual([e.split(':')[0] for e in resultado['errores']], ['Fila 3', 'Fila 4'])
+        self.assertTrue(Productos.objects.filter(codigo='NUE-0001').exists())
+
+    def test_error_de_la_base_se_reintenta_por_fila(self):
+        aplicar_precios = importacion.aplicar_precios
+
+        def rechazar(productos):
+            if any(p.codigo == 'MAL-0001' for p in productos):
+                raise IntegrityError('fila rechazada')
+            aplicar_precios(productos)
+
+        with mock.patch.object(importacion, 'aplicar_precios', rechazar):
+            resultado = importacion.importar_filas([self.fila('NUE-0001'), self.fila('MAL-0001'), self.fila('MON-0001')])
+        self.assertEqual((resultado['importados'], resultado['actualizados']), (1, 1))
+        self.assertEqual(resultado['errores'], ['Fila 3: Error guardando - fila rechazada'])
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.stock, 15)
+
+
+@override_settings(AUDITORIA_SINCRONA=True, CACHES=CACHES_PRUEBA, STORAGES=STORAGES_PRUEBA)
+class AgregadosTests(TestCase):
+    """Contadores del inventario mantenidos de forma incremental."""
+
+    def setUp(self):
+        self.producto = Productos.objects.create(
+            nombre='Router', codigo='ROU-0001', descripcion='', precio=2, stock=5, categoria='PERIFERICOS',
+        )
+        self.assertEqual(agregados.obtener()['stock_bajo'], 0)
+
+    def test_salida_actualiza_contadores(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            SalidaProducto(producto=self.producto, cantidad=3, motivo='VENTA').save()
+        resumen = agregados.obtener()
+        self.assertEqual(resumen['stock_bajo'], 1)
+        self.assertEqual(resumen['valor_stock'], 4)
+        self.assertEqual(agregados.reconciliar(), {})
+
+    def test_incrementos_se_suman(self):
+        # Dos procesos aplican sus cambios sobre el mismo contador
+        agregados._aplicar({agregados.CLAVE_VALOR: 100})
+        agregados._aplicar({agregados.CLAVE_VALOR: 50, agregados.CLAVE_STOCK_BAJO: 1})
+        self.assertEqual(agregados.obtener()['valor_stock'], 10 + Decimal('1.5'))
+        self.assertEqual(agregados.reconciliar(), {
+            agregados.CLAVE_VALOR: (1150, 1000), agregados.CLAVE_STOCK_BAJO: (1, 0),
+        })
+
+    def test_contador_faltante_se_recalcula(self):
+        AgregadoInventario.objects.filter(clave=agregados.CLAVE_STOCK_BAJO).delete()
+        agregados._aplicar({agregados.CLAVE_STOCK_BAJO: 1, agregados.CLAVE_VALOR: 100})
+        self.assertEqual(AgregadoInventario.objects.count(), len(agregados.CLAVES))
+        self.assertEqual(agregados.obtener()['stock_bajo'], 0)
+        self.assertEqual(agregados.obtener()['valor_stock'], 10)
+
+
+@override_settings(CACHES=CACHES_PRUEBA, STORAGES=STORAGES_PRUEBA, CACHE_VISTAS_SEGUNDOS=0)
+class PaginacionCursorTests(TestCase):
+    """Paginación por (fecha, id) del historial y las salidas."""
+
+    POR_PAGINA = 10
+
+    @classmethod
+    def setUpTestData(cls):
+        # 25 movimientos de a tres por instante: los cortes de página caen dentro de los empates
+        inicio = timezone.now() - timedelta(days=1)
+        HistorialMovimiento.objects.bulk_create([
+            HistorialMovimiento(
+                nombre_producto=f'Producto {i}', tipo_movimiento='EDICION',
+                fecha_movimiento=inicio + timedelta(minutes=i // 3),
+            )
+            for i in range(25)
+        ])
+        cls.orden = list(
+            HistorialMovimiento.objects.order_by('-fecha_movimiento', '-id').values_list('id', flat=True)
+        )
+
+    def pagina(self, cursor=None):
+        return paginar_por_cursor(HistorialMovimiento.objects.all(), cursor, self.POR_PAGINA, 'fecha_movimiento')
+
+    def ids(self, pagina):
+        return [m.id for m in pagina]
+
+    def test_recorrido_completo(self):
+        primera = self.pagina()
+        self.assertEqual(self.ids(primera), self.orden[:10])
+        self.assertFalse(primera.has_previous())
+
+        segunda = self.pagina(primera.next_cursor)
+        self.assertEqual(self.ids(segunda), self.orden[10:20])
+        self.assertTrue(segunda.has_previous())
+
+        ultima = self.pagina(segunda.next_cursor)
+        self.assertEqual(self.ids(ultima), self.orden[20:])
+        self.assertFalse(ultima.has_next())
+
+        # Hacia atrás se vuelve exactamente a las mismas páginas
+        self.assertEqual(self.ids(self.pagina(ultima.previous_cursor)), self.orden[10:20])
+        anterior = self.pagina(segunda.previous_cursor)
+        self.assertEqual(self.ids(anterior), self.orden[:10])
+        self.assertFalse(anterior.has_previous())
+        self.assertTrue(anterior.has_next())
+
+    def test_cursores_invalidos(self):
+        for cursor in (
+            'no-es-base64!', _codificar('ant', None, 5), _codificar('ant', 5, 5),
+            _codificar('sig', 'no-es-fecha', 5), _codificar('otra', '2024-01-01T00:00:00Z', 5),
+            _codificar('sig', '2024-01-01T00:00:00Z', 'x'),
+        ):
+            with self.subTest(cursor=cursor):
+                pagina = self.pagina(cursor)
+                self.assertEqual(self.ids(pagina), self.orden[:10])
+                self.assertFalse(pagina.has_previous())
+
+    def test_vistas_con_cursor_nulo(self):
+        self.client.force_login(User.objects.create_user('paginador', password='x'))
+        cursor = _codificar('ant', None, 5)
+        for nombre in ('historial_movimientos', 'lista_salidas'):
+            with self.subTest(vista=nombre):
+                self.assertEqual(self.client.get(reverse(nombre), {'cursor': cursor}).status_code, 200)
+
+
+@override_settings(CACHES=CACHES_PRUEBA, STORAGES=STORAGES_PRUEBA, COMPROBANTES_PROCESOS=2)
+class ComprobantesLoteTests(TestCase):
+    """Comprobantes de un rango de salidas, dibujados en el pool de procesos."""
+
+    SALIDAS = comprobantes.MIN_LOTE_PROCESOS + 5
+
+    @classmethod
+    def setUpTestData(cls):
+        producto = Productos.objects.create(
+            nombre='Impresora', codigo='IMP-0001', descripcion='', precio=1, stock=0, categoria='PERIFERICOS',
+        )
+        SalidaProducto.objects.bulk_create(
+            [SalidaProducto(producto=producto, cantidad=1, motivo='VENTA') for _ in range(cls.SALIDAS)]
+        )
+
+    def setUp(self):
+        carpeta = tempfile.TemporaryDirectory()
+        self.addCleanup(carpeta.cleanup)
+        ajuste = override_settings(MEDIA_ROOT=carpeta.name)
+        ajuste.enable()
+        self.addCleanup(ajuste.disable)
+        self.addCleanup(lambda: comprobantes._pool and comprobantes._descartar_pool(comprobantes._pool))
+        self.client.force_login(User.objects.create_user('despacho', password='x'))
+
+    def descargar(self, formato):
+        hoy = timezone.localdate().isoformat()
+        respuesta = self.client.get(reverse('comprobantes_salidas'), {'desde': hoy, 'hasta': hoy, 'formato': formato})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertIsNotNone(comprobantes._pool)
+        return b''.join(respuesta.streaming_content)
+
+    def test_pdf_unico(self):
+        contenido = self.descargar('pdf')
+        self.assertTrue(contenido.startswith(b'%PDF'))
+        self.assertEqual(len(re.findall(rb'/Type /Page\b(?!s)', contenido)), self.SALIDAS)
+
+    def test_zip(self):
+        with zipfile.ZipFile(BytesIO(self.descargar('zip'))) as archivo_zip:
+            self.assertEqual(len(archivo_zip.namelist()), self.SALIDAS)
+
+
+
+@override_settings(CACHES=CACHES_PRUEBA, STORAGES=STORAGES_PRUEBA)
+class SaldosStockTests(TestCase):
+    """Saldos del libro de stock con movimientos confirmados después del corte."""
+
+    def test_movimiento_confirmado_despues_del_corte(self):
+        producto = Productos.objects.create(
+            nombre='Monitor', codigo='MON-0001', descripcion='', precio=1, stock=10, categoria='PERIFERICOS',
+        )
+        primer_corte = timezone.now() - timedelta(days=1)
+        segundo_corte = timezone.now()
+        stock.registrar(MovimientoStock(
+            producto=producto, cantidad=10, motivo='INICIAL', fecha=primer_corte - timedelta(hours=2),
+        ))
+        self.assertEqual(stock.tomar_saldos(primer_corte), 1)
+
+        # Empezó antes del corte pero se confirmó después de tomarlo
+        stock.registrar(MovimientoStock(
+            producto=producto, cantidad=5, motivo='AJUSTE', fecha=primer_corte - timedelta(hours=1),
+        ))
+        self.assertEqual(stock.stock_a_fecha(producto.id, primer_corte + timedelta(hours=1)), 15)
+
+        self.assertEqual(stock.tomar_saldos(segundo_corte), 1)
+        self.assertEqual(SaldoStock.objects.get(producto=producto, fecha=segundo_corte).stock, 15)
+        self.assertEqual(stock.stock_a_fecha(producto.id, segundo_corte), 15)
+        # Un tercer corte no vuelve a sumarlo
+        self.assertEqual(stock.tomar_saldos(segundo_corte + timedelta(days=1)), 0)
+        self.assertEqual(stock.stock_a_fecha(producto.id, segundo_corte + timedelta(days=1)), 15)
+
+
+@override_settings(CACHES=CACHES_PRUEBA, STORAGES=STORAGES_PRUEBA)
+class ResumenesTests(TestCase):
+    """Resúmenes del tablero escritos por actualizaciones que se pisan."""
+
+    def test_actualizaciones_en_paralelo_no_duplican(self):
+        proveedor = Proveedor.objects.create(nombre='Mayorista')
+        con_proveedor, sin_proveedor = Productos.objects.bulk_create([
+            _producto(nombre='Teclado', codigo='TEC-0001', stock=0, proveedor=proveedor),
+            _producto(nombre='Parlante', codigo='PAR-0001', stock=0),
+        ])
+        SalidaProducto.objects.bulk_create([
+            SalidaProducto(producto=con_proveedor, cantidad=2, motivo='VENTA'),
+            SalidaProducto(producto=sin_proveedor, cantidad=3, motivo='VENTA'),
+        ])
+        resumenes.actualizar_resumenes(completo=True)
+        # La otra actualización escribió después de nuestro borrado
+        with mock.patch.object(resumenes, '_borrar_desde'):
+            resumenes.actualizar_resumenes(completo=True)
+
+        self.assertEqual(ResumenSalidasDia.objects.count(), 1)
+        self.assertEqual(ResumenSalidasDia.objects.get().unidades, 5)
+        self.assertEqual(ResumenProductoMes.objects.aggregate(total=Sum('unidades'))['total'], 5)
+        self.assertEqual(
+            dict(ResumenProveedorMes.objects.values_list('proveedor', 'unidades')), {proveedor.id: 2, None: 3},
+        )
+
+
+def _recargar_rutas():
+    # urls.py elige entre views y vistas_asincronas al importarse; el include()
+    # de la raíz guarda sus rutas, así que también se recarga
+    importlib.reload(urls)
+    importlib.reload(importlib.import_module(settings.ROOT_URLCONF))
+    clear_url_caches()
+
+
+@override_settings(
+    VISTAS_ASINCRONAS=True, PRESUPUESTO_CONSULTAS_ESTRICTO=True, CACHE_VISTAS_SEGUNDOS=0,
+    CACHES=CACHES_PRUEBA, STORAGES=STORAGES_PRUEBA,
+)
+class VistasAsincronasTests(TestCase):
+    """Rutas de lectura con ``VISTAS_ASINCRONAS``, atendidas por el manejador ASGI."""
+
+    @classmethod
+    def setUpClass(cls):
+        # Se registra antes que la limpieza de los ajustes: recarga las rutas ya sin ellos
+        cls.addClassCleanup(_recargar_rutas)
+        super().setUpClass()
+        _recargar_rutas()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user('asincrono', password='x')
+        cls.producto = Productos.objects.create(
+            nombre='UPS 1500VA', codigo='UPS-0001', descripcion='', precio=1, stock=10, categoria='UPS',
+        )
+        Productos.objects.bulk_create([_producto(nombre=f'Cable {i}', codigo=f'CAB-{i:04d}', stock=1) for i in range(12)])
+        cls.salida = SalidaProducto.objects.create(producto=cls.producto, cantidad=1, motivo='VENTA')
+        HistorialMovimiento.objects.create(
+            producto=cls.producto, nombre_producto=cls.producto.nombre, serial_producto=cls.producto.codigo,
+            tipo_movimiento='EDICION', detalles='prueba async',
+        )
+
+    def setUp(self):
+        self.async_client.force_login(self.usuario)
+
+    async def contenido(self, respuesta):
+        return b''.join([parte async for parte in respuesta.streaming_content])
+
+    def test_rutas_asincronas(self):
+        for nombre, argumentos in [
+            ('lista_productos', []), ('historial_movimientos', []), ('lista_salidas', []),
+            ('generar_pdf_salida', [self.salida.id]),
+        ]:
+            with self.subTest(vista=nombre):
+                self.assertTrue(iscoroutinefunction(resolve(reverse(nombre, args=argumentos)).func))
+
+    async def test_lista_productos(self):
+        respuesta = await self.async_client.get(reverse('lista_productos'), {'categoria': 'UPS'})
+        self.assertContains(respuesta, 'UPS-0001')
+        self.assertNotContains(respuesta, 'CAB-0000')
+        respuesta = await self.async_client.get(reverse('lista_productos'), {'page': 'ultima'})
+        self.assertEqual(respuesta.context['productos'].number, 1)
+        self.assertEqual(respuesta.context['low_stock_count'], 12)
+
+    async def test_historial_movimientos(self):
+        respuesta = await self.async_client.get(reverse('historial_movimientos'), {'categoria': 'UPS'})
+        self.assertContains(respuesta, 'prueba async')
+        respuesta = await self.async_client.get(reverse('historial_movimientos'), {'categoria': 'PERIFERICOS'})
+        self.assertNotContains(respuesta, 'prueba async')
+
+    async def test_lista_salidas(self):
+        respuesta = await self.async_client.get(reverse('lista_salidas'))
+        self.assertContains(respuesta, 'UPS 1500VA')
+
+    async def test_generar_pdf_salida(self):
+        with tempfile.TemporaryDirectory() as carpeta, override_settings(MEDIA_ROOT=carpeta):
+            try:
+                respuesta = await self.async_client.get(reverse('generar_pdf_salida', args=[self.salida.id]))
+                self.assertEqual(respuesta.status_code, 200)
+                self.assertTrue((await self.contenido(respuesta)).startswith(b'%PDF'))
+            finally:
+                if comprobantes._pool:
+                    comprobantes._descartar_pool(comprobantes._pool)
+        respuesta = await self.async_client.get(reverse('generar_pdf_salida', args=[self.salida.id + 1]))
+        self.assertEqual(respuesta.status_code, 404)
+
+    async def test_streaming_sincrono_de_a_bloques(self):
+        # La exportación es una vista síncrona: el middleware lee su CSV desde el hilo de la petición
+        with mock.patch.object(asincrono, 'PARTES_POR_BLOQUE', 2):
+            respuesta = await self.async_client.get(reverse('exportar_productos'))
+            self.assertTrue(respuesta.is_async)
+            contenido = (await self.contenido(respuesta)).decode('utf-8-sig')
+        self.assertIn('UPS-0001', contenido)
+        self.assertEqual(len(re.findall(r'CAB-\d{4}', contenido)), 12)
+
+
+@override_settings(CACHES=CACHES_PRUEBA, STORAGES=STORAGES_PRUEBA)
+class BusquedaProductosTests(TestCase):
+    """Búsqueda de texto completo con el motor de la base de las pruebas."""
+
+    def buscar(self, texto):
+        return list(busqueda.buscar_productos(Productos.objects.all(), texto).values_list('codigo', flat=True))
+
+    def test_encuentra_productos_creados_y_editados(self):
+        # Con FTS5, si una migración reconstruye la tabla sin sus triggers, el índice deja de seguirla
+        producto = Productos.objects.create(
+            nombre='Router inalámbrico', codigo='ROU-0001', descripcion='', precio=1, categoria='PERIFERICOS',
+        )
+        self.assertEqual(self.buscar('router'), ['ROU-0001'])
+        producto.nombre = 'Access point'
+        producto.save()
+        self.assertEqual(self.buscar('access'), ['ROU-0001'])
+        self.assertEqual(self.buscar('router'), [])
+
+    def test_coincidencia_solo_por_proveedor(self):
+        proveedor = Proveedor.objects.create(nombre='Tecnored')
+        Productos.objects.bulk_create([
+            _producto(nombre='Cable Tecnored', codigo='CAB-0001'),
+            _producto(nombre='Switch gestionable', codigo='SWI-0001', proveedor=proveedor),
+        ])
+        self.assertCountEqual(self.buscar('tecnored'), ['CAB-0001', 'SWI-0001'])
+        if busqueda.motor_busqueda() == 'postgres':
+            # El proveedor cuenta para el orden, con menos peso que el producto
+            rangos = dict(
+                busqueda.buscar_productos(Productos.objects.all(), 'tecnored').values_list('codigo', 'rango')
+            )
+            self.assertGreater(rangos['SWI-0001'], 0)
+            self.assertGreater(rangos['CAB-0001'], rangos['SWI-0001'])
+
+
+@override_settings(CACHES=CACHES_PRUEBA, STORAGES=STORAGES_PRUEBA)
+class BenchmarkSuiteTests(TestCase):
+    """La suite de rendimiento recorre todas las rutas con volúmenes mínimos y no deja datos."""
+
+    VOLUMENES = dict(productos=20, proveedores=3, salidas=15, movimientos=30, dias=3, filas_excel=5, repeticiones=1)
+
+    def ejecutar(self, **opciones):
+        salida = StringIO()
+        call_command('benchmark_suite', stdout=salida, **self.VOLUMENES, **opciones)
+        return salida.getvalue()
+
+    def test_informe_de_todas_las_rutas(self):
+        with tempfile.TemporaryDirectory() as directorio:
+            ruta = os.path.join(directorio, 'informe.json')
+            self.ejecutar(informe=ruta)
+            with open(ruta, encoding='utf-8') as archivo:
+                informe = json.load(archivo)
+
+        resultados = informe['resultados']
+        nombres = {patron.name for patron in urls.urlpatterns if patron.name} - benchmark_suite.OMITIDAS
+        self.assertEqual(nombres - set(resultados), set())
+        self.assertIn('importación de 5 filas (worker)', resultados)
+        errores = {nombre: r['estado'] for nombre, r in resultados.items() if r['estado'] >= 400}
+        self.assertEqual(errores, {})
+        self.assertEqual(informe['volumenes']['productos'], 20)
+        # Todo lo sembrado se deshace
+        self.assertFalse(Productos.objects.filter(codigo__startswith=f'{benchmark_suite.PREFIJO}-').exists())
+        self.assertFalse(ImportacionExcel.objects.exists())
+
+    def test_comparar_marca_las_regresiones(self):
+        anterior = {
+            'volumenes': {}, 'commit': 'abc1234',
+            'resultados': {'lista_productos': {'mediana_ms': 0.001, 'consultas': 0}},
+        }
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as archivo:
+            json.dump(anterior, archivo)
+        self.addCleanup(os.remove, archivo.name)
+
+        with self.assertRaisesMessage(CommandError, '1 escenarios empeoraron'):
+            self.ejecutar(solo=['lista_productos'], comparar=archivo.name, fallar=True)
+        salida = self.ejecutar(solo=['lista_productos'], comparar=archivo.name)
+        self.assertIn('volúmenes distintos', salida)
+        self.assertIn('lista_productos (búsqueda)', salida)
+
+
+@override_settings(CACHES=CACHES_PRUEBA, STORAGES=STORAGES_PRUEBA)
+class DatosPruebaTests(TestCase):
+    """Las salidas sembradas descuentan stock y quedan en el libro, como las registradas en la aplicación."""
+
+    def comprobar_libro(self, prefijo):
+        productos = Productos.objects.filter(codigo__startswith=f'{prefijo}-')
+        salidas = SalidaProducto.objects.filter(producto__in=productos)
+        self.assertEqual(stock.verificar(), [])
+        self.assertFalse(productos.filter(stock__lt=0).exists())
+        self.assertEqual(
+            sorted(MovimientoStock.objects.filter(motivo='SALIDA').values_list('origen', flat=True)),
+            sorted(f'salida:{salida_id}' for salida_id in salidas.values_list('id', flat=True)),
+        )
+        return productos, salidas
+
+    def test_sembrar_descuenta_las_salidas(self):
+        sembrar(productos=40, proveedores=2, salidas=300, movimientos=0, dias=10, prefijo='SEM')
+        productos, salidas = self.comprobar_libro('SEM')
+        self.assertEqual(salidas.count(), 300)
+        iniciales = MovimientoStock.objects.filter(motivo='INICIAL').aggregate(total=Sum('cantidad'))['total']
+        vendidas = salidas.aggregate(total=Sum('cantidad'))['total']
+        self.assertEqual(productos.aggregate(total=Sum('stock'))['total'], iniciales - vendidas)
+
+    def test_sembrar_sin_stock_suficiente(self):
+        sembrar(productos=3, proveedores=1, salidas=500, movimientos=0, dias=10, prefijo='SEM')
+        productos, salidas = self.comprobar_libro('SEM')
+        # Se agota todo el stock antes de llegar a las salidas pedidas
+        self.assertLess(salidas.count(), 500)
+        self.assertEqual(set(productos.values_list('stock', flat=True)), {0})
+
+    def test_sembrar_inventario(self):
+        escritas = sembrar_inventario(
+            productos=30, proveedores=3, salidas=200, movimientos=10, dias=5, usuarios=2, prefijo='INVT',
+        )
+        productos, salidas = self.comprobar_libro('INVT')
+        self.assertEqual(salidas.count(), 200)
+        self.assertEqual(escritas['libro de stock'], MovimientoStock.objects.count())
+
+
+class _ConexionFalsa:
+    """Lo que el pool usa de una conexión de psycopg2, sobre un par de sockets."""
+
+    def __init__(self, estado=TRANSACTION_STATUS_IDLE):
+        self.socket, self.servidor = socket.socketpair()
+        self.closed = 0
+        self.info = SimpleNamespace(transaction_status=estado)
+        self.consultas = []
+        self.rollbacks = 0
+        self.falla = False
+
+    def fileno(self):
+        return self.socket.fileno()
+
+    def cursor(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def execute(self, sql):
+        if self.falla:
+            raise pool_base.base.Database.OperationalError('server closed the connection unexpectedly')
+        self.consultas.append(sql)
+
+    def rollback(self):
+        if self.falla:
+            raise pool_base.base.Database.OperationalError('server closed the connection unexpectedly')
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = 1
+        self.socket.close()
+        self.servidor.close()
+
+
+class PoolConexionesTests(SimpleTestCase):
+    """Pool del backend pool_bd: verificación de salud y vida máxima, con conexiones falsas."""
+
+    def setUp(self):
+        self.conexiones = []
+        self.cerradas = []
+        self.probadas = []
+
+    def conectar(self):
+        conexion = _ConexionFalsa()
+        self.addCleanup(conexion.close)
+        self.conexiones.append(conexion)
+        return conexion
+
+    def es_usable(self, conexion, consultar):
+        self.probadas.append(consultar)
+        return pool_base._es_usable(conexion, consultar)
+
+    def cerrar(self, conexion):
+        self.cerradas.append(conexion)
+        conexion.close()
+
+    def obtener(self, pool):
+        return pool.obtener(self.conectar, self.es_usable, self.cerrar)
+
+    def test_reutiliza_la_conexion_devuelta(self):
+        pool = Pool(maximo=2, espera=0, verificar=3600, vida=3600)
+        conexion = self.obtener(pool)
+        pool.devolver(conexion, True)
+        self.assertIs(self.obtener(pool), conexion)
+        # Recién devuelta: se revisa el socket sin consultar
+        self.assertEqual(self.probadas, [False])
+        self.assertEqual(conexion.consultas, [])
+        self.assertEqual(pool.estadisticas()['conexiones_abiertas'], 1)
+
+    def test_consulta_despues_de_un_error(self):
+        pool = Pool(maximo=2, espera=0, verificar=3600, vida=3600)
+        conexion = self.obtener(pool)
+        pool.devolver(conexion, True, verificar=True)
+        self.assertIs(self.obtener(pool), conexion)
+        self.assertEqual(conexion.consultas, ['SELECT 1'])
+
+    def test_conexion_cortada_se_reemplaza(self):
+        pool = Pool(maximo=1, espera=0, verificar=3600, vida=3600)
+        conexion = self.obtener(pool)
+        pool.devolver(conexion, True)
+        # El servidor la terminó mientras estaba libre (pg_terminate_backend)
+        conexion.servidor.sendall(b'E')
+        nueva = self.obtener(pool)
+        self.assertIsNot(nueva, conexion)
+        self.assertEqual(self.cerradas, [conexion])
+        estadisticas = pool.estadisticas()
+        self.assertEqual((estadisticas['errores_salud'], estadisticas['conexiones_abiertas']), (1, 1))
+
+    def test_vida_maxima(self):
+        pool = Pool(maximo=1, espera=0, verificar=0, vida=0)
+        conexion = self.obtener(pool)
+        pool.devolver(conexion, True)
+        self.assertIsNot(self.obtener(pool), conexion)
+        # Se recicla sin probarla
+        self.assertEqual(self.probadas, [])
+        self.assertEqual(self.cerradas, [conexion])
+        self.assertEqual(pool.estadisticas()['recicladas_total'], 1)
+
+    def test_agotado(self):
+        pool = Pool(maximo=1, espera=0, verificar=3600, vida=3600)
+        conexion = self.obtener(pool)
+        with self.assertRaises(PoolAgotado):
+            self.obtener(pool)
+        # Una conexión que no pudo limpiarse libera su lugar
+        conexion.close()
+        pool.devolver(conexion, False)
+        self.assertIsNot(self.obtener(pool), conexion)
+        self.assertEqual(pool.estadisticas()['errores_agotado'], 1)
+
+    def test_es_usable(self):
+        conexion = self.conectar()
+        self.assertTrue(pool_base._es_usable(conexion, True))
+        conexion.falla = True
+        self.assertTrue(pool_base._es_usable(conexion, False))
+        self.assertFalse(pool_base._es_usable(conexion, True))
+        conexion.close()
+        self.assertFalse(pool_base._es_usable(conexion, False))
+
+    def test_limpiar(self):
+        en_transaccion = self.conectar()
+        en_transaccion.info.transaction_status = TRANSACTION_STATUS_INTRANS
+        self.assertTrue(pool_base._limpiar(en_transaccion))
+        self.assertEqual(en_transaccion.rollbacks, 1)
+
+        cortada = self.conectar()
+        cortada.info.transaction_status = TRANSACTION_STATUS_UNKNOWN
+        self.assertFalse(pool_base._limpiar(cortada))
+        self.assertTrue(cortada.closed)
+
+        sin_rollback = self.conectar()
+        sin_rollback.info.transaction_status = TRANSACTION_STATUS_INERROR
+        sin_rollback.falla = True
+        self.assertFalse(pool_base._limpiar(sin_rollback))
+        self.assertTrue(sin_rollback.closed)
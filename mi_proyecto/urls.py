@@ -1,30 +1,48 @@
+from django.conf import settings
 from django.urls import path
 from django.contrib.auth import views as auth_views
-from . import views
+from . import views, vistas_asincronas
+
+# Listados y PDF de salidas: versiones async bajo ASGI (ver settings.VISTAS_ASINCRONAS)
+lectura = vistas_asincronas if settings.VISTAS_ASINCRONAS else views
 
 urlpatterns = [
     path('', auth_views.LoginView.as_view(template_name='registration/login.html'), name='login'),
-    path('inicio/', views.lista_productos, name='lista_productos'),
-    path('productos/', views.lista_productos, name='lista_productos'),
+    path('inicio/', lectura.lista_productos, name='lista_productos'),
+    path('productos/', lectura.lista_productos, name='lista_productos'),
     path('productos/crear/', views.crear_producto, name='crear_producto'),
     path('productos/editar/<int:id>/', views.editar_producto, name='editar_producto'),
     path('productos/eliminar/<int:id>/', views.eliminar_producto, name='eliminar_producto'),
     path('productos/importar-excel/', views.importar_excel, name='importar_excel'),
+    path('productos/exportar/', views.exportar_productos, name='exportar_productos'),
+    path('productos/importar-excel/<int:id>/', views.estado_importacion, name='estado_importacion'),
+    path('productos/importar-excel/<int:id>/progreso/', views.progreso_importacion, name='progreso_importacion'),
 
     # Proveedor #####################################################
     path('proveedores/', views.lista_proveedores, name='lista_proveedores'),
     path('proveedores/crear/', views.crear_proveedor, name='crear_proveedor'),
     path('proveedores/editar/<int:id>/', views.editar_proveedor, name='editar_proveedor'),
     path('proveedores/eliminar/<int:id>/', views.eliminar_proveedor, name='eliminar_proveedor'),
+    path('precios/reglas/', views.reglas_precio, name='reglas_precio'),
+    path('precios/reglas/eliminar/<int:id>/', views.eliminar_regla_precio, name='eliminar_regla_precio'),
 
     # Historial de movimientos #####################################################
-    path('historial_movimientos/', views.historial_movimientos, name='historial_movimientos'),
+    path('historial_movimientos/', lectura.historial_movimientos, name='historial_movimientos'),
+    path('historial_movimientos/exportar/', views.exportar_historial, name='exportar_historial'),
 
     # Salidas de productos #####################################################
-    path('salidas/', views.lista_salidas, name='lista_salidas'),
+    path('salidas/', lectura.lista_salidas, name='lista_salidas'),
     path('salidas/registrar/', views.registrar_salida, name='registrar_salidas'),
+    path('salidas/registrar/productos/', views.autocompletar_productos, name='autocompletar_productos'),
+    path('salidas/registrar-multiple/', views.registrar_salida_multiple, name='registrar_salida_multiple'),
+    path('salidas/exportar/', views.exportar_salidas, name='exportar_salidas'),
+    path('salidas/comprobantes/', views.comprobantes_salidas, name='comprobantes_salidas'),
+
+    path('salidas/<int:id>/pdf/', lectura.generar_pdf_salida, name='generar_pdf_salida'),
 
-    path('salidas/<int:id>/pdf/', views.generar_pdf_salida, name='generar_pdf_salida'),
+    # Reportes #####################################################
+    path('reportes/', views.tablero, name='tablero'),
+    path('metricas/', views.exportar_metricas, name='metricas'),
     
     # Autenticación
     path('accounts/login/', auth_views.LoginView.as_view(template_name='registration/login.html'), name='login'),
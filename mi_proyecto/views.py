@@ -1,58 +1,110 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
-from .models import Productos, Proveedor, SalidaProducto, HistorialMovimiento
+from .models import Productos, Proveedor, SalidaProducto, HistorialMovimiento, ImportacionExcel, ReglaPrecio, MovimientoStock
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import login
 from .forms import ProductoForm, MultipleProductosForm, ProveedorForm, SalidaProductoForm, ImportarExcelForm
-from .forms import RegistroUsuarioForm
+from .forms import RegistroUsuarioForm, DocumentoSalidaForm, LineaSalidaForm, BaseLineasSalidaFormSet, MAX_LINEAS_SALIDA
+from .forms import ComprobantesSalidaForm, MAX_COMPROBANTES_LOTE, RangoFechasForm
+from .forms import AUTOCOMPLETAR_LIMITE, AUTOCOMPLETAR_MINIMO
+from .forms import ProductoLoteForm, BaseProductosFormSet, MAX_PRODUCTOS_LOTE, ReglaPrecioForm
+from . import agregados, auditoria, comprobantes, metricas, precios, resumenes, stock
+from .archivo import historial_por_rango
+from .busqueda import buscar_productos
+from .cache_vistas import cache_vista
+from .consultas import presupuesto_consultas
+from .exportacion import exportar, filas_productos, filas_salidas, filas_historial
+from .paginacion import paginar_por_cursor, total_aproximado
+from .productos import crear_productos
+from .salidas import registrar_documento_salida, StockInsuficiente
+from .senales import productos_actualizados
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
 from django.forms import formset_factory
 from django.contrib import messages
-from decimal import Decimal
-from openpyxl import load_workbook
-from io import BytesIO
-from datetime import datetime
-from django.http import HttpResponse
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
+import tempfile
+from datetime import date, datetime
+from itertools import chain, islice
+from django.http import FileResponse, JsonResponse, HttpResponse, HttpResponseForbidden
+from django.conf import settings
+import hmac
 
 
 
-@login_required
-def lista_productos(request):
-    categoria_actual = request.GET.get('categoria', 'todos')
-    busqueda = request.GET.get('busqueda', '')
-    page = request.GET.get('page', 1)
-    items_per_page = 10
-
-    # Solo productos activos
-    productos = Productos.objects.filter(activo=True).order_by('nombre')
+def _filtrar_productos(productos, categoria, busqueda):
+    productos = productos.order_by('nombre')
 
     # Filtro por categoría
-    if categoria_actual != 'todos':
-        productos = productos.filter(categoria=categoria_actual)
+    if categoria != 'todos':
+        productos = productos.filter(categoria=categoria)
 
-    # Búsqueda por nombre
+    # Búsqueda por nombre, código, descripción y proveedor (ordenada por relevancia)
     if busqueda:
-        productos = productos.filter(nombre__icontains=busqueda)
+        productos = buscar_productos(productos, busqueda)
+    return productos
 
-    # Paginador
-    paginator = Paginator(productos, items_per_page)
+
+# Filas por página de los listados (también las usan sus versiones async)
+PRODUCTOS_POR_PAGINA = 10
+MOVIMIENTOS_POR_PAGINA = 10
+SALIDAS_POR_PAGINA = 15
+
+
+def _pagina(paginator, numero):
     try:
-        productos_paginados = paginator.page(page)
+        return paginator.page(numero)
     except PageNotAnInteger:
-        productos_paginados = paginator.page(1)
+        return paginator.page(1)
     except EmptyPage:
-        productos_paginados = paginator.page(paginator.num_pages)
+        return paginator.page(paginator.num_pages)
 
-    low_stock_count = Productos.objects.filter(stock__lte=3, activo=True).count()
 
-    return render(request, 'mi_proyecto/lista_productos.html', {
+def _productos_activos(request):
+    """Productos activos según la categoría y la búsqueda de ``request``, y esos filtros para el contexto."""
+    categoria_actual = request.GET.get('categoria', 'todos')
+    busqueda = request.GET.get('busqueda', '')
+    productos = _filtrar_productos(
+        Productos.objects.filter(activo=True).select_related('proveedor'), categoria_actual, busqueda
+    )
+    return productos, {'categoria_actual': categoria_actual, 'busqueda': busqueda}
+
+
+def _contexto_productos(productos_paginados, filtros, resumen):
+    # ``resumen``: contadores de agregados.obtener()
+    categorias = [
+        (codigo, nombre, resumen['por_categoria'][codigo]) for codigo, nombre in Productos.CATEGORIAS
+    ]
+    return {
         'productos': productos_paginados,
-        'categorias': Productos.CATEGORIAS,
-        'categoria_actual': categoria_actual,
-        'busqueda': busqueda,
-        'low_stock_count': low_stock_count,
-    })
+        'categorias': categorias,
+        **filtros,
+        'low_stock_count': resumen['stock_bajo'],
+    }
+
+
+@login_required
+@cache_vista(Productos, Proveedor)
+# 3, o 5 la primera vez, cuando se calculan y guardan los agregados
+@presupuesto_consultas(5)
+def lista_productos(request):
+    productos, filtros = _productos_activos(request)
+    productos_paginados = _pagina(Paginator(productos, PRODUCTOS_POR_PAGINA), request.GET.get('page', 1))
+
+    # Contadores mantenidos por agregados.py: una consulta a una tabla de pocas filas
+    contexto = _contexto_productos(productos_paginados, filtros, agregados.obtener())
+    return render(request, 'mi_proyecto/lista_productos.html', contexto)
+
+@login_required
+def exportar_productos(request):
+    inactivos = request.GET.get('inactivos') == '1'
+    productos = _filtrar_productos(
+        Productos.objects.filter(activo=not inactivos),
+        request.GET.get('categoria', 'todos'),
+        request.GET.get('busqueda', ''),
+    )
+    nombre = 'productos_inhabilitados' if inactivos else 'productos'
+    return exportar(filas_productos(productos), nombre, request.GET.get('formato'))
 
 @login_required
 def crear_producto(request):
@@ -66,52 +118,48 @@ def crear_producto(request):
             form_multiple = MultipleProductosForm(request.POST)
             if form_multiple.is_valid():
                 cantidad = form_multiple.cleaned_data['cantidad']
-                ProductoFormSet = formset_factory(ProductoForm, extra=cantidad)
+                ProductoFormSet = formset_factory(ProductoLoteForm, formset=BaseProductosFormSet, extra=cantidad)
                 formset = ProductoFormSet()
                 modo_multiple = True
 
         elif 'guardar_multiple' in request.POST:
-            ProductoFormSet = formset_factory(ProductoForm)
+            ProductoFormSet = formset_factory(
+                ProductoLoteForm, formset=BaseProductosFormSet, max_num=MAX_PRODUCTOS_LOTE, validate_max=True
+            )
             formset = ProductoFormSet(request.POST)
             if formset.is_valid():
-                creados = 0
-                for f in formset:
-                    if f.has_changed():
-                        producto = f.save(commit=False)
-                        ######################### Aumento de 30% el precio #########################
-                        producto.precio = producto.precio *1.3 
-                        producto.save()
-                        # Registrar en historial
-                        HistorialMovimiento.objects.create(
-                            producto=producto,
-                            nombre_producto=producto.nombre,
-                            serial_producto=producto.codigo,
-                            usuario=request.user if request.user.is_authenticated else None,
-                            tipo_movimiento='CREACION',
-                            detalles='Creación múltiple de productos'
-                        )
-                        creados += 1
-                messages.success(request, f'Se crearon {creados} producto(s).')
-                return redirect('lista_productos')
+                precios.aplicar_precios(formset.productos)
+                try:
+                    crear_productos(
+                        formset.productos,
+                        usuario=request.user if request.user.is_authenticated else None,
+                    )
+                except IntegrityError:
+                    messages.error(request, 'Otro usuario registró alguno de los códigos al mismo tiempo. Revise e intente de nuevo.')
+                else:
+                    messages.success(request, f'Se crearon {len(formset.productos)} producto(s).')
+                    return redirect('lista_productos')
             modo_multiple = True
 
         else:
             form = ProductoForm(request.POST)
             if form.is_valid():
                 producto = form.save(commit=False)
-                ######################### Aumento de 30% el precio ################
-                producto.precio = producto.precio * Decimal ('1.3')
-                producto.precio = producto.precio.quantize(Decimal('0.01'))  
-                producto.save()
+                precios.aplicar_precios([producto])
+                with transaction.atomic():
+                    producto.save()
+                    stock.registrar(*stock.stock_inicial(
+                        [producto], request.user if request.user.is_authenticated else None
+                    ))
                 # Registrar en historial
-                HistorialMovimiento.objects.create(
+                auditoria.registrar(HistorialMovimiento(
                     producto=producto,
                     nombre_producto=producto.nombre,
                     serial_producto=producto.codigo,
                     usuario=request.user if request.user.is_authenticated else None,
                     tipo_movimiento='CREACION',
                     detalles='Creación de producto'
-                )
+                ))
                 messages.success(request, 'Producto creado exitosamente.')
                 return redirect('lista_productos')
 
@@ -126,22 +174,41 @@ def crear_producto(request):
 def editar_producto(request, id):
     producto = get_object_or_404(Productos, id=id)
     if request.method == 'POST':
+        stock_anterior = producto.stock
         form = ProductoForm(request.POST, instance=producto)
         if form.is_valid():
             producto = form.save(commit=False)
-            ######################### Aumento de 30% el precio #########################
-            producto.precio = producto.precio * Decimal('1.3')
-            producto.precio = producto.precio.quantize(Decimal('0.01'))
-            producto.save()
+            # El precio se calcula desde el costo: editar no vuelve a aplicar el margen
+            precios.aplicar_precios([producto])
+            # El stock se ajusta con la diferencia y sin guardar la fila entera, para
+            # no pisar una salida registrada mientras tanto (ver SalidaProducto.save)
+            ajuste = producto.stock - stock_anterior
+            producto.stock = stock_anterior
+            with transaction.atomic():
+                producto.save(update_fields=[campo for campo in ProductoForm.Meta.fields if campo != 'stock'] + ['precio'])
+                if ajuste:
+                    Productos.objects.filter(pk=producto.pk).update(stock=F('stock') + ajuste)
+                    producto.refresh_from_db(fields=['stock'])
+                    despues = producto.estado_agregados()
+                    productos_actualizados.send(
+                        sender=Productos, cambios=[((despues[0] - ajuste,) + despues[1:], despues)]
+                    )
+                stock.registrar(MovimientoStock(
+                    producto=producto,
+                    cantidad=ajuste,
+                    motivo='AJUSTE',
+                    origen='edicion',
+                    usuario=request.user if request.user.is_authenticated else None,
+                ))
             # Registrar en historial
-            HistorialMovimiento.objects.create(
+            auditoria.registrar(HistorialMovimiento(
                 producto=producto,
                 nombre_producto=producto.nombre,
                 serial_producto=producto.codigo,
                 usuario=request.user if request.user.is_authenticated else None,
                 tipo_movimiento='EDICION',
                 detalles='Edición de producto'
-            )
+            ))
             messages.success(request, f'Producto "{producto.nombre}" actualizado exitosamente.')
             return redirect('lista_productos')
     else:
@@ -157,43 +224,62 @@ def eliminar_producto(request, id):
         serial_producto = producto.codigo
         
         # Registrar en historial
-        HistorialMovimiento.objects.create(
+        auditoria.registrar(HistorialMovimiento(
             producto=None,
             nombre_producto=nombre_producto,
             serial_producto=serial_producto,
             usuario=request.user if request.user.is_authenticated else None,
             tipo_movimiento='ELIMINACION',
             detalles=f'Eliminación de producto: {nombre_producto} (Código: {serial_producto})'
-        )
+        ))
         
         producto.delete()
         return redirect('lista_productos')
     return render(request, 'mi_proyecto/eliminar_producto.html', {'producto': producto}) 
 
+def _cambiar_activo(producto, activo):
+    """
+    Habilita o deshabilita ``producto`` con un UPDATE condicionado a su estado
+    actual. Devuelve False si ya estaba así (otra petición se adelantó).
+    """
+    with transaction.atomic():
+        if not Productos.objects.filter(pk=producto.pk, activo=not activo).update(activo=activo):
+            return False
+        # El stock pudo cambiar desde que se leyó el producto: los agregados usan el actual
+        producto.refresh_from_db(fields=Productos.CAMPOS_AGREGADOS)
+        despues = producto.estado_agregados()
+        antes = (despues[0], not activo) + despues[2:]
+        productos_actualizados.send(sender=Productos, cambios=[(antes, despues)])
+    return True
+
+
 @login_required
 def deshabilitar_producto(request, id):
     producto = get_object_or_404(Productos, id=id)
     if request.method == 'POST':
-        producto.activo = False
-        producto.save()
-        # Registrar en historial
-        HistorialMovimiento.objects.create(
-            producto=producto,
-            nombre_producto=producto.nombre,
-            serial_producto=producto.codigo,
-            usuario=request.user if request.user.is_authenticated else None,
-            tipo_movimiento='DESHABILITACION',
-            detalles='Producto deshabilitado'
-        )
-        messages.success(request, f'Producto "{producto.nombre}" deshabilitado.')
+        if _cambiar_activo(producto, False):
+            # Registrar en historial
+            auditoria.registrar(HistorialMovimiento(
+                producto=producto,
+                nombre_producto=producto.nombre,
+                serial_producto=producto.codigo,
+                usuario=request.user if request.user.is_authenticated else None,
+                tipo_movimiento='DESHABILITACION',
+                detalles='Producto deshabilitado'
+            ))
+            messages.success(request, f'Producto "{producto.nombre}" deshabilitado.')
+        else:
+            messages.info(request, f'El producto "{producto.nombre}" ya estaba deshabilitado.')
         return redirect('lista_productos')
     return render(request, 'mi_proyecto/deshabilitar_producto.html', {'producto': producto})
 @login_required
+@cache_vista(Productos, Proveedor)
+@presupuesto_consultas(2)
 def productos_inhabilitados(request):
     page = request.GET.get('page', 1)
     items_per_page = 10
 
-    productos = Productos.objects.filter(activo=False).order_by('nombre')
+    productos = Productos.objects.filter(activo=False).select_related('proveedor').order_by('nombre')
     paginator = Paginator(productos, items_per_page)
     try:
         productos_paginados = paginator.page(page)
@@ -210,24 +296,26 @@ def productos_inhabilitados(request):
 def habilitar_producto(request, id):
     producto = get_object_or_404(Productos, id=id)
     if request.method == 'POST':
-        producto.activo = True
-        producto.save()
-        # Registrar en historial
-        HistorialMovimiento.objects.create(
-            producto=producto,
-            nombre_producto=producto.nombre,
-            serial_producto=producto.codigo,
-            usuario=request.user if request.user.is_authenticated else None,
-            tipo_movimiento='EDICION',
-            detalles='Producto habilitado'
-        )
-        messages.success(request, f'Producto "{producto.nombre}" habilitado.')
+        if _cambiar_activo(producto, True):
+            # Registrar en historial
+            auditoria.registrar(HistorialMovimiento(
+                producto=producto,
+                nombre_producto=producto.nombre,
+                serial_producto=producto.codigo,
+                usuario=request.user if request.user.is_authenticated else None,
+                tipo_movimiento='EDICION',
+                detalles='Producto habilitado'
+            ))
+            messages.success(request, f'Producto "{producto.nombre}" habilitado.')
+        else:
+            messages.info(request, f'El producto "{producto.nombre}" ya estaba habilitado.')
         return redirect('productos_inhabilitados')
     return render(request, 'mi_proyecto/habilitar_producto.html', {'producto': producto})
 
 # Proveedor #####################################################
 
 @login_required
+@cache_vista(Proveedor)
 def lista_proveedores(request):
     page = request.GET.get('page', 1)
     items_per_page = 10
@@ -281,52 +369,129 @@ def eliminar_proveedor(request, id):
     return render(request, 'mi_proyecto/proveedor/eliminar_proveedor.html', {'proveedor': proveedor})
 
 
-#Historial de movimientos #####################################################
+#Reglas de precio #############################################################
 
 @login_required
-def historial_movimientos(request):
-    categoria_seleccionada = request.GET.get('categoria', 'todos')
-    page = request.GET.get('page', 1)
-    items_per_page = 10
+def reglas_precio(request):
+    if request.method == 'POST':
+        form = ReglaPrecioForm(request.POST)
+        if form.is_valid():
+            form.save()
+            messages.success(request, 'Regla guardada. Se recalcularon los precios del catálogo.')
+            return redirect('reglas_precio')
+    else:
+        form = ReglaPrecioForm()
+
+    reglas = ReglaPrecio.objects.select_related('proveedor').order_by('categoria', 'proveedor__nombre')
+    return render(request, 'mi_proyecto/reglas_precio.html', {
+        'form': form,
+        'reglas': reglas,
+        'margen_por_defecto': precios.margen_por_defecto(),
+    })
 
-    movimientos_qs = HistorialMovimiento.objects.select_related('producto', 'usuario').order_by('-fecha_movimiento')
-    if categoria_seleccionada != 'todos':
-        movimientos_qs = movimientos_qs.filter(producto__categoria=categoria_seleccionada)
 
-    paginator = Paginator(movimientos_qs, items_per_page)
-    try:
-        movimientos = paginator.page(page)
-    except PageNotAnInteger:
-        movimientos = paginator.page(1)
-    except EmptyPage:
-        movimientos = paginator.page(paginator.num_pages)
+@login_required
+def eliminar_regla_precio(request, id):
+    regla = get_object_or_404(ReglaPrecio, id=id)
+    if request.method == 'POST':
+        regla.delete()
+        messages.success(request, 'Regla eliminada. Se recalcularon los precios del catálogo.')
+    return redirect('reglas_precio')
+
+
+#Historial de movimientos #####################################################
+
+def _filtrar_historial(movimientos, categoria):
+    if categoria != 'todos':
+        movimientos = movimientos.filter(producto__categoria=categoria)
+    return movimientos
+
+
+def _rango_fechas(form):
+    if not form.is_valid():
+        return None, None
+    return form.cleaned_data['desde'], form.cleaned_data['hasta']
+
 
-    return render(request, 'mi_proyecto/historial_movimientos.html', {
-        'movimientos': movimientos,
+def _historial_filtrado(request):
+    """
+    Querysets del historial según la categoría y el rango de fechas de
+    ``request`` (ver ``historial_por_rango``), y el contexto de esos filtros.
+    """
+    categoria_seleccionada = request.GET.get('categoria', 'todos')
+    # Sin rango de fechas solo se consultan los meses recientes; con rango, también el archivo
+    rango = RangoFechasForm(request.GET)
+    desde, hasta = _rango_fechas(rango)
+    movimientos_qs = [
+        _filtrar_historial(qs.select_related('usuario'), categoria_seleccionada)
+        for qs in historial_por_rango(desde, hasta)
+    ]
+    filtros = request.GET.copy()
+    filtros.pop('cursor', None)
+    return movimientos_qs, {
         'categoria_actual': categoria_seleccionada,
         'categorias': Productos.CATEGORIAS,
-    })
+        'rango': rango,
+        'filtros': filtros.urlencode(),
+    }
+
+
+def _mostrar_total_historial(movimientos_qs, contexto):
+    # La estimación del planificador solo vale para la tabla reciente entera
+    return contexto['categoria_actual'] == 'todos' and len(movimientos_qs) == 1
 
 
 @login_required
-def lista_salidas(request):
-    page = request.GET.get('page', 1)
-    items_per_page = 15
+@cache_vista(HistorialMovimiento, Productos)
+@presupuesto_consultas(2)
+def historial_movimientos(request):
+    movimientos_qs, contexto = _historial_filtrado(request)
 
-    salidas_qs = SalidaProducto.objects.select_related('producto', 'usuario').order_by('-fecha_salida')
-    paginator = Paginator(salidas_qs, items_per_page)
-    
-    try:
-        salidas = paginator.page(page)
-    except PageNotAnInteger:
-        salidas = paginator.page(1)
-    except EmptyPage:
-        salidas = paginator.page(paginator.num_pages)
+    # Paginación por cursor (fecha_movimiento, id): sin COUNT(*) ni OFFSET
+    movimientos = paginar_por_cursor(
+        movimientos_qs, request.GET.get('cursor'), MOVIMIENTOS_POR_PAGINA, 'fecha_movimiento'
+    )
+    if _mostrar_total_historial(movimientos_qs, contexto):
+        movimientos.total_aproximado = total_aproximado(HistorialMovimiento)
+
+    return render(request, 'mi_proyecto/historial_movimientos.html', {'movimientos': movimientos, **contexto})
+
+
+def _salidas_listado():
+    return SalidaProducto.objects.select_related('producto', 'usuario')
+
+
+@login_required
+@cache_vista(SalidaProducto, Productos)
+@presupuesto_consultas(2)
+def lista_salidas(request):
+    salidas = paginar_por_cursor(_salidas_listado(), request.GET.get('cursor'), SALIDAS_POR_PAGINA, 'fecha_salida')
+    salidas.total_aproximado = total_aproximado(SalidaProducto)
 
     return render(request, 'mi_proyecto/salidas/lista_salidas.html', {
         'salidas': salidas
     })
 
+@login_required
+def exportar_historial(request):
+    desde, hasta = _rango_fechas(RangoFechasForm(request.GET))
+    querysets = [
+        _filtrar_historial(qs.order_by('-fecha_movimiento', '-id'), request.GET.get('categoria', 'todos'))
+        for qs in historial_por_rango(desde, hasta)
+    ]
+    # El archivo solo tiene meses anteriores a los de la tabla reciente: basta
+    # con concatenarlos (sin repetir la fila de encabezados)
+    filas = filas_historial(querysets[0])
+    for qs in querysets[1:]:
+        filas = chain(filas, islice(filas_historial(qs), 1, None))
+    return exportar(filas, 'historial_movimientos', request.GET.get('formato'))
+
+
+@login_required
+def exportar_salidas(request):
+    salidas = SalidaProducto.objects.order_by('-fecha_salida', '-id')
+    return exportar(filas_salidas(salidas), 'salidas', request.GET.get('formato'))
+
 @login_required
 def registrar_salida(request):
     if request.method == 'POST':
@@ -345,191 +510,153 @@ def registrar_salida(request):
     
     return render(request, 'mi_proyecto/salidas/registrar_salidas.html', {'form': form})
 
+
+@login_required
+@presupuesto_consultas(2)
+def autocompletar_productos(request):
+    """Productos con stock para el campo producto de SalidaProductoForm, por código o por nombre."""
+    texto = request.GET.get('q', '').strip()
+    if len(texto) < AUTOCOMPLETAR_MINIMO:
+        return JsonResponse({'resultados': []})
+
+    campos = ('id', 'codigo', 'nombre', 'stock')
+    con_stock = Productos.objects.filter(stock__gt=0)
+    # Primero los códigos que empiezan con lo escrito (en PostgreSQL usa el
+    # índice "_like" del código único), después la búsqueda de texto completo
+    # ordenada por nombre
+    resultados = list(
+        con_stock.filter(codigo__startswith=texto).order_by('codigo').values(*campos)[:AUTOCOMPLETAR_LIMITE]
+    )
+    if len(resultados) < AUTOCOMPLETAR_LIMITE:
+        vistos = {r['id'] for r in resultados}
+        por_texto = buscar_productos(con_stock.order_by('nombre'), texto, relevancia=False)
+        por_texto = por_texto.values(*campos)[:AUTOCOMPLETAR_LIMITE]
+        resultados += [r for r in por_texto if r['id'] not in vistos][:AUTOCOMPLETAR_LIMITE - len(resultados)]
+    return JsonResponse({'resultados': resultados})
+
+@login_required
+def registrar_salida_multiple(request):
+    if request.method == 'POST':
+        form = DocumentoSalidaForm(request.POST)
+        LineasFormSet = formset_factory(
+            LineaSalidaForm, formset=BaseLineasSalidaFormSet, max_num=MAX_LINEAS_SALIDA, validate_max=True
+        )
+        formset = LineasFormSet(request.POST)
+        if form.is_valid() and formset.is_valid():
+            try:
+                documento = registrar_documento_salida(
+                    formset.lineas,
+                    motivo=form.cleaned_data['motivo'],
+                    descripcion=form.cleaned_data['descripcion'],
+                    usuario=request.user if request.user.is_authenticated else None,
+                )
+                messages.success(request, f'Documento de salida {documento.id} registrado con {len(formset.lineas)} línea(s).')
+                return redirect('lista_salidas')
+            except StockInsuficiente as e:
+                messages.error(request, str(e))
+    else:
+        form = DocumentoSalidaForm()
+        try:
+            lineas = min(max(int(request.GET.get('lineas', 5)), 1), MAX_LINEAS_SALIDA)
+        except ValueError:
+            lineas = 5
+        LineasFormSet = formset_factory(LineaSalidaForm, formset=BaseLineasSalidaFormSet, extra=lineas)
+        formset = LineasFormSet()
+
+    return render(request, 'mi_proyecto/salidas/registrar_salida_multiple.html', {
+        'form': form,
+        'formset': formset,
+    })
+
 @login_required
 def importar_excel(request):
     if request.method == 'POST':
         form = ImportarExcelForm(request.POST, request.FILES)
         if form.is_valid():
             archivo_excel = request.FILES['archivo_excel']
-            
-            try:
-                # Cargar el archivo Excel ############################
-                workbook = load_workbook(archivo_excel)
-                sheet = workbook.active
-                
-                productos_importados = 0
-                productos_actualizados = 0
-                errores = []
-                
-                # Leer las filas del Excel (Las primeras filas son encabezados)
-                for row_num, row in enumerate(sheet.iter_rows(min_row=2, values_only=True), start=2):
-                    try:
-                        # Extraer datos de cada fila
-                        codigo = str(row[0]).strip() if row[0] else None
-                        nombre = str(row[1]).strip() if row[1] else None
-                        descripcion = str(row[2]).strip() if row[2] else ""
-                        precio = float(row[3]) if row[3] else 0
-                        stock = int(row[4]) if row[4] else 0
-                        categoria = str(row[5]).strip() if row[5] else "COMPUTADORAS"
-                        proveedor_nombre = str(row[6]).strip() if row[6] else None
-                        
-                        # Validar datos requeridos
-                        if not nombre or not codigo:
-                            errores.append(f"Fila {row_num}: Nombre y código son requeridos")
-                            continue
-                        
-                        # Validar categoría
-                        categorias_validas = [cat[0] for cat in Productos.CATEGORIAS]
-                        categoria_upper = categoria.upper()
-                        if categoria_upper not in categorias_validas:
-                            categoria = "COMPUTADORAS"  # Valor por defecto
-                        else:
-                            categoria = categoria_upper  # Usar la versión en mayúsculas
-                        
-                        # Buscar o crear proveedor
-                        proveedor = None
-                        if proveedor_nombre:
-                            proveedor, created = Proveedor.objects.get_or_create(
-                                nombre=proveedor_nombre,
-                                defaults={
-                                    'direccion': 'Dirección por definir',
-                                    'telefono': '0000-0000',
-                                    'email': 'email@ejemplo.com'
-                                }
-                            )
-                        
-                        # Aplicar aumento del 30% al precio
-                        precio_final = Decimal(str(precio)) * Decimal('1.3')
-                        precio_final = precio_final.quantize(Decimal('0.01'))
-                        
-                        # Verificar si el producto ya existe
-                        producto_existente = Productos.objects.filter(codigo=codigo).first()
-                        
-                        if producto_existente:
-                            # Actualizar producto existente
-                            producto_existente.nombre = nombre
-                            producto_existente.descripcion = descripcion
-                            producto_existente.precio = precio_final
-                             # Sumar al stock existente 
-                            producto_existente.stock += stock  
-                            producto_existente.categoria = categoria
-                            producto_existente.proveedor = proveedor
-                            producto_existente.save()
-                            
-                            # Registrar en historial
-                            HistorialMovimiento.objects.create(
-                                producto=producto_existente,
-                                nombre_producto=producto_existente.nombre,
-                                serial_producto=producto_existente.codigo,
-                                usuario=request.user if request.user.is_authenticated else None,
-                                tipo_movimiento='EDICION',
-                                detalles=f'Actualización desde Excel - Stock agregado: {stock}'
-                            )
-                            productos_actualizados += 1
-                        else:
-                            # Crear nuevo producto
-                            nuevo_producto = Productos.objects.create(
-                                nombre=nombre,
-                                codigo=codigo,
-                                descripcion=descripcion,
-                                precio=precio_final,
-                                stock=stock,
-                                categoria=categoria,
-                                proveedor=proveedor
-                            )
-                            
-                            # Registrar en historial
-                            HistorialMovimiento.objects.create(
-                                producto=nuevo_producto,
-                                nombre_producto=nuevo_producto.nombre,
-                                serial_producto=nuevo_producto.codigo,
-                                usuario=request.user if request.user.is_authenticated else None,
-                                tipo_movimiento='CREACION',
-                                detalles='Creación desde Excel'
-                            )
-                            productos_importados += 1
-                            
-                    except Exception as e:
-                        errores.append(f"Fila {row_num}: Error procesando datos - {str(e)}")
-                        continue
-                
-                # Mostrar resultados
-                if productos_importados > 0 or productos_actualizados > 0:
-                    mensaje = f"Importación completada: {productos_importados} productos nuevos, {productos_actualizados} productos actualizados."
-                    if errores:
-                        mensaje += f" Errores: {len(errores)}"
-                    messages.success(request, mensaje)
-                else:
-                    messages.warning(request, "No se importaron productos. Verifique el formato del archivo.")
-                
-                if errores:
-                    for error in errores[:10]:  # Mostrar solo los primeros 10 errores
-                        messages.error(request, error)
-                
-                return redirect('lista_productos')
-                
-            except Exception as e:
-                messages.error(request, f"Error al procesar el archivo Excel: {str(e)}")
+            # La importación se encola y la procesa el worker (procesar_importaciones)
+            importacion = ImportacionExcel.objects.create(
+                archivo=archivo_excel,
+                nombre_archivo=archivo_excel.name,
+                usuario=request.user if request.user.is_authenticated else None,
+            )
+            messages.success(request, f'Archivo "{archivo_excel.name}" recibido. La importación se procesará en segundo plano.')
+            return redirect('estado_importacion', id=importacion.id)
     else:
         form = ImportarExcelForm()
     
     return render(request, 'mi_proyecto/importar_excel.html', {'form': form})
 
 
+@login_required
+def estado_importacion(request, id):
+    importacion = get_object_or_404(ImportacionExcel, id=id)
+    return render(request, 'mi_proyecto/estado_importacion.html', {'importacion': importacion})
+
+
+@login_required
+def progreso_importacion(request, id):
+    importacion = get_object_or_404(ImportacionExcel, id=id)
+    return JsonResponse({
+        'estado': importacion.estado,
+        'estado_display': importacion.get_estado_display(),
+        'filas_totales': importacion.filas_totales,
+        'filas_procesadas': importacion.filas_procesadas,
+        'importados': importacion.importados,
+        'actualizados': importacion.actualizados,
+        'total_errores': importacion.total_errores,
+        'errores': importacion.errores.splitlines() if importacion.errores else [],
+        'eta_segundos': importacion.eta_segundos,
+    })
+
+
+def _respuesta_comprobante(salida, ruta):
+    return FileResponse(
+        open(ruta, 'rb'),
+        as_attachment=True,
+        filename=f'salida_{salida.id}_{datetime.now().strftime("%Y%m%d")}.pdf',
+        content_type='application/pdf',
+    )
+
+
 @login_required
 def generar_pdf_salida(request, id):
-    salida = get_object_or_404(SalidaProducto, id=id)
-
-    buffer = BytesIO()
-    p = canvas.Canvas(buffer, pagesize=letter)
-    p.setTitle(f"Comprobante de Salida - {salida.producto.nombre}")
-
-    # Encabezado
-    p.setFont("Helvetica-Bold", 16)
-    p.drawString(72, 750, "Comprobante de Salida de Producto")
-    p.setFont("Helvetica", 12)
-    p.drawString(72, 730, f"Fecha: {salida.fecha_salida.strftime('%d/%m/%Y %H:%M')}")
-
-    # Información del producto
-    p.setFont("Helvetica-Bold", 12)
-    p.drawString(72, 700, "Detalles del Producto:")
-    p.setFont("Helvetica", 12)
-    p.drawString(72, 680, f"Producto: {salida.producto.nombre}")
-    p.drawString(72, 660, f"Código: {salida.producto.codigo}")
-    p.drawString(72, 640, f"Cantidad: {salida.cantidad}")
-    p.drawString(72, 620, f"Motivo: {salida.get_motivo_display()}")
-
-    # Descripción multilínea (si existe)
-    if salida.descripcion:
-        p.setFont("Helvetica-Bold", 12)
-        p.drawString(72, 600, "Descripción:")
-        p.setFont("Helvetica", 12)
-        y = 580
-        for line in salida.descripcion.split('\n'):
-            p.drawString(72, y, line)
-            y -= 16
-            if y < 120:  # salto de página si se acaba el espacio
-                p.showPage()
-                y = 750
-                p.setFont("Helvetica", 12)
-
-    # Usuario
-    p.setFont("Helvetica-Bold", 12)
-    p.drawString(72, 480, "Registrado por:")
-    p.setFont("Helvetica", 12)
-    p.drawString(72, 460, f"Usuario: {salida.usuario.username if salida.usuario else 'Sistema'}")
-
-    # Firma
-    p.setFont("Helvetica", 10)
-    p.drawString(72, 120, "Firma del Responsable: ________________________")
-
-    p.showPage()
-    p.save()
-
-    buffer.seek(0)
-    response = HttpResponse(buffer, content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="salida_{salida.id}_{datetime.now().strftime("%Y%m%d")}.pdf"'
-    return response
+    salida = get_object_or_404(_salidas_listado(), id=id)
+    return _respuesta_comprobante(salida, comprobantes.obtener_comprobante(salida))
+
+
+@login_required
+def comprobantes_salidas(request):
+    form = ComprobantesSalidaForm(request.GET or None)
+    if not form.is_valid():
+        return render(request, 'mi_proyecto/salidas/comprobantes_salidas.html', {'form': form})
+
+    desde = form.cleaned_data['desde']
+    hasta = form.cleaned_data['hasta']
+    salidas = SalidaProducto.objects.filter(
+        fecha_salida__date__gte=desde, fecha_salida__date__lte=hasta
+    ).select_related('producto', 'usuario').order_by('fecha_salida', 'id')
+    total = salidas.count()
+    if not total:
+        form.add_error(None, 'No hay salidas en el rango indicado.')
+    elif total > MAX_COMPROBANTES_LOTE:
+        form.add_error(None, f'El rango tiene {total} salidas; el máximo por lote es {MAX_COMPROBANTES_LOTE}.')
+    if form.errors:
+        return render(request, 'mi_proyecto/salidas/comprobantes_salidas.html', {'form': form})
+
+    formato = form.cleaned_data['formato']
+    archivo = tempfile.TemporaryFile()
+    if formato == 'zip':
+        comprobantes.comprimir(salidas, archivo)
+    else:
+        comprobantes.combinar(salidas, archivo)
+    archivo.seek(0)
+    return FileResponse(
+        archivo,
+        as_attachment=True,
+        filename=f"comprobantes_{desde.strftime('%Y%m%d')}_{hasta.strftime('%Y%m%d')}.{formato}",
+        content_type='application/zip' if formato == 'zip' else 'application/pdf',
+    )
 
 
 def registrar_usuario(request):
@@ -542,4 +669,31 @@ def registrar_usuario(request):
             return redirect('lista_productos')
     else:
         form = RegistroUsuarioForm()
-    return render(request, 'mi_proyecto/register.html', {'form': form})
\ No newline at end of file
+    return render(request, 'mi_proyecto/register.html', {'form': form})
+
+
+# Reportes #####################################################
+
+@login_required
+@presupuesto_consultas(7)
+def tablero(request):
+    rango = RangoFechasForm(request.GET)
+    desde, hasta = _rango_fechas(rango)
+    hasta = hasta or timezone.localdate()
+    if desde is None:
+        # Por defecto, los últimos 12 meses (incluido el actual)
+        meses = hasta.year * 12 + hasta.month - 12
+        desde = date(meses // 12, meses % 12 + 1, 1)
+    datos = resumenes.datos_tablero(desde, hasta)
+    datos.update({'rango': rango, 'desde': desde, 'hasta': hasta})
+    return render(request, 'mi_proyecto/tablero.html', datos)
+
+
+def exportar_metricas(request):
+    """Métricas por vista en formato Prometheus: solo staff o con el token de METRICAS_TOKEN."""
+    token = settings.METRICAS_TOKEN
+    autorizacion = request.headers.get('Authorization', '')
+    con_token = bool(token) and hmac.compare_digest(autorizacion.encode(), f'Bearer {token}'.encode())
+    if not con_token and not (request.user.is_active and request.user.is_staff):
+        return HttpResponseForbidden('Solo personal autorizado')
+    return HttpResponse(metricas.texto_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,80 @@
+"""
+Versiones async de las vistas de solo lectura más visitadas y del PDF de una salida.
+
+Se usan con ``VISTAS_ASINCRONAS`` (por defecto, al servir con ASGI): consultan
+con el ORM async y no ocupan un hilo mientras esperan, y el PDF se dibuja en un
+pool de procesos. Devuelven lo mismo que sus pares de ``views``: las consultas
+y el contexto se arman con los mismos ayudantes, aquí solo se esperan.
+"""
+from asgiref.sync import sync_to_async
+from django.core.paginator import Paginator
+from django.http import Http404
+from django.shortcuts import render
+
+from . import agregados, comprobantes
+from .asincrono import login_requerido
+from .cache_vistas import cache_vista
+from .consultas import presupuesto_consultas
+from .models import HistorialMovimiento, Productos, Proveedor, SalidaProducto
+from .paginacion import apaginar_por_cursor, total_aproximado
+from .views import (
+    MOVIMIENTOS_POR_PAGINA, PRODUCTOS_POR_PAGINA, SALIDAS_POR_PAGINA, _contexto_productos, _historial_filtrado,
+    _mostrar_total_historial, _pagina, _productos_activos, _respuesta_comprobante, _salidas_listado,
+)
+
+
+# Renderizar puede tocar la sesión (mensajes) y es CPU: se hace en el hilo de la petición
+arender = sync_to_async(render)
+
+
+@login_requerido
+@cache_vista(Productos, Proveedor)
+# 3, o 5 la primera vez, cuando se calculan y guardan los agregados
+@presupuesto_consultas(5)
+async def lista_productos(request):
+    # La búsqueda puede consultar qué motor de texto completo hay
+    productos, filtros = await sync_to_async(_productos_activos)(request)
+
+    # El Paginator cuenta con count() síncrono: se le da el total ya calculado
+    # y la página se materializa antes de renderizar
+    paginator = Paginator(productos, PRODUCTOS_POR_PAGINA)
+    paginator.count = await productos.acount()
+    productos_paginados = _pagina(paginator, request.GET.get('page', 1))
+    productos_paginados.object_list = [p async for p in productos_paginados.object_list]
+
+    resumen = await sync_to_async(agregados.obtener)()
+    contexto = _contexto_productos(productos_paginados, filtros, resumen)
+    return await arender(request, 'mi_proyecto/lista_productos.html', contexto)
+
+
+@login_requerido
+@cache_vista(HistorialMovimiento, Productos)
+@presupuesto_consultas(2)
+async def historial_movimientos(request):
+    movimientos_qs, contexto = _historial_filtrado(request)
+    movimientos = await apaginar_por_cursor(
+        movimientos_qs, request.GET.get('cursor'), MOVIMIENTOS_POR_PAGINA, 'fecha_movimiento'
+    )
+    if _mostrar_total_historial(movimientos_qs, contexto):
+        movimientos.total_aproximado = await sync_to_async(total_aproximado)(HistorialMovimiento)
+    return await arender(request, 'mi_proyecto/historial_movimientos.html', {'movimientos': movimientos, **contexto})
+
+
+@login_requerido
+@cache_vista(SalidaProducto, Productos)
+@presupuesto_consultas(2)
+async def lista_salidas(request):
+    salidas = await apaginar_por_cursor(
+        _salidas_listado(), request.GET.get('cursor'), SALIDAS_POR_PAGINA, 'fecha_salida'
+    )
+    salidas.total_aproximado = await sync_to_async(total_aproximado)(SalidaProducto)
+    return await arender(request, 'mi_proyecto/salidas/lista_salidas.html', {'salidas': salidas})
+
+
+@login_requerido
+async def generar_pdf_salida(request, id):
+    try:
+        salida = await _salidas_listado().aget(id=id)
+    except SalidaProducto.DoesNotExist:
+        raise Http404('No SalidaProducto matches the given query.')
+    return _respuesta_comprobante(salida, await comprobantes.aobtener_comprobante(salida))
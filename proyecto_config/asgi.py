@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'proyecto_config.settings')
+# Activa las vistas async y desactiva las conexiones persistentes (ver settings.py)
+os.environ.setdefault('SERVIDOR_ASGI', 'True')
 
 application = get_asgi_application()
@@ -48,7 +48,9 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'mi_proyecto.asincrono.StreamingAsincronoMiddleware',
+    'mi_proyecto.asincrono.EstaticosMiddleware',
+    'mi_proyecto.metricas.MetricasMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -61,7 +63,8 @@ ROOT_URLCONF = 'proyecto_config.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates que además mide el tiempo de renderizado (ver mi_proyecto.metricas)
+        'BACKEND': 'mi_proyecto.metricas.PlantillasDjango',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -80,15 +83,62 @@ WSGI_APPLICATION = 'proyecto_config.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# proyecto_config/asgi.py define SERVIDOR_ASGI=True antes de cargar la configuración
+# (ver start.sh); las vistas de listado y el PDF de salidas pasan a sus versiones
+# async (ver mi_proyecto.vistas_asincronas)
+SERVIDOR_ASGI = os.environ.get('SERVIDOR_ASGI', 'False') == 'True'
+VISTAS_ASINCRONAS = os.environ.get('VISTAS_ASINCRONAS', str(SERVIDOR_ASGI)) == 'True'
+
+URL_BASE_DATOS = os.environ.get('DATABASE_URL', 'sqlite:///db.sqlite3')
+ES_POSTGRESQL = URL_BASE_DATOS.startswith(('postgres://', 'postgresql://'))
+
+# Pool de conexiones por proceso (solo PostgreSQL, ver mi_proyecto.pool_bd): cada
+# petición toma una conexión al empezar y la devuelve al terminar. BD_POOL_TAMANO
+# es el máximo por worker (workers x tamaño no debe pasar de max_connections);
+# bajo ASGI cada petición usa su propio hilo y necesita más
+BD_POOL = ES_POSTGRESQL and os.environ.get('BD_POOL', 'False') == 'True'
+BD_POOL_TAMANO = int(os.environ.get('BD_POOL_TAMANO', '10' if SERVIDOR_ASGI else '2'))
+# Segundos que una petición espera una conexión libre antes de fallar
+BD_POOL_ESPERA = float(os.environ.get('BD_POOL_ESPERA', '10'))
+# Las conexiones sin usar hace más de estos segundos se prueban con SELECT 1 al entregarlas
+BD_POOL_VERIFICAR = float(os.environ.get('BD_POOL_VERIFICAR', '30'))
+# Segundos de vida de una conexión antes de reemplazarla
+BD_POOL_VIDA = float(os.environ.get('BD_POOL_VIDA', '600'))
+
 DATABASES = {
     'default': dj_database_url.config(
-        default=os.environ.get('DATABASE_URL', 'sqlite:///db.sqlite3'),
-        conn_max_age=600,
-        ssl_require=True
+        default=URL_BASE_DATOS,
+        engine='mi_proyecto.pool_bd' if BD_POOL else None,
+        # Con el pool, "cerrar" al final de la petición devuelve la conexión. Sin
+        # él, bajo ASGI cada petición usa un hilo nuevo y una conexión
+        # persistente quedaría abierta por cada hilo terminado
+        conn_max_age=0 if SERVIDOR_ASGI or BD_POOL else 600,
+        # Una conexión persistente que se cortó (reinicio de la base) se
+        # detecta al empezar la petición en lugar de fallar en la primera consulta
+        conn_health_checks=True,
+        ssl_require=ES_POSTGRESQL and os.environ.get('BD_SSL', 'True') == 'True',
     )
 }
 
 
+# Caché compartida entre procesos (web y worker de importaciones) sin servicios externos
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('CACHE_LOCATION', os.path.join(BASE_DIR, 'cache')),
+    },
+    # Páginas de listados ya renderizadas (ver mi_proyecto.cache_vistas)
+    'vistas': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('CACHE_VISTAS_LOCATION', os.path.join(BASE_DIR, 'cache', 'vistas')),
+        'OPTIONS': {'MAX_ENTRIES': 2000},
+    },
+}
+
+# Segundos que se guarda cada página de listado en caché (0 desactiva la caché de vistas)
+CACHE_VISTAS_SEGUNDOS = int(os.environ.get('CACHE_VISTAS_SEGUNDOS', '300'))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -126,7 +176,37 @@ USE_TZ = True
 STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
+# Archivos subidos (Excel en cola de importación)
+MEDIA_URL = '/media/'
+MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# Los formularios de creación múltiple y de salidas de varios productos envían
+# miles de campos (hasta 1000 filas)
+DATA_UPLOAD_MAX_NUMBER_FIELDS = 10000
+
+# Historial de movimientos (auditoria.py): por defecto se escribe en bloque fuera
+# de la petición; AUDITORIA_SINCRONA=True lo escribe en el momento (pruebas)
+AUDITORIA_SINCRONA = os.environ.get('AUDITORIA_SINCRONA', 'False') == 'True'
+AUDITORIA_LOTE = int(os.environ.get('AUDITORIA_LOTE', '500'))
+AUDITORIA_INTERVALO = float(os.environ.get('AUDITORIA_INTERVALO', '5'))
+AUDITORIA_DIARIO = os.environ.get('AUDITORIA_DIARIO', os.path.join(BASE_DIR, 'auditoria'))
+
+# Meses completos que quedan en la tabla del historial; los anteriores los mueve
+# al archivo el comando archivar_historial
+HISTORIAL_MESES_RECIENTES = int(os.environ.get('HISTORIAL_MESES_RECIENTES', '6'))
+
+# Segundos sin avances tras los cuales una importación PROCESANDO se da por
+# abandonada (el worker murió) y se marca con ERROR; el avance se guarda tras
+# cada lote de importacion.TAMANO_LOTE filas
+IMPORTACION_TIEMPO_LIMITE = float(os.environ.get('IMPORTACION_TIEMPO_LIMITE', '900'))
+
+# Procesos para generar comprobantes PDF en lote (por defecto, uno por CPU)
+COMPROBANTES_PROCESOS = int(os.environ.get('COMPROBANTES_PROCESOS', '0')) or None
+
 STORAGES = {
+    "default": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+    },
     "staticfiles": {
         "BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage",
     },
@@ -137,6 +217,32 @@ STORAGES = {
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Límite de consultas SQL por vista (ver mi_proyecto.consultas): si es True (por
+# defecto en DEBUG), exceder el presupuesto lanza una excepción en lugar de
+# registrar una advertencia
+PRESUPUESTO_CONSULTAS_ESTRICTO = os.environ.get('PRESUPUESTO_CONSULTAS_ESTRICTO', str(DEBUG)) == 'True'
+
+# Métricas por vista (ver mi_proyecto.metricas), publicadas en /metricas/ en
+# formato Prometheus para usuarios staff o con la cabecera
+# "Authorization: Bearer <METRICAS_TOKEN>"
+METRICAS_ACTIVAS = os.environ.get('METRICAS_ACTIVAS', 'True') == 'True'
+METRICAS_TOKEN = os.environ.get('METRICAS_TOKEN', '')
+# Segundos entre cada copia de las métricas del proceso a la caché compartida
+METRICAS_INTERVALO = float(os.environ.get('METRICAS_INTERVALO', '15'))
+# Segundos que dura en la caché la copia de un proceso: la de un worker que
+# murió (o que pasó ese tiempo sin atender peticiones) deja de sumarse
+METRICAS_VIGENCIA = float(os.environ.get('METRICAS_VIGENCIA', '300'))
+# Segundos a partir de los cuales una consulta se registra en el log
+METRICAS_CONSULTA_LENTA = float(os.environ.get('METRICAS_CONSULTA_LENTA', '0.5'))
+# Consultas repetidas en una petición a partir de las cuales se avisa en el log
+METRICAS_REPETIDAS_AVISO = int(os.environ.get('METRICAS_REPETIDAS_AVISO', '5'))
+# Fracción de peticiones ejecutadas con cProfile (0 lo desactiva); se guardan
+# los perfiles de las que tardan más de METRICAS_PERFIL_LENTA segundos
+METRICAS_PERFIL_MUESTREO = float(os.environ.get('METRICAS_PERFIL_MUESTREO', '0'))
+METRICAS_PERFIL_LENTA = float(os.environ.get('METRICAS_PERFIL_LENTA', '1'))
+METRICAS_PERFIL_CARPETA = os.environ.get('METRICAS_PERFIL_CARPETA', os.path.join(BASE_DIR, 'perfiles'))
+METRICAS_PERFIL_MAXIMO = int(os.environ.get('METRICAS_PERFIL_MAXIMO', '50'))
+
 # Auth redirects
 LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'lista_productos'
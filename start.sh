@@ -0,0 +1,14 @@
+#!/usr/bin/env bash
+# Worker de importaciones en segundo plano y servidor web.
+# SERVIDOR=asgi sirve proyecto_config.asgi con workers de uvicorn (vistas async,
+# las peticiones lentas no bloquean a las demás); por defecto, WSGI con workers síncronos.
+# La cantidad de workers se ajusta con WEB_CONCURRENCY.
+set -o errexit
+
+python manage.py procesar_importaciones &
+
+if [ "${SERVIDOR:-wsgi}" = "asgi" ]; then
+  exec gunicorn proyecto_config.asgi:application -k uvicorn_worker.UvicornWorker
+else
+  exec gunicorn proyecto_config.wsgi:application
+fi